@@ -3,25 +3,36 @@ from typing import Any, Dict, List, Optional, Tuple
 
 import numpy as np
 
-from .cma_agent import CMAAgent
+from ..utils.codec import ParamCodec
+from ..utils.sampler import QuasiRandomSampler
+from ..utils.telemetry import AgentTelemetry, instrumented
+from .cma_populations import CMAPopulations
 
 logger = logging.getLogger(__name__)
 
 SCORE_SCALE = 100
 AGENT_NAME = "cma-es"
+AGENT_SEP_NAME = "sep-cma-es"
 AGENT_MANUAL = "manual"
 
+COVARIANCE_MODELS = ("full", "diagonal", "auto")
+
 
 class AgentCMAES:
     """
-    Multi-CMA-ES agent built from our own CMAAgent:
-    - maintains several CMAAgent optimizers (n_agents)
-    - each play() picks one agent and samples from it
-    - update() takes (params, score) and forwards to the correct CMAAgent based on
+    Multi-CMA-ES agent built from our own CMA-ES populations:
+    - maintains n_agents populations, stored as stacked arrays (CMAPopulations)
+    - each play() picks one population and samples from it
+    - update() takes (params, score) and forwards to the correct population based on
       pop_idx in metadata (or closest mean if unknown)
-    - if two agents get too close in parameter space, we restart one
+    - if two populations get too close in parameter space, we restart one
+    - covariance="diagonal" runs separable CMA-ES populations (O(d) per
+      sample/update), "auto" uses full covariance up to
+      full_covariance_max_dim parameters and diagonal above
     """
 
+    agent_name = AGENT_NAME
+
     def __init__(
         self,
         parameters_def: Dict[str, Dict[str, Any]],
@@ -29,99 +40,75 @@ class AgentCMAES:
         population_size: Optional[int] = None,
         n_agents: int = 2,
         restart_min_dist: float = 0.15,
+        init_sampling: str = "uniform",
+        covariance: str = "full",
+        full_covariance_max_dim: int = 40,
     ) -> None:
         """
         parameters_def: dict { name: { "type": "float"/"integer"/"choice", "range": [min, max], ... } }
-        sigma_frac: initial sigma in normalized space (0–1) for CMAAgent
-        population_size: hint passed to CMAAgent (not strict)
+        sigma_frac: initial sigma in normalized space (0–1) of each population
+        population_size: λ of each population (not strict)
         n_agents: number of CMA sub-populations
         restart_min_dist: min distance (in normalized space) between agent means;
                           if closer, the later agent is restarted.
+        init_sampling: how initial / restarted means are drawn, "uniform" or a
+                       space-filling sequence ("sobol", "halton", "lhs")
+        covariance: "full", "diagonal" (separable CMA-ES) or "auto"
+        full_covariance_max_dim: with covariance="auto", largest dimension
+                                 that still uses the full covariance
         """
-        logger.info(
-            f"Initializing AgentCMAES with parameter definitions: {parameters_def}"
-        )
+        if covariance not in COVARIANCE_MODELS:
+            raise ValueError(f"AgentCMAES: unknown covariance model {covariance!r}")
 
         self.parameters_def = parameters_def or {}
 
-        # info needed for encoding / distance
-        self._opt_names = []
-        self._types = []
-        self._mins = []
-        self._maxs = []
-        self._choices = {}  # name -> list of choices (for choice params)
-
-        for name, p in self.parameters_def.items():
-            if not isinstance(p, dict):
-                continue
-
-            ptype = p.get("type", "float")
-            if ptype not in ("float", "integer", "choice"):
-                logger.warning(
-                    f"[AgentCMAES] Unsupported type '{ptype}' for '{name}', skipped."
-                )
-                continue
-
-            if ptype == "choice":
-                choices = p.get("choices", [])
-                if not choices:
-                    logger.warning(
-                        f"[AgentCMAES] Choice param '{name}' has no 'choices', skipped."
-                    )
-                    continue
-                lo, hi = 0.0, float(len(choices) - 1)
-                self._choices[name] = choices
-            else:  # float / integer
-                lo, hi = p["range"]
-                lo = float(lo)
-                hi = float(hi)
-
-                if lo >= hi:
-                    logger.warning(
-                        f"[AgentCMAES] Invalid range for '{name}' (min >= max), skipped."
-                    )
-                    continue
-
-            self._opt_names.append(name)
-            self._types.append(ptype)
-            self._mins.append(lo)
-            self._maxs.append(hi)
-
-        if not self._opt_names:
+        # encoding / distance, shared by all populations (a definition
+        # without "type" is a float, as in the encoder of this agent)
+        self._codec = ParamCodec(self.parameters_def, default_type="float")
+        if self._codec.dim == 0:
             raise ValueError(
                 "AgentCMAES: no optimizable parameters found in parameters_def"
             )
+        self._dim = self._codec.dim
+
+        if covariance == "auto":
+            covariance = (
+                "full" if self._dim <= full_covariance_max_dim else "diagonal"
+            )
+        self.covariance = covariance
 
-        self._mins = np.array(self._mins, dtype=float)
-        self._maxs = np.array(self._maxs, dtype=float)
-        self._dim = len(self._opt_names)
+        # Space-filling sequence for population means, shared across restarts
+        self._init_sampler = QuasiRandomSampler(self._codec, method=init_sampling)
 
         # sigma in normalized space [0,1]^d
         self._sigma0 = float(sigma_frac)
         if self._sigma0 <= 0:
             self._sigma0 = 0.3
 
-        # just pass through to CMAAgent
+        # λ of each population
         self._pop_size_hint = int(population_size) if population_size is not None else 10
 
-        # Multi-agent CMA: list of CMAAgent
+        # Multi-population CMA: one stack of n_agents populations
         self.n_agents = int(n_agents)
-        self._agents = []
         self._time = 0
         self._restart_min_dist = float(restart_min_dist)
 
-        for i in range(self.n_agents):
-            agent = CMAAgent(
-                self.parameters_def,
-                sigma0=self._sigma0,
-                population_size=self._pop_size_hint,
-            )
-            # give each agent a random initial mean (in normalized space)
-            agent.mean = np.random.rand(agent.dim)
-            self._agents.append(agent)
-            logger.info(
-                f"[AgentCMAES] Initialized CMAAgent #{i} with random mean in [0,1]^d"
-            )
+        self._pops = CMAPopulations(
+            self._dim,
+            n_pops=self.n_agents,
+            sigma0=self._sigma0,
+            population_size=self._pop_size_hint,
+            diagonal=self.covariance == "diagonal",
+        )
+        # give each population a random initial mean (in normalized space)
+        self._pops.reset(
+            np.arange(self.n_agents), means=self._init_sampler.sample_unit(self.n_agents)
+        )
+        self.telemetry = AgentTelemetry()
+        logger.info(
+            f"[AgentCMAES] Initialized {self.n_agents} CMA populations ({self.covariance} "
+            f"covariance, d={self._dim}) with random means in [0,1]^d"
+        )
 
     # ----------------------------------------------------------------------
     # Helpers
@@ -131,116 +118,75 @@ class AgentCMAES:
         """
         Encode a param dict into normalized vector in [0,1]^d.
         """
-        x = np.zeros(self._dim, dtype=float)
-        for i, name in enumerate(self._opt_names):
-            ptype = self._types[i]
-            lo = self._mins[i]
-            hi = self._maxs[i]
-
-            if ptype in ("float", "integer"):
-                val = params.get(name, lo)
-                if hi == lo:
-                    x[i] = 0.0
-                else:
-                    x[i] = (float(val) - lo) / (hi - lo)
-            elif ptype == "choice":
-                choices = self._choices[name]
-                n = len(choices)
-                val = params.get(name, choices[0])
-                try:
-                    idx = choices.index(val)
-                except ValueError:
-                    idx = 0
-                if n == 1:
-                    x[i] = 0.0
-                else:
-                    x[i] = idx / float(n - 1)
-            else:
-                # Should not happen
-                logger.warning(
-                    f"[AgentCMAES] _encode_to_normalized: unsupported type '{ptype}' for '{name}', using 0.0"
-                )
-                x[i] = 0.0
-
-        return np.clip(x, 0.0, 1.0)
+        return self._codec.encode_one(params)
 
     def _closest_pop_idx(self, params: Dict[str, Any]) -> Optional[int]:
         """
-        Find the index of the agent whose mean is closest (in normalized space)
-        to the encoded params. Returns None if no usable agent.
+        Find the index of the population whose mean is closest (in normalized
+        space) to the encoded params. Returns None if there is no population.
         """
-        if not self._agents:
+        if self.n_agents == 0:
             return None
 
         x = self._encode_to_normalized(params)
-        best_idx = None
-        best_dist = float("inf")
-
-        for idx, agent in enumerate(self._agents):
-            if agent.mean is None:
-                continue
-            dist = float(np.linalg.norm(x - agent.mean))
-            if dist < best_dist:
-                best_dist = dist
-                best_idx = idx
-
-        return best_idx
+        return int(self._pops.closest(x)[0])
 
-    def _restart_agent(self, idx: int) -> None:
+    def _restart_agents(self, idx: np.ndarray) -> None:
         """
-        Restart the specified CMAAgent with a fresh random mean.
+        Restart the specified populations with fresh random means.
         """
-        ag = CMAAgent(
-            self.parameters_def,
-            sigma0=self._sigma0,
-            population_size=self._pop_size_hint,
-        )
-        ag.mean = np.random.rand(ag.dim)
-        self._agents[idx] = ag
-        logger.info(f"[AgentCMAES] Restarted CMAAgent #{idx} with new random mean")
+        self._pops.reset(idx, means=self._init_sampler.sample_unit(len(idx)))
+        logger.debug(f"[AgentCMAES] Restarted CMA populations {list(idx)} with new random means")
 
     def _maybe_restart_similar_agents(self) -> None:
         """
-        Greedy restart: go through agents in order, and if agent i is too close
-        to any previous agent j (< i) in normalized space, restart agent i.
+        Greedy restart: if population i is too close to any previous
+        population j (< i) in normalized space, restart population i.
+        """
+        restart = np.flatnonzero(self._pops.too_close(self._restart_min_dist))
+        if restart.size:
+            self._restart_agents(restart)
+
+    def telemetry_state(self) -> Tuple[np.ndarray, np.ndarray, int]:
+        """
+        Per-population sigma and mean norm, and number of archived points.
         """
-        means = [agent.mean for agent in self._agents]
-
-        for i in range(self.n_agents):
-            mean_i = means[i]
-            if mean_i is None:
-                continue
-            for j in range(i):
-                mean_j = means[j]
-                if mean_j is None:
-                    continue
-                dist = float(np.linalg.norm(mean_i - mean_j))
-                if dist < self._restart_min_dist:
-                    logger.info(
-                        f"[AgentCMAES] Agents #{i} and #{j} too close "
-                        f"(dist={dist:.4f}) -> restart #{i}"
-                    )
-                    self._restart_agent(i)
-                    break  # move to next i after restarting
+        return (
+            self._pops.sigma,
+            np.linalg.norm(self._pops.mean, axis=1),
+            sum(len(archive) for archive in self._pops.archives),
+        )
 
+    # ----------------------------------------------------------------------
+    # API
+    # ----------------------------------------------------------------------
 
     def play(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
         """
-        Choose one CMAAgent and propose ONE parameter set.
+        Choose one population and propose ONE parameter set.
+        """
+        return self.play_batch(1)[0]
+
+    @instrumented("play")
+    def play_batch(self, n: int) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """
+        Propose `n` parameter sets, each from a randomly chosen population,
+        sampled in one batched draw.
         """
-        logger.info("AgentCMAES: Playing")
-        if not self._agents:
+        if self.n_agents == 0:
             raise RuntimeError("AgentCMAES: optimizers not initialized")
 
-        pop_idx = int(np.random.randint(self.n_agents))
+        pop_idx = np.random.randint(self.n_agents, size=n)
 
-        logger.info(f"AgentCMAES: Using agent #{pop_idx} to sample parameters")
-        agent = self._agents[pop_idx]
-        params = agent.play()
+        X, _ = self._pops.ask(pop_idx)
+        params_list = self._codec.decode(X)
 
-        metadata = {"agent_name": AGENT_NAME, "pop_idx": pop_idx}
-        return params, metadata
+        return [
+            (params, {"agent_name": self.agent_name, "pop_idx": int(p)})
+            for params, p in zip(params_list, pop_idx)
+        ]
 
+    @instrumented("update")
     def update(
         self,
         params: Dict[str, Any],
@@ -248,55 +194,58 @@ class AgentCMAES:
         metadata: Dict[str, Any],
     ) -> None:
         """
-        Update the appropriate CMAAgent with a new (params, score) sample.
+        Update the appropriate population with a new (params, score) sample.
         """
         agent_name = metadata["agent_name"]
-        logger.info(
-            f"### AgentCMAES: Updating"
-        )
-
-        if agent_name not in [AGENT_NAME, AGENT_MANUAL]:
-            logger.info(
-                f"{agent_name} != {AGENT_NAME} or {AGENT_MANUAL}, skipping update"
-            )
+        if agent_name not in [self.agent_name, AGENT_MANUAL]:
+            logger.debug("%s != %s or %s, skipping update", agent_name, self.agent_name, AGENT_MANUAL)
             return
 
-        logger.info(f"AgentCMAES metadata: {metadata}")
         self._time += 1
 
         normalized_score = float(score) / float(SCORE_SCALE)
 
-        if agent_name == AGENT_NAME:
+        if agent_name == self.agent_name:
             pop_idx = int(metadata["pop_idx"])
         else:
-            # manual agent: find closest CMAAgent
+            # manual agent: find closest population
             closest_idx = self._closest_pop_idx(params)
             if closest_idx is not None:
                 pop_idx = closest_idx
-                logger.info(
-                    f"AgentCMAES: unknown pop_idx, using closest pop_idx = {pop_idx}"
-                )
+                logger.debug("AgentCMAES: unknown pop_idx, using closest pop_idx = %d", pop_idx)
             else:
                 # fallback to a random agent
                 pop_idx = int(np.random.randint(self.n_agents))
-                logger.info(
-                    f"AgentCMAES: unknown pop_idx, using random agent #{pop_idx}"
-                )
+                logger.debug("AgentCMAES: unknown pop_idx, using random agent #%d", pop_idx)
 
-        self._agents[pop_idx].update(params, normalized_score, metadata)
+        self._pops.add(pop_idx, self._encode_to_normalized(params), normalized_score)
 
         self._maybe_restart_similar_agents()
 
+    @instrumented("time_warp")
     def time_warp(self, time_increment: int) -> None:
         """
-        Simulate a time warp by adjusting the internal state of all CMAAgents.
+        Simulate a time warp by adjusting the step-size of all populations.
 
         time_increment: positive integer indicating how much time has passed.
         """
-        logger.info(
-            f"AgentCMAES: Time warped by {time_increment}, updating all agents."
-        )
         self._time += time_increment
-        for idx, agent in enumerate(self._agents):
-            logger.info(f"AgentCMAES: time_warp for agent #{idx}")
-            agent.time_warp(time_increment)
+        self._pops.time_warp(time_increment)
+
+
+class AgentSepCMAES(AgentCMAES):
+    """
+    AgentCMAES with separable (diagonal covariance) populations for
+    high-dimensional sketches; small problems (d <= full_covariance_max_dim)
+    still get full covariance unless covariance="diagonal" is forced.
+    """
+
+    agent_name = AGENT_SEP_NAME
+
+    def __init__(
+        self,
+        parameters_def: Dict[str, Dict[str, Any]],
+        covariance: str = "auto",
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(parameters_def, covariance=covariance, **kwargs)
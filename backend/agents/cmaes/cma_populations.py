@@ -0,0 +1,378 @@
+import logging
+from typing import Optional, Tuple
+
+import numpy as np
+
+from ..utils.history import History
+
+logger = logging.getLogger(__name__)
+
+
+class CMAPopulations:
+    """
+    P independent CMA-ES populations over the same normalized space [0, 1]^d,
+    stored as stacked arrays:
+      - means (P, d) and global step-sizes sigma (P,)
+      - full covariance matrices C (P, d, d)
+      - evolution paths p_sigma (ps) and p_c (pc), (P, d)
+      - cached eigendecompositions C = B diag(D^2) B^T: B (P, d, d), D (P, d)
+      - one History ring buffer of encoded evaluated points per population
+
+    With `diagonal=True` the populations follow sep-CMA-ES (Ros & Hansen,
+    2008): C is diagonal and stored as its (P, d) diagonal, D = sqrt(C) and
+    there is no B, so play/update cost O(d) instead of O(d^2)-O(d^3). The
+    covariance learning rates are scaled up by (d + 2) / 3 as in the paper.
+
+    Sampling, nearest-population lookup and restarts of populations that got
+    too close are batched NumPy operations over the stack. All populations
+    share the same strategy parameters (same d and λ).
+
+    API:
+      - ask(pop_idx)             : one sample per entry of pop_idx
+      - tell(p, X, scores)       : one generation update of population p
+      - add(p, x, score)         : archive a point, then tell the last λ
+      - closest(X)               : index of the nearest mean for each row
+      - too_close(min_dist)      : populations to restart (greedy rule)
+      - reset(idx, means)        : fresh state for the given populations
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        n_pops: int = 1,
+        sigma0: float = 0.3,
+        population_size: Optional[int] = 10,
+        eigen_update_interval: Optional[int] = None,
+        diagonal: bool = False,
+    ) -> None:
+        """
+        dim           : dimension of the normalized space
+        n_pops        : number of populations P
+        sigma0        : initial global step-size in normalized space
+        population_size: used as λ (nominal population size)
+        eigen_update_interval: number of generations between two
+                        eigendecompositions of C (None: standard lazy gap
+                        1 / (10 * dim * (c1 + cmu)), at least 1)
+        diagonal      : separable CMA-ES (diagonal C) instead of full C
+        """
+        self.dim = int(dim)
+        self.diagonal = bool(diagonal)
+        self.n_pops = int(n_pops)
+        self.sigma0 = float(sigma0)
+        self.population_size = population_size
+
+        # Exploration adjustment parameters for time_warp
+        self.factor_per_step = 1.2  # multiplicative factor per time step
+        self.sigma_min = 1e-3  # minimum sigma
+        self.sigma_max = 1.0  # maximum sigma
+
+        # Strategy parameters (standard CMA-ES formulas, adapted)
+        self._init_strategy_params()
+
+        if eigen_update_interval is None:
+            eigen_update_interval = int(1.0 / (10.0 * self.dim * (self.c1 + self.cmu)))
+        self.eigen_update_interval = max(1, int(eigen_update_interval))
+
+        # For CSA (expected length of N(0, I))
+        self.chiN = np.sqrt(self.dim) * (
+            1.0 - 1.0 / (4.0 * self.dim) + 1.0 / (21.0 * self.dim**2)
+        )
+
+        # Archive of evaluated points, kept encoded: ring buffer of the
+        # last archive_max_size points (tell() only uses the last λ)
+        self.archive_max_size = max(50, self._lambda)
+
+        P, d = self.n_pops, self.dim
+        self.mean = np.empty((P, d), dtype=float)
+        self.sigma = np.empty(P, dtype=float)
+        # full mode: C (P, d, d); diagonal mode: diag(C) (P, d)
+        self.C = np.empty((P, d) if self.diagonal else (P, d, d), dtype=float)
+        self.pc = np.empty((P, d), dtype=float)
+        self.ps = np.empty((P, d), dtype=float)
+        # number of tell() calls that actually did an update
+        self.generation = np.empty(P, dtype=np.int64)
+
+        # eigenvectors of C (columns), not used in diagonal mode
+        self.B = None if self.diagonal else np.empty((P, d, d), dtype=float)
+        self.D = np.empty((P, d), dtype=float)  # sqrt of eigenvalues of C
+        self._eigen_generation = np.empty(P, dtype=np.int64)
+        self._eigen_stale = np.empty(P, dtype=bool)
+
+        self.archives = [History(d, capacity=self.archive_max_size) for _ in range(P)]
+
+        self.reset(np.arange(P))
+
+    # ------------------------------------------------------------------
+    # Strategy parameter initialization
+    # ------------------------------------------------------------------
+    def _init_strategy_params(self) -> None:
+        dim = self.dim
+        if self.population_size is not None:
+            _lambda = self.population_size
+        else:
+            _lambda = 4 + int(3 * np.log(dim)) # theoretical formula
+
+        _lambda = max(_lambda, 4)
+        self._lambda = _lambda
+
+        # µ = number of selected (elite) individuals
+        self.mu = _lambda // 2
+        # log weights for recombination
+        weights = np.log(self.mu + 0.5) - np.log(np.arange(1, self.mu + 1))
+        self.weights = weights / np.sum(weights)
+        self.mu_eff = 1.0 / np.sum(self.weights**2)  # effective µ
+
+        # Step-size control parameters (CSA)
+        self.cs = (self.mu_eff + 2) / (dim + self.mu_eff + 5)
+        self.ds = 1 + 2 * max(0, np.sqrt((self.mu_eff - 1) / (dim + 1)) - 1) + self.cs
+
+        # Covariance matrix adaptation parameters
+        self.cc = (4 + self.mu_eff / dim) / (dim + 4 + 2 * self.mu_eff / dim)
+        self.c1 = 2 / ((dim + 1.3) ** 2 + self.mu_eff)
+        alpha_mu = 2
+        self.cmu = min(
+            1 - self.c1,
+            alpha_mu
+            * (self.mu_eff - 2 + 1 / self.mu_eff)
+            / ((dim + 2) ** 2 + alpha_mu * self.mu_eff),
+        )
+
+        # sep-CMA-ES: faster covariance learning for the diagonal model
+        if self.diagonal:
+            self.c1 *= (dim + 2) / 3.0
+            self.cmu = min(1 - self.c1, self.cmu * (dim + 2) / 3.0)
+
+    # ------------------------------------------------------------------
+    # State management
+    # ------------------------------------------------------------------
+    def reset(self, idx: np.ndarray, means: Optional[np.ndarray] = None) -> None:
+        """
+        Give the populations `idx` a fresh state (sigma0, C = I, empty paths
+        and archive), centered on `means` (default: center of the space).
+        """
+        idx = np.atleast_1d(np.asarray(idx, dtype=np.intp))
+        self.mean[idx] = 0.5 if means is None else means
+        self.sigma[idx] = self.sigma0
+        self.C[idx] = 1.0 if self.diagonal else np.eye(self.dim)
+        self.pc[idx] = 0.0
+        self.ps[idx] = 0.0
+        self.generation[idx] = 0
+
+        if not self.diagonal:
+            self.B[idx] = np.eye(self.dim)
+        self.D[idx] = 1.0
+        self._eigen_generation[idx] = 0
+        self._eigen_stale[idx] = False
+
+        for i in idx:
+            self.archives[i].clear()
+
+    def _update_eigensystems(self, idx: np.ndarray, force: bool = False) -> None:
+        """
+        Refresh B and D of the populations `idx` whose C changed and whose
+        last decomposition is at least `eigen_update_interval` generations
+        old (or all changed ones if `force`), in one stacked eigh.
+        """
+        if self.diagonal:
+            # D = sqrt(diag(C)) is kept up to date by tell()
+            return
+
+        idx = np.atleast_1d(np.asarray(idx, dtype=np.intp))
+        due = self._eigen_stale[idx]
+        if not force:
+            age = self.generation[idx] - self._eigen_generation[idx]
+            due &= age >= self.eigen_update_interval
+        idx = idx[due]
+        if idx.size == 0:
+            return
+
+        eigvals, eigvecs = np.linalg.eigh(self.C[idx])
+        eigvals = np.maximum(eigvals, 1e-12)
+        self.B[idx] = eigvecs
+        self.D[idx] = np.sqrt(eigvals)
+        self._eigen_generation[idx] = self.generation[idx]
+        self._eigen_stale[idx] = False
+
+    # ------------------------------------------------------------------
+    # Sampling / lookup
+    # ------------------------------------------------------------------
+    def ask(self, pop_idx: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Draw one sample from N(mean_p, sigma_p^2 * C_p) for each entry p of
+        `pop_idx`.
+
+        Returns
+        -------
+        X : np.ndarray
+            Samples in normalized space, clipped to [0, 1], shape (n, dim).
+        Z : np.ndarray
+            Standard normal vectors such that X = clip(mean + sigma * B D z),
+            shape (n, dim).
+        """
+        pop_idx = np.atleast_1d(np.asarray(pop_idx, dtype=np.intp))
+        self._update_eigensystems(np.unique(pop_idx))
+
+        # y = B D z ~ N(0, C), one row per sample
+        Z = np.random.randn(pop_idx.size, self.dim)
+        if self.diagonal:
+            Y = self.D[pop_idx] * Z
+        else:
+            Y = np.einsum("nij,nj->ni", self.B[pop_idx], self.D[pop_idx] * Z)
+        X = np.clip(self.mean[pop_idx] + self.sigma[pop_idx, None] * Y, 0.0, 1.0)
+        return X, Z
+
+    def closest(self, X: np.ndarray) -> np.ndarray:
+        """
+        Index of the population whose mean is closest to each row of X.
+        """
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        diff = X[:, None, :] - self.mean[None, :, :]
+        return np.argmin(np.einsum("npd,npd->np", diff, diff), axis=1)
+
+    def too_close(self, min_dist: float) -> np.ndarray:
+        """
+        Greedy restart rule: population i must restart if its mean is closer
+        than `min_dist` to the mean of any population j < i.
+
+        Returns a boolean mask of shape (P,).
+        """
+        diff = self.mean[:, None, :] - self.mean[None, :, :]
+        dist = np.sqrt(np.einsum("ijd,ijd->ij", diff, diff))
+        earlier = np.tril(np.ones((self.n_pops, self.n_pops), dtype=bool), k=-1)
+        return np.any((dist < min_dist) & earlier, axis=1)
+
+    # ------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------
+    def tell(self, p: int, X: np.ndarray, scores: np.ndarray) -> None:
+        """
+        One CMA-ES generation of population p from evaluated samples
+        (higher score is better).
+
+        X      : samples in normalized space, shape (n, dim), n >= 4
+        scores : their scores, shape (n,)
+        """
+        xs = np.atleast_2d(np.asarray(X, dtype=float))
+        scores = np.asarray(scores, dtype=float)
+
+        # Sort by score (best first)
+        idx = np.argsort(-scores)  # descending
+        xs = xs[idx]
+        scores = scores[idx]
+
+        # Number of offspring actually used this "generation"
+        lam_eff = xs.shape[0]
+        if lam_eff < 4:
+            return
+
+        # Number of elites can't exceed available points
+        mu_eff = min(self.mu, lam_eff)
+        weights = self.weights[:mu_eff]
+        weights = weights / np.sum(weights)  # re-normalize if mu_eff < self.mu
+
+        # Old mean (m_t)
+        m_old = self.mean[p].copy()
+        sigma_old = float(self.sigma[p])
+
+        # New mean m_{t+1} as weighted recombination of elites
+        elite = xs[:mu_eff]
+        mean_new = weights @ elite
+
+        # Mean step in normalized space
+        y_mean = (mean_new - m_old) / sigma_old  # "normalized" mean step
+
+        # Update evolution path for sigma: ps
+        # C^{-1/2} y = B D^{-1} B^T y, from the cached decomposition
+        if self.diagonal:
+            C_inv_sqrt_y = y_mean / self.D[p]
+        else:
+            self._update_eigensystems(p)
+            B = self.B[p]
+            C_inv_sqrt_y = B @ ((B.T @ y_mean) / self.D[p])
+
+        # recompute mu_eff for this generation
+        mu_eff_here = 1.0 / np.sum(weights**2)
+
+        self.ps[p] = (1 - self.cs) * self.ps[p] + np.sqrt(
+            self.cs * (2 - self.cs) * self.mu_eff
+        ) * C_inv_sqrt_y
+
+        # Step-size control (CSA)
+        ps_norm = float(np.linalg.norm(self.ps[p]))
+        sigma_new = sigma_old * np.exp(
+            (self.cs / self.ds) * (ps_norm / self.chiN - 1.0)
+        )
+
+        # h_sigma: indicator for successful evolution path
+        self.generation[p] += 1
+        h_sigma_cond = ps_norm / np.sqrt(1 - (1 - self.cs) ** (2 * self.generation[p]))
+        h_sigma = 1.0 if h_sigma_cond < (1.4 + 2 / (self.dim + 1)) * self.chiN else 0.0
+
+        # Update evolution path for covariance: pc (still using y_mean with sigma_old)
+        self.pc[p] = (1 - self.cc) * self.pc[p] + h_sigma * np.sqrt(
+            self.cc * (2 - self.cc) * mu_eff_here
+        ) * y_mean
+
+        # Rank-µ update: use top mu_eff individuals relative to old mean,
+        # normalized by σ_t
+        artmp = (elite - m_old) / sigma_old
+
+        # Covariance matrix update
+        C_old = self.C[p]
+        C_new = (1 - self.c1 - self.cmu) * C_old
+        if self.diagonal:
+            # Same update restricted to the diagonal
+            C_new += self.c1 * (
+                self.pc[p] ** 2 + (1 - h_sigma) * self.cc * (2 - self.cc) * C_old
+            )
+            C_new += self.cmu * (weights @ artmp**2)
+            self.C[p] = C_new
+            self.D[p] = np.sqrt(np.maximum(C_new, 1e-12))
+        else:
+            # Rank-one part
+            C_new += self.c1 * (
+                np.outer(self.pc[p], self.pc[p])
+                + (1 - h_sigma) * self.cc * (2 - self.cc) * C_old
+            )
+            # Rank-µ part: sum_k w_k a_k a_k^T as a single product
+            C_new += self.cmu * (artmp.T * weights) @ artmp
+
+            self.C[p] = 0.5 * (C_new + C_new.T)
+            self._eigen_stale[p] = True
+        self.mean[p] = mean_new
+
+        # update sigma using sigma_new, clamped
+        self.sigma[p] = float(np.clip(sigma_new, self.sigma_min, self.sigma_max))
+
+    def add(self, p: int, x: np.ndarray, score: float) -> None:
+        """
+        Append an encoded point to the archive of population p. Once the
+        archive has enough points, perform a CMA-ES update (tell) on the
+        last λ of them.
+        """
+        archive = self.archives[p]
+        archive.append(x, float(score), p)
+
+        if len(archive) < 4:
+            return
+
+        # Use at most the last self._lambda points from archive
+        last = archive.last(self._lambda)
+        self.tell(p, archive.X[last], archive.scores[last])
+
+    def time_warp(self, time_increment: int, idx: Optional[np.ndarray] = None) -> None:
+        """
+        Adjust exploration level of the populations `idx` (default: all).
+
+        time_increment:
+            > 0  -> move forward in time  -> less exploration (decrease sigma)
+            < 0  -> move backward in time -> more exploration (increase sigma)
+            = 0  -> no change
+        """
+        if time_increment == 0:
+            return
+        if idx is None:
+            idx = np.arange(self.n_pops)
+
+        scale = self.factor_per_step ** (-time_increment)
+        self.sigma[idx] = np.clip(self.sigma[idx] * scale, self.sigma_min, self.sigma_max)
@@ -3,13 +3,16 @@ import random
 from typing import Any, Dict, List, Optional, Tuple
 
 import numpy as np
-from sklearn.cluster import KMeans
 
+from ..utils.codec import ParamCodec
+from ..utils.history import History
+from ..utils.kmeans import IncrementalKMeans
 from ..utils.sampler import (
+    QuasiRandomSampler,
     sample_random_params,
-    sample_gaussian_around,
-    normalize_params,
+    sample_gaussian_around_normalized,
 )
+from ..utils.telemetry import AgentTelemetry, instrumented, population_mean_norms
 
 logger = logging.getLogger(__name__)
 
@@ -18,15 +21,29 @@ AGENT_MANUAL = "manual"
 
 
 class AgentGaussian:
-    def __init__(self, parameters_def: Dict[str, Dict[str, Any]]) -> None:
+    def __init__(
+        self,
+        parameters_def: Dict[str, Dict[str, Any]],
+        sampling: str = "uniform",
+    ) -> None:
+        """
+        parameters_def: dict { name: { "type": "float"/"integer"/"choice", "range": [min, max], ... } }
+        sampling: warm-up sampling, "uniform" or a space-filling sequence
+                  ("sobol", "halton", "lhs")
+        """
         logger.info("Initializing AgentGaussian")
         # { name: { "type": ..., "min": ..., "max": ... } }
         self.parameters_def = parameters_def
+        self.codec = ParamCodec(parameters_def)
+
+        self.sampler = None
+        if sampling != "uniform":
+            self.sampler = QuasiRandomSampler(self.codec, method=sampling)
 
-        # history: list of (params, score, pop_idx)
-        self.history = []
         self.population_size = 2
         self.max_history_length = 4 * self.population_size
+        # history: normalized params, score and pop_idx of evaluated points
+        self.history = History(self.codec.dim, capacity=self.max_history_length + 1)
 
         # per-population sigmas in normalized space
         self.sigmas = {pop_idx: 1.0 for pop_idx in range(self.population_size)}
@@ -39,8 +56,19 @@ class AgentGaussian:
             for name, pdef in parameters_def.items()
             if pdef.get("type") in ("float", "integer")
         ]
+        self._clustering_cols = [
+            self.codec.names.index(name)
+            for name in self.parameters_for_clustering
+            if name in self.codec.names
+        ]
+
+        # Centroids kept between history reductions (warm start)
+        self._kmeans = IncrementalKMeans(n_clusters=self.population_size, seed=0)
 
         self.time = 0
+        self.telemetry = AgentTelemetry()
+        # mean norm of each population, refreshed when the history changes
+        self._mean_norms = np.full(self.population_size, np.nan)
 
     # --------------------------------------------------------------------- #
     # Internals
@@ -51,31 +79,27 @@ class AgentGaussian:
         Cluster history into `population_size` clusters and keep one
         representative per cluster, updating history and sigmas.
         """
-        logger.info("Performing clustering to reduce history size")
+        logger.debug("Performing clustering to reduce history size")
 
         if len(self.history) <= self.population_size:
             return
 
-        # Build data matrix in normalized space
-        data = []
-        for params, score, pop_idx in self.history:
-            norm_p = normalize_params(params, self.parameters_def)
-            row = [norm_p[name] for name in self.parameters_for_clustering]
-            data.append(row)
-
-        data = np.array(data)
+        # Data matrix in normalized space, straight from the history
+        data = self._history_data()
 
-        # Cluster into population_size clusters
-        kmeans = KMeans(n_clusters=self.population_size, random_state=0).fit(data)
+        # Cluster into population_size clusters, warm-started from the
+        # centroids of the previous reduction
+        labels = self._kmeans.partial_fit(data)
 
-        # Collect points per cluster
+        # Collect points (history indices) per cluster
         best_points = {i: [] for i in range(self.population_size)}
-        for idx, label in enumerate(kmeans.labels_):
-            params, score, pop_idx = self.history[idx]
-            best_points[label].append((params, score, pop_idx))
+        for idx, label in enumerate(labels):
+            best_points[label].append(idx)
 
         old_sigmas = self.sigmas.copy()
-        new_history = []
+        old_pop_idxs = self.history.pop_idx
+        new_rows = []
+        new_pop_idxs = []
         new_sigmas = {}
 
         # Shuffle new population indices to avoid bias
@@ -83,9 +107,8 @@ class AgentGaussian:
         random.shuffle(available_new_pop_idxs)
 
         for cluster_idx in range(self.population_size):
-            points = best_points[cluster_idx]
-
-            params_i, score_i, old_pop_idx_i = agglomerate_best_points(points)
+            idx_i = agglomerate_best_points(best_points[cluster_idx])
+            old_pop_idx_i = int(old_pop_idxs[idx_i])
 
             if old_pop_idx_i in available_new_pop_idxs:
                 new_pop_idx = old_pop_idx_i
@@ -96,7 +119,7 @@ class AgentGaussian:
             sigma = old_sigmas[old_pop_idx_i]
 
             # If the cluster is too small, increase sigma for exploration
-            if len(points) <= 1:
+            if len(best_points[cluster_idx]) <= 1:
                 if sigma < 0.1:
                     sigma = 0.1
                 elif sigma < 0.2:
@@ -106,10 +129,12 @@ class AgentGaussian:
                 else:
                     sigma = 1.0
 
-            new_history.append((params_i, score_i, new_pop_idx))
+            new_rows.append(idx_i)
+            new_pop_idxs.append(new_pop_idx)
             new_sigmas[new_pop_idx] = sigma
 
-        self.history = new_history
+        self.history.keep(new_rows)
+        self.history.pop_idx[:] = new_pop_idxs
         self.sigmas = new_sigmas
 
     def _closest_agent_idx(self, params: Dict[str, Any]) -> Optional[int]:
@@ -120,51 +145,61 @@ class AgentGaussian:
         if not self.history:
             return None
 
-        norm_params = normalize_params(params, self.parameters_def)
+        x = self._encode_for_clustering([params])[0]
+        data = self._history_data()
+        dists = np.sqrt(np.sum((data - x) ** 2, axis=1))
 
-        distance = float("inf")
-        closest_idx = None
+        return int(self.history.pop_idx[int(np.argmin(dists))])
 
-        for base_params, _, pop_idx in self.history:
-            norm_base_params = normalize_params(base_params, self.parameters_def)
-
-            dist = 0.0
-            for name in self.parameters_for_clustering:
-                p1 = norm_params[name]
-                p2 = norm_base_params[name]
-                dist += (p1 - p2) ** 2
-            dist = float(np.sqrt(dist))
+    def _encode_for_clustering(self, params_list: List[Dict[str, Any]]) -> np.ndarray:
+        """
+        Encode params into normalized space, keeping clustering columns only.
+        """
+        X = self.codec.encode(params_list, clip=False)
+        return X[:, self._clustering_cols]
 
-            if dist < distance:
-                distance = dist
-                closest_idx = pop_idx
+    def _history_data(self) -> np.ndarray:
+        """
+        Clustering columns of the history (absent values count as 0.0, the
+        encoding of the lower bound, as in `_encode_for_clustering`).
+        """
+        return np.nan_to_num(self.history.X[:, self._clustering_cols])
 
-        return closest_idx
+    def telemetry_state(self) -> Tuple[np.ndarray, np.ndarray, int]:
+        """
+        Per-population sigma and mean norm of the kept points, history size.
+        """
+        sigma = np.array([self.sigmas[p] for p in range(self.population_size)])
+        return sigma, self._mean_norms, len(self.history)
 
     # ------------------------------------------------------------------------- #
+    @instrumented("play")
     def play(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
         """
         Generate a new parameter set and associated metadata.
         """
-        logger.info("AgentGaussian: Generating parameters")
 
         if len(self.history) < self.population_size:
             # Warm-up: sample uniformly at random
             pop_idx = len(self.history)
-            params = sample_random_params(self.parameters_def)
+            if self.sampler is not None:
+                params = self.sampler.sample_params(1)[0]
+            else:
+                params = sample_random_params(self.parameters_def, codec=self.codec)
         else:
             # Exploration: sample around a previously good point
-            base_params, _, pop_idx = random.choice(self.history)
-            params = sample_gaussian_around(
-                base_params,
+            i = random.randrange(len(self.history))
+            pop_idx = int(self.history.pop_idx[i])
+            params = sample_gaussian_around_normalized(
+                self.history.X[i],
                 sigma=self.sigmas[pop_idx],
-                parameters_def=self.parameters_def,
+                codec=self.codec,
             )
 
         metadata = {"agent_name": AGENT_NAME, "pop_idx": pop_idx}
-        logger.info(f"AgentGaussian: Generated parameters with pop_idx {pop_idx}")
         return params, metadata
 
+    @instrumented("update")
     def update(
         self,
         params: Dict[str, Any],
@@ -174,21 +209,15 @@ class AgentGaussian:
         """
         Update internal state with the result of playing a given parameter set.
         """
-        logger.info("Update AgentGaussian")
-
         if metadata is None:
             logger.warning("AgentGaussian.update called with metadata=None, skipping")
             return
 
         agent_name = metadata["agent_name"]
         if agent_name not in [AGENT_NAME, AGENT_MANUAL]:
-            logger.info(
-                f"{agent_name} != {AGENT_NAME} or {AGENT_MANUAL}, skipping update"
-            )
+            logger.debug("%s != %s or %s, skipping update", agent_name, AGENT_NAME, AGENT_MANUAL)
             return
 
-        logger.info(f"metadata: {metadata}")
-
         if agent_name == AGENT_NAME:
             pop_idx = metadata["pop_idx"]
         else:
@@ -196,41 +225,43 @@ class AgentGaussian:
             closest_idx = self._closest_agent_idx(params)
             if closest_idx is not None:
                 pop_idx = closest_idx
-                logger.info(f"Unknown params, assigned to closest pop_idx #{pop_idx}")
+                logger.debug("Unknown params, assigned to closest pop_idx #%d", pop_idx)
             else:
                 pop_idx = int(np.random.randint(self.population_size))
-                logger.info(f"Unknown params, assigned randomly to pop_idx #{pop_idx}")
+                logger.debug("Unknown params, assigned randomly to pop_idx #%d", pop_idx)
 
-        self.history.append((params, score, pop_idx))
+        self.history.append(
+            self.codec.encode_one(params, missing=np.nan, clip=False), score, pop_idx
+        )
         self.sigmas[pop_idx] = max(
             self.sigma_min, self.sigmas[pop_idx] * self.sigma_decay
         )
 
         if len(self.history) > self.max_history_length:
             self._reduction_history_size()
+        self._mean_norms = population_mean_norms(
+            self.history.X, self.history.pop_idx, np.arange(self.population_size)
+        )
 
         self.time += 1
-        logger.info(f"AgentGaussian time step: {self.time}")
 
+    @instrumented("time_warp")
     def time_warp(self, time_increment: int) -> None:
         """
         Advance internal time by `time_increment` steps and decay sigmas as if
         that many updates had happened.
         """
-        logger.info(f"AgentGaussian: time_warp called with increment {time_increment}")
         decay_factor = self.sigma_decay**time_increment
         self.sigmas = {
             pop_idx: max(self.sigma_min, sigma * decay_factor)
             for pop_idx, sigma in self.sigmas.items()
         }
-        logger.info(f"AgentGaussian: sigmas after time_warp: {self.sigmas}")
 
 
-def agglomerate_best_points(
-    points: List[Tuple[Dict[str, Any], float, int]],
-) -> Tuple[Dict[str, Any], float, int]:
+def agglomerate_best_points(indices: List[int]) -> int:
     """
-    Aggregate a list of (params, score, pop_idx) into a single representative.
+    Aggregate a cluster of history entries (given by their positions) into
+    a single representative and return its position.
     Currently: pick a random point from the list.
     """
-    return random.choice(points)
+    return random.choice(indices)
@@ -2,10 +2,16 @@ import logging
 import random
 from typing import Any, Dict, List, Optional, Tuple
 
+import numpy as np
+
+from ..utils.archive import RepulsiveArchive
+from ..utils.codec import ParamCodec
+from ..utils.history import History
 from ..utils.sampler import (
     sample_random_params,
-    sample_gaussian_around,
+    sample_gaussian_around_normalized,
 )
+from ..utils.telemetry import AgentTelemetry, instrumented
 
 logger = logging.getLogger(__name__)
 
@@ -24,18 +30,32 @@ class AgentOpenEnded:
     - pop_idx >= 1 are exploitation populations centered on previously good params.
     """
 
-    def __init__(self, parameters_def: Dict[str, Dict[str, Any]]) -> None:
+    def __init__(
+        self,
+        parameters_def: Dict[str, Dict[str, Any]],
+        max_repulsive_points: int = 1000,
+        repulsive_merge_radius: float = 0.02,
+    ) -> None:
+        """
+        parameters_def: dict { name: { "type": "float"/"integer"/"choice", "range": [min, max], ... } }
+        max_repulsive_points: capacity of the repulsive-point archive
+        repulsive_merge_radius: repulsive points closer than this (normalized
+                                space) are merged into one
+        """
         logger.info("Initializing AgentInfinite")
         # { name: { "type": ..., "min": ..., "max": ... } }
         self.parameters_def = parameters_def
+        self.codec = ParamCodec(parameters_def)
 
         self.population_size: int = 1
         self.max_population_size: int = None
 
-        # History of (params, score) per population index
-        self.history = {pop_idx: [] for pop_idx in range(self.population_size)}
         self.max_history_length: int = 10
         self.restart_population_size: int = 4
+        # History of normalized params and scores per population index
+        self.history: Dict[int, History] = {
+            pop_idx: self._new_history() for pop_idx in range(self.population_size)
+        }
 
         # Note: pop_idx 0's sigma is not used (only random sampling).
         self.sigmas = {pop_idx: 1.0 for pop_idx in range(self.population_size)}
@@ -45,9 +65,23 @@ class AgentOpenEnded:
 
         self.min_exploration_probability: float = 1.0 / 4.0
 
-        self.repulsive_points = []
+        # Bounded, indexed archive of normalized points to repel from
+        self.repulsive_archive = RepulsiveArchive(
+            self.codec.dim,
+            capacity=max_repulsive_points,
+            merge_radius=repulsive_merge_radius,
+        )
 
         self.time: int = 0
+        self.telemetry = AgentTelemetry()
+        # Mean norm and size of the history of each population (index =
+        # pop_idx), refreshed when that history changes
+        self._mean_norms: List[float] = [np.nan] * self.population_size
+        self._history_sizes: List[int] = [0] * self.population_size
+        self._history_size: int = 0
+
+    def _new_history(self) -> History:
+        return History(self.codec.dim, capacity=self.max_history_length + 1)
 
     def _reduce_history_size(self, pop_idx: int) -> None:
         """
@@ -58,12 +92,13 @@ class AgentOpenEnded:
         if len(current_history) <= self.max_history_length:
             return
 
-        logger.info(
-            f"Reducing history size for pop_idx {pop_idx}: {len(current_history)} -> {self.restart_population_size}"
+        logger.debug(
+            "Reducing history size for pop_idx %d: %d -> %d",
+            pop_idx, len(current_history), self.restart_population_size,
         )
 
         target_size = min(self.restart_population_size, len(current_history))
-        self.history[pop_idx] = random.sample(current_history, target_size)
+        current_history.keep(random.sample(range(len(current_history)), target_size))
 
     def _select_population_idx(self) -> int:
         """
@@ -81,16 +116,42 @@ class AgentOpenEnded:
         )
 
         if random_float < exploration_probability or self.population_size == 1:
-            logger.info("Population selection: exploration (pop_idx=0)")
+            logger.debug("Population selection: exploration (pop_idx=0)")
             return 0
 
         pop_indices = list(self.sigmas.keys())[1:]
         weights = [self.sigmas[i] for i in pop_indices]
 
         chosen = random.choices(population=pop_indices, weights=weights, k=1)[0]
-        logger.info(f"Population selection: exploitation (pop_idx={chosen})")
+        logger.debug("Population selection: exploitation (pop_idx=%d)", chosen)
         return chosen
 
+    def _history_changed(self, pop_idx: int) -> None:
+        """
+        Refresh the telemetry of population `pop_idx` after its history
+        changed (the other populations are left as they are).
+        """
+        while len(self._mean_norms) <= pop_idx:
+            self._mean_norms.append(np.nan)
+            self._history_sizes.append(0)
+
+        history = self.history[pop_idx]
+        self._mean_norms[pop_idx] = (
+            float(np.linalg.norm(np.nan_to_num(history.X).mean(axis=0))) if history else np.nan
+        )
+        self._history_size += len(history) - self._history_sizes[pop_idx]
+        self._history_sizes[pop_idx] = len(history)
+
+    def telemetry_state(self) -> Tuple[np.ndarray, np.ndarray, int]:
+        """
+        Per-population sigma and mean norm of the kept points (NaN for empty
+        populations, like the exploration one), total history size.
+        Populations are numbered 0 .. population_size - 1, in that order.
+        """
+        sigma = np.fromiter(self.sigmas.values(), dtype=float, count=len(self.sigmas))
+        return sigma, np.array(self._mean_norms), self._history_size
+
+    @instrumented("play")
     def play(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
         """
         Generate a new parameter set and associated metadata.
@@ -99,28 +160,28 @@ class AgentOpenEnded:
             params: sampled parameters.
             metadata: information about which agent/population generated them.
         """
-        logger.info("AgentInfinite: Generating parameters")
         pop_idx = self._select_population_idx()
 
         if pop_idx == 0:
             # Pure exploration with repulsive sampling
             params = sample_random_params(
                 self.parameters_def,
-                repulsive_points=self.repulsive_points,
+                codec=self.codec,
+                repulsive_archive=self.repulsive_archive,
             )
         else:
             # Exploitation: sample around a historical point from pop_idx
-            base_params, _ = random.choice(self.history[pop_idx])
-            params = sample_gaussian_around(
-                base_params,
+            history = self.history[pop_idx]
+            params = sample_gaussian_around_normalized(
+                history.X[random.randrange(len(history))],
                 sigma=self.sigmas[pop_idx],
-                parameters_def=self.parameters_def,
+                codec=self.codec,
             )
 
         metadata = {"agent_name": AGENT_NAME, "pop_idx": pop_idx}
-        logger.info(f"AgentInfinite: Generated parameters with pop_idx {pop_idx}")
         return params, metadata
 
+    @instrumented("update")
     def update(
         self,
         params: Dict[str, Any],
@@ -135,8 +196,6 @@ class AgentOpenEnded:
             score: score.
             metadata: if None, the update is skipped.
         """
-        logger.info("AgentInfinite: update called")
-
         if metadata is None:
             logger.warning(
                 "AgentInfinite.update called with metadata=None, skipping update"
@@ -145,18 +204,19 @@ class AgentOpenEnded:
 
         agent_name = metadata.get("agent_name", "")
         if agent_name not in {AGENT_NAME, AGENT_MANUAL}:
-            logger.info(
-                f"AgentInfinite.update: agent_name '{agent_name}' not in {{{AGENT_NAME}, {AGENT_MANUAL}}}, skipping update"
+            logger.debug(
+                "AgentInfinite.update: agent_name %r not in {%s, %s}, skipping update",
+                agent_name, AGENT_NAME, AGENT_MANUAL,
             )
             return
 
-        logger.info(f"metadata: {metadata}")
-
         if score == 0:
-            logger.info("Adding params to repulsive points due to zero score")
-            self.repulsive_points.append(params)
+            logger.debug("Adding params to repulsive points due to zero score")
+            self.repulsive_archive.add(self.codec.encode_one(params))
             return
 
+        x = self.codec.encode_one(params, missing=np.nan, clip=False)
+
         if agent_name == AGENT_NAME:
             pop_idx = metadata.get("pop_idx")
         else:
@@ -168,39 +228,33 @@ class AgentOpenEnded:
             pop_idx = self.population_size
             self.population_size += 1
 
-            self.history[pop_idx] = [(params, score)]
+            self.history[pop_idx] = self._new_history()
+            self.history[pop_idx].append(x, score, pop_idx)
             self.sigmas[pop_idx] = self.initial_sigma_when_new_population
-            logger.info(
-                f"Created new population pop_idx={pop_idx} with initial sigma={self.initial_sigma_when_new_population}"
-            )
+            logger.debug("Created new population pop_idx=%d", pop_idx)
         else:
             # Update existing population
-            self.history[pop_idx].append((params, score))
+            self.history[pop_idx].append(x, score, pop_idx)
             old_sigma = self.sigmas[pop_idx]
             new_sigma = max(self.sigma_min, old_sigma * self.sigma_decay)
             self.sigmas[pop_idx] = new_sigma
-            logger.info(
-                f"Updated population pop_idx={pop_idx}: sigma {old_sigma} -> {new_sigma}"
-            )
 
-        self.repulsive_points.append(params)
+        self.repulsive_archive.add(self.codec.encode_one(params))
 
         self._reduce_history_size(pop_idx)
+        self._history_changed(pop_idx)
 
         self.time += 1
-        logger.info(f"AgentInfinite: Updated history for pop_idx {pop_idx}")
-        logger.info(f"Current sigmas: {self.sigmas}")
 
+    @instrumented("time_warp")
     def time_warp(self, time_increment: int) -> None:
         """
         Advance internal time by `time_increment` steps and decay sigmas as if
         that many updates had happened.
         """
-        logger.info("AgentInfinite: time_warp called with increment %s", time_increment)
         decay_factor = self.sigma_decay**time_increment
 
         self.sigmas = {
             pop_idx: max(self.sigma_min, sigma * decay_factor)
             for pop_idx, sigma in self.sigmas.items()
         }
-        logger.info("AgentInfinite: sigmas after time_warp: %s", self.sigmas)
@@ -0,0 +1,42 @@
+import importlib
+from typing import Dict, Iterator, Mapping
+
+
+class LazyAgentRegistry(Mapping):
+    """
+    Agent classes by name, imported on first access.
+
+    Each entry is a "package.module:ClassName" string; the module is only
+    imported when the class is looked up, so listing or testing the names
+    (`in`, `list()`) imports nothing. Agents pull in numpy/scipy code that the
+    server does not need before the first session starts.
+
+    Parameters
+    ----------
+    targets : dict
+        Agent name -> "module:ClassName".
+    """
+
+    def __init__(self, targets: Dict[str, str]) -> None:
+        self._targets = dict(targets)
+        self._classes: Dict[str, type] = {}
+
+    def __getitem__(self, name: str) -> type:
+        cls = self._classes.get(name)
+        if cls is None:
+            module_name, _, class_name = self._targets[name].partition(":")
+            cls = getattr(importlib.import_module(module_name), class_name)
+            self._classes[name] = cls
+        return cls
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._targets)
+
+    def __len__(self) -> int:
+        return len(self._targets)
+
+    def __contains__(self, name) -> bool:
+        return name in self._targets
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._classes
@@ -1,7 +1,11 @@
 import logging
 from typing import Any, Dict, Optional, Tuple
 
-from ..utils.sampler import sample_random_params
+import numpy as np
+
+from ..utils.codec import ParamCodec
+from ..utils.sampler import QuasiRandomSampler, sample_random_params
+from ..utils.telemetry import AgentTelemetry, instrumented
 
 logger = logging.getLogger(__name__)
 
@@ -9,19 +13,45 @@ AGENT_NAME = "random"
 
 
 class AgentRandom:
-    def __init__(self, parameters_def: Dict[str, Dict[str, Any]]) -> None:
+    def __init__(
+        self,
+        parameters_def: Dict[str, Dict[str, Any]],
+        sampling: str = "uniform",
+    ) -> None:
+        """
+        parameters_def: dict { name: { "type": "float"/"integer"/"choice", "range": [min, max], ... } }
+        sampling: "uniform" (independent draws) or a space-filling sequence
+                  ("sobol", "halton", "lhs") continued across play() calls
+        """
         logger.info("Initializing AgentRandom")
         self.parameters_def = parameters_def
+        self.codec = ParamCodec(parameters_def)
+
+        self.sampler = None
+        if sampling != "uniform":
+            self.sampler = QuasiRandomSampler(self.codec, method=sampling)
+
+        self.telemetry = AgentTelemetry()
+
+    def telemetry_state(self) -> Tuple[np.ndarray, np.ndarray, int]:
+        """
+        No population and no history.
+        """
+        return np.empty(0), np.empty(0), 0
 
+    @instrumented("play")
     def play(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
         """
         Generate a random parameter set and associated metadata.
         """
-        logger.info("AgentRandom: Generating random parameters")
-        params = sample_random_params(self.parameters_def)
+        if self.sampler is not None:
+            params = self.sampler.sample_params(1)[0]
+        else:
+            params = sample_random_params(self.parameters_def, codec=self.codec)
         metadata = {"agent_name": AGENT_NAME}
         return params, metadata
 
+    @instrumented("update")
     def update(
         self,
         params: Dict[str, Any],
@@ -31,12 +61,9 @@ class AgentRandom:
         """
         Random agent ignores updates.
         """
-        logger.info("Update AgentRandom, no action taken.")
 
+    @instrumented("time_warp")
     def time_warp(self, time_increment: int) -> None:
         """
         Random agent is stateless; time_warp does nothing.
         """
-        logger.info(
-            f"AgentRandom: time_warp called with increment {time_increment}, no action taken."
-        )
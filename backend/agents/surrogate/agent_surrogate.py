@@ -0,0 +1,189 @@
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from ..utils.codec import ParamCodec
+from ..utils.history import History
+from ..utils.sampler import QuasiRandomSampler
+from ..utils.telemetry import AgentTelemetry, instrumented
+from .rff_ridge import RFFRidge
+
+logger = logging.getLogger(__name__)
+
+SCORE_SCALE = 100
+AGENT_NAME = "surrogate"
+AGENT_MANUAL = "manual"
+
+
+class AgentSurrogate:
+    """
+    Surrogate-assisted agent: every rating costs a human a look, so the agent
+    pre-screens many candidates with a cheap regression model of the scores
+    and only plays the most promising one.
+
+    - The model is an incremental RFF ridge regression (RFFRidge) on the
+      normalized parameters of the scored points of the session.
+    - play() draws `n_candidates` candidates, half space-filling over the
+      whole space and half Gaussian perturbations of the best scored points,
+      and returns the one with the highest upper confidence bound
+      mean + exploration * std (high predicted score or high uncertainty).
+    - Until `n_warmup` points are scored, play() returns space-filling samples.
+    - time_warp() shrinks (or grows) the exploration weight and the local
+      perturbation scale.
+    """
+
+    def __init__(
+        self,
+        parameters_def: Dict[str, Dict[str, Any]],
+        n_candidates: int = 256,
+        exploration: float = 2.0,
+        local_sigma: float = 0.1,
+        n_warmup: int = 4,
+        n_best: int = 5,
+        max_history_length: int = 1000,
+        n_features: int = 128,
+        length_scale: float = 0.2,
+        sampling: str = "sobol",
+    ) -> None:
+        """
+        parameters_def: dict { name: { "type": "float"/"integer"/"choice", "range": [min, max], ... } }
+        n_candidates : number of candidates screened per play()
+        exploration  : weight of the predicted std in the ranking (UCB)
+        local_sigma  : std (normalized space) of the perturbations of good points
+        n_warmup     : number of scored points before the model is used
+        n_best       : number of best points the local candidates are drawn around
+        max_history_length: scored points kept for candidate generation
+        n_features   : random Fourier features of the model
+        length_scale : RBF length scale of the model (normalized space)
+        sampling     : global candidates, "uniform" or a space-filling
+                       sequence ("sobol", "halton", "lhs")
+        """
+        logger.info("Initializing AgentSurrogate")
+        self.parameters_def = parameters_def
+        self.codec = ParamCodec(parameters_def)
+
+        self.n_candidates = max(2, int(n_candidates))
+        self.exploration = float(exploration)
+        self.local_sigma = float(local_sigma)
+        self.n_warmup = int(n_warmup)
+        self.n_best = int(n_best)
+
+        self.sampler = QuasiRandomSampler(self.codec, method=sampling)
+        self.model = RFFRidge(
+            self.codec.dim, n_features=n_features, length_scale=length_scale
+        )
+        # scored points, normalized (scores in [0, 1])
+        self.history = History(self.codec.dim, capacity=max_history_length)
+        # running sum of history.X, for the telemetry
+        self._history_sum = np.zeros(self.codec.dim)
+
+        # Exploration adjustment parameters for time_warp
+        self.factor_per_step = 1.2
+        self.exploration_min = 0.0
+        self.local_sigma_min = 1e-3
+
+        self.time = 0
+        self.telemetry = AgentTelemetry()
+
+    # ------------------------------------------------------------------
+    # Candidates
+    # ------------------------------------------------------------------
+    def _candidates(self) -> np.ndarray:
+        """
+        Space-filling candidates plus perturbations of the best scored points.
+        """
+        n_local = self.n_candidates // 2 if len(self.history) else 0
+        n_global = self.n_candidates - n_local
+        X_global = self.sampler.sample(n_global)
+        if not n_local:
+            return X_global
+
+        n_best = min(self.n_best, len(self.history))
+        best = np.argpartition(-self.history.scores, n_best - 1)[:n_best]
+        centers = self.history.X[best[np.random.randint(n_best, size=n_local)]]
+        X_local = self.codec.snap(
+            centers + self.local_sigma * np.random.randn(n_local, self.codec.dim)
+        )
+        return np.concatenate([X_global, X_local])
+
+    def telemetry_state(self) -> Tuple[np.ndarray, np.ndarray, int]:
+        """
+        One population: local perturbation scale and mean norm of the scored
+        points, number of points the model was fitted on.
+        """
+        n = len(self.history)
+        norm = np.linalg.norm(self._history_sum / n) if n else np.nan
+        return np.array([self.local_sigma]), np.array([norm]), self.model.n
+
+    # ------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------
+    @instrumented("play")
+    def play(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Screen candidates with the surrogate model and propose the best one.
+        """
+
+        if self.model.n < self.n_warmup:
+            x = self.sampler.sample(1)[0]
+            metadata = {"agent_name": AGENT_NAME}
+            return self.codec.decode_one(x), metadata
+
+        X = self._candidates()
+        mean, std = self.model.predict(X)
+        i = int(np.argmax(mean + self.exploration * std))
+
+        metadata = {
+            "agent_name": AGENT_NAME,
+            "predicted_score": float(mean[i] * SCORE_SCALE),
+            "predicted_std": float(std[i] * SCORE_SCALE),
+        }
+        return self.codec.decode_one(X[i]), metadata
+
+    @instrumented("update")
+    def update(
+        self,
+        params: Dict[str, Any],
+        score: float,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """
+        Add the scored point to the model and the history.
+        """
+        if metadata is None:
+            logger.warning("AgentSurrogate.update called with metadata=None, skipping")
+            return
+
+        agent_name = metadata.get("agent_name", "")
+        if agent_name not in [AGENT_NAME, AGENT_MANUAL]:
+            logger.debug("%s != %s or %s, skipping update", agent_name, AGENT_NAME, AGENT_MANUAL)
+            return
+
+        x = self.codec.encode_one(params)
+        y = float(score) / float(SCORE_SCALE)
+        self.model.add(x, y)
+        if len(self.history) == self.history.capacity:
+            # the oldest point is dropped by the append
+            self._history_sum -= self.history.X[0]
+        self.history.append(x, y)
+        self._history_sum += x
+
+        self.time += 1
+
+    @instrumented("time_warp")
+    def time_warp(self, time_increment: int) -> None:
+        """
+        Adjust exploration based on a "time warp":
+            > 0 -> less exploration (smaller UCB weight and perturbations)
+            < 0 -> more exploration
+        """
+        if time_increment == 0:
+            return
+
+        scale = self.factor_per_step ** (-time_increment)
+        self.exploration = max(self.exploration_min, self.exploration * scale)
+        self.local_sigma = float(
+            np.clip(self.local_sigma * scale, self.local_sigma_min, 1.0)
+        )
+        self.time += time_increment
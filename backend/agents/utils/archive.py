@@ -0,0 +1,221 @@
+# archive.py
+import logging
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .sampler import min_squared_distances
+
+if TYPE_CHECKING:
+    from scipy.spatial import cKDTree
+
+logger = logging.getLogger(__name__)
+
+
+class RepulsiveArchive:
+    """
+    Bounded archive of points in normalized space [0, 1]^d, used to repel
+    exploration from already-seen regions.
+
+    - Storage is a preallocated (capacity, d) array plus a count per point
+      (how many added points it stands for).
+    - Near-duplicates are merged on insertion: points are hashed to voxels
+      of side `merge_radius`, and a new point within `merge_radius` of a
+      point of its voxel only increments that point's count.
+    - When the archive is full, the most redundant points (smallest
+      nearest-neighbour distance) are evicted in one batch and their counts
+      are transferred to their nearest neighbour.
+    - Nearest-distance queries use a KD-tree over the settled points plus a
+      brute-force pass over the points added since the last rebuild; the
+      tree is rebuilt once `rebuild_every` points are pending. Above
+      `tree_max_dim` dimensions a KD-tree is no faster than brute force,
+      so all points are scanned with chunked matrix products instead.
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        capacity: int = 1000,
+        merge_radius: float = 0.02,
+        rebuild_every: int = 64,
+        evict_fraction: float = 0.1,
+        tree_max_dim: int = 8,
+    ) -> None:
+        """
+        dim           : dimension of the normalized space
+        capacity      : maximum number of stored points
+        merge_radius  : points closer than this (normalized space) are merged
+        rebuild_every : number of pending points that triggers a tree rebuild
+        evict_fraction: share of capacity freed when the archive is full
+        tree_max_dim  : above this dimension, queries are brute force
+        """
+        self.dim = int(dim)
+        self.capacity = max(2, int(capacity))
+        self.merge_radius = float(merge_radius)
+        self.rebuild_every = max(1, int(rebuild_every))
+        self.evict_fraction = float(evict_fraction)
+        self.use_tree = self.dim <= tree_max_dim
+
+        self._points = np.empty((self.capacity, self.dim), dtype=float)
+        self._counts = np.zeros(self.capacity, dtype=np.int64)
+        self._size = 0
+
+        # voxel key -> slots of the points in that voxel
+        self._cells: Dict[Tuple[int, ...], List[int]] = {}
+
+        # KD-tree over self._points[:self._tree_size]
+        self._tree: Optional["cKDTree"] = None
+        self._tree_size = 0
+
+        self.n_added = 0
+        self.n_merged = 0
+        self.n_evicted = 0
+
+    # ------------------------------------------------------------------
+    # Accessors
+    # ------------------------------------------------------------------
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def points(self) -> np.ndarray:
+        """View of the stored points, shape (len(self), dim)."""
+        return self._points[: self._size]
+
+    @property
+    def counts(self) -> np.ndarray:
+        """View of the number of added points each stored point stands for."""
+        return self._counts[: self._size]
+
+    # ------------------------------------------------------------------
+    # Insertion
+    # ------------------------------------------------------------------
+    def add(self, x: np.ndarray) -> bool:
+        """
+        Add one normalized point.
+
+        Returns True if it was stored as a new point, False if it was merged
+        into an existing near-duplicate.
+        """
+        x = np.asarray(x, dtype=float).reshape(self.dim)
+        self.n_added += 1
+
+        key = self._voxel(x)
+        slots = self._cells.get(key)
+        if slots:
+            diff = self._points[slots] - x
+            d2 = np.einsum("ij,ij->i", diff, diff)
+            nearest = int(np.argmin(d2))
+            if d2[nearest] <= self.merge_radius**2:
+                self._counts[slots[nearest]] += 1
+                self.n_merged += 1
+                return False
+
+        if self._size >= self.capacity:
+            self._evict()
+
+        slot = self._size
+        self._points[slot] = x
+        self._counts[slot] = 1
+        self._size += 1
+        self._cells.setdefault(key, []).append(slot)
+        return True
+
+    def _voxel(self, x: np.ndarray) -> Tuple[int, ...]:
+        if self.merge_radius <= 0:
+            return tuple(x.tolist())
+        return tuple(np.floor(x / self.merge_radius).astype(np.int64).tolist())
+
+    # ------------------------------------------------------------------
+    # Eviction
+    # ------------------------------------------------------------------
+    def _evict(self) -> None:
+        """
+        Free `evict_fraction` of the capacity by dropping the most redundant
+        points, never dropping both ends of a nearest-neighbour pair.
+        """
+        points = self.points
+        nn_dist, nn_idx = self._nearest_neighbours(points)
+
+        n_evict = max(1, int(self.capacity * self.evict_fraction))
+        removed = np.zeros(self._size, dtype=bool)
+        n_removed = 0
+        for i in np.argsort(nn_dist, kind="stable"):
+            j = nn_idx[i]
+            if removed[j]:
+                continue
+            removed[i] = True
+            self._counts[j] += self._counts[i]
+            n_removed += 1
+            if n_removed >= n_evict:
+                break
+
+        keep = np.flatnonzero(~removed)
+        self._points[: keep.size] = points[keep]
+        self._counts[: keep.size] = self._counts[keep]
+        self._size = keep.size
+        self.n_evicted += n_removed
+
+        self._cells = {}
+        for slot in range(self._size):
+            self._cells.setdefault(self._voxel(self._points[slot]), []).append(slot)
+
+        self._tree = None
+        self._tree_size = 0
+
+        logger.debug(
+            f"RepulsiveArchive: evicted {n_removed} points, {self._size} left"
+        )
+
+    def _nearest_neighbours(self, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Distance and index of each point's nearest other point.
+        """
+        if self.use_tree:
+            from scipy.spatial import cKDTree
+
+            dist, idx = cKDTree(points).query(points, k=2)
+            return dist[:, 1], idx[:, 1]
+
+        n = points.shape[0]
+        nn_dist = np.empty(n)
+        nn_idx = np.empty(n, dtype=np.intp)
+        sq = np.einsum("ij,ij->i", points, points)
+        chunk = 1024
+        for start in range(0, n, chunk):
+            block = points[start : start + chunk]
+            d2 = sq[start : start + chunk, None] + sq[None, :] - 2.0 * (block @ points.T)
+            rows = np.arange(block.shape[0])
+            d2[rows, start + rows] = np.inf
+            nn_idx[start : start + chunk] = np.argmin(d2, axis=1)
+            nn_dist[start : start + chunk] = d2[rows, nn_idx[start : start + chunk]]
+        return np.sqrt(np.maximum(nn_dist, 0.0)), nn_idx
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def min_squared_distances(self, X: np.ndarray) -> np.ndarray:
+        """
+        Squared distance from each row of X to its nearest archived point
+        (inf for an empty archive).
+        """
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        best = np.full(X.shape[0], np.inf)
+        if self._size == 0:
+            return best
+
+        if self.use_tree and self._size - self._tree_size >= self.rebuild_every:
+            from scipy.spatial import cKDTree
+
+            self._tree = cKDTree(self.points.copy())
+            self._tree_size = self._size
+
+        if self._tree is not None:
+            dist, _ = self._tree.query(X, k=1)
+            best = dist**2
+
+        pending = self._points[self._tree_size : self._size]
+        if pending.shape[0]:
+            np.minimum(best, min_squared_distances(X, pending), out=best)
+
+        return best
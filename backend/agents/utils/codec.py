@@ -0,0 +1,294 @@
+# codec.py
+import logging
+import operator
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_TYPES = ("float", "integer", "choice")
+
+# Sentinel for parameters absent from a dict (never a valid choice value)
+_MISSING = object()
+
+
+class ParamCodec:
+    """
+    Vectorized encoder/decoder between parameter dicts and normalized arrays.
+
+    Every supported parameter is mapped to one column of [0, 1]:
+      - float/integer: linear scaling from [lo, hi] -> [0, 1]
+      - choice: index / (n-1), or 0.0 if there is a single choice
+
+    Decoding is the inverse mapping, with rounding and clipping for integer
+    and choice parameters. Batches are converted in one NumPy pass, so the
+    only per-value Python work left is reading from / writing to the dicts.
+
+    Attributes
+    ----------
+    names : list of str
+        Parameter names, in column order.
+    types : list of str
+        Parameter types, parallel to `names`.
+    choices : list
+        For each column, the list of choices (or None for numeric columns).
+    mins, maxs : np.ndarray
+        Lower / upper bounds in original space (choice: 0 .. n-1).
+    dim : int
+        Number of encoded columns.
+    """
+
+    def __init__(
+        self,
+        parameters_def: Mapping[str, Mapping[str, Any]],
+        default_type: Optional[str] = None,
+    ) -> None:
+        """
+        parameters_def: dict { name: { "type": "float"/"integer"/"choice", "range": [min, max], ... } }
+        default_type  : type of the definitions without "type" (None: they
+                        are skipped, like normalize_params always did)
+
+        Unsupported or invalid definitions are skipped with a warning.
+        """
+        self.parameters_def = parameters_def or {}
+
+        self.names: List[str] = []
+        self.types: List[str] = []
+        self.choices: List[Optional[list]] = []
+        self._choice_index: List[Optional[Dict[Any, int]]] = []
+        mins = []
+        maxs = []
+
+        for name, p in self.parameters_def.items():
+            if not isinstance(p, Mapping):
+                continue
+
+            ptype = p.get("type", default_type)
+            if ptype not in SUPPORTED_TYPES:
+                logger.warning(
+                    f"[ParamCodec] Unsupported type '{ptype}' for '{name}', skipped."
+                )
+                continue
+
+            if ptype == "choice":
+                choices = list(p.get("choices") or [])
+                if not choices:
+                    logger.warning(
+                        f"[ParamCodec] Choice param '{name}' has no 'choices', skipped."
+                    )
+                    continue
+                lo, hi = 0.0, float(len(choices) - 1)
+                index = {}
+                for i, c in enumerate(choices):
+                    index.setdefault(c, i)
+                self.choices.append(choices)
+                self._choice_index.append(index)
+            else:
+                lo, hi = p["range"]
+                lo = float(lo)
+                hi = float(hi)
+                if lo > hi:
+                    logger.warning(
+                        f"[ParamCodec] Invalid range for '{name}' (min > max), skipped."
+                    )
+                    continue
+                self.choices.append(None)
+                self._choice_index.append(None)
+
+            self.names.append(name)
+            self.types.append(ptype)
+            mins.append(lo)
+            maxs.append(hi)
+
+        self.dim = len(self.names)
+        self.mins = np.array(mins, dtype=float)
+        self.maxs = np.array(maxs, dtype=float)
+        self._span = self.maxs - self.mins
+
+        # Degenerate ranges (lo == hi) always encode to 0.0
+        self._inv_span = np.zeros(self.dim, dtype=float)
+        nonzero = self._span > 0
+        self._inv_span[nonzero] = 1.0 / self._span[nonzero]
+
+        types = np.array(self.types, dtype=object)
+        self._float_cols = np.flatnonzero(types == "float")
+        self._int_cols = np.flatnonzero(types == "integer")
+        self._choice_cols = np.flatnonzero(types == "choice")
+        self._discrete_cols = np.flatnonzero(types != "float")
+        self._numeric_cols = np.flatnonzero(types != "choice")
+        self._getter = operator.itemgetter(*self.names) if self.names else None
+
+    # ------------------------------------------------------------------
+    # Encoding
+    # ------------------------------------------------------------------
+    def encode(
+        self,
+        params_list: Sequence[Mapping[str, Any]],
+        missing: Optional[float] = None,
+        clip: bool = True,
+    ) -> np.ndarray:
+        """
+        Encode a list of parameter dicts into an (n, dim) normalized array.
+
+        Parameters
+        ----------
+        params_list : sequence of dict
+            Parameter dicts in original space.
+        missing : float, optional
+            Value used for absent parameters and unknown choice values.
+            If None, absent values default to the lower bound (first choice),
+            which encodes to 0.0. Use np.nan to mark them explicitly.
+        clip : bool, default True
+            Whether to clip the result to [0, 1] (NaN is left untouched).
+
+        Returns
+        -------
+        np.ndarray
+            Array of shape (n, dim).
+        """
+        n = len(params_list)
+        if n == 0 or self.dim == 0:
+            return np.zeros((n, self.dim), dtype=float)
+
+        cols = self._read_columns(params_list, missing)
+        raw = np.array(cols, dtype=float).T
+
+        x = (raw - self.mins) * self._inv_span
+        if clip:
+            x = np.clip(x, 0.0, 1.0)
+        return x
+
+    def encode_one(
+        self,
+        params: Mapping[str, Any],
+        missing: Optional[float] = None,
+        clip: bool = True,
+    ) -> np.ndarray:
+        """
+        Encode a single parameter dict into a (dim,) normalized vector.
+        """
+        return self.encode([params], missing=missing, clip=clip)[0]
+
+    def _read_columns(
+        self,
+        params_list: Sequence[Mapping[str, Any]],
+        missing: Optional[float],
+    ) -> List[list]:
+        """
+        Read raw values column by column (choice values become indices).
+        """
+        names = self.names
+        try:
+            # Fast path: every dict holds every parameter
+            rows = list(map(self._getter, params_list))
+            if self.dim == 1:
+                rows = [(v,) for v in rows]
+            complete = True
+        except KeyError:
+            rows = [tuple(p.get(name, _MISSING) for name in names) for p in params_list]
+            complete = False
+
+        cols = list(zip(*rows))
+
+        if not complete:
+            for j in self._numeric_cols:
+                col = cols[j]
+                if _MISSING in col:
+                    fill = self.mins[j] if missing is None else missing
+                    cols[j] = [fill if v is _MISSING else v for v in col]
+
+        default = 0 if missing is None else missing
+        for j in self._choice_cols:
+            lookup = self._choice_index[j]
+            mapped = list(map(lookup.get, cols[j]))
+            if None in mapped:
+                n_unknown = sum(
+                    1 for v in cols[j] if v is not _MISSING and v not in lookup
+                )
+                if n_unknown:
+                    logger.warning(
+                        f"[ParamCodec] {n_unknown} value(s) for '{names[j]}' not found in choices."
+                    )
+                mapped = [default if i is None else i for i in mapped]
+            cols[j] = mapped
+
+        return cols
+
+    # ------------------------------------------------------------------
+    # Sampling support
+    # ------------------------------------------------------------------
+    def from_unit(self, U: np.ndarray) -> np.ndarray:
+        """
+        Map points of the unit hypercube [0, 1)^dim to normalized space so
+        that uniform points give uniform parameter values.
+
+        Float columns are kept as is; integer and choice columns are snapped
+        to one of their discrete levels, each level covering an equal share
+        of [0, 1) (same distribution as `sample_parameter`).
+        """
+        X = np.array(U, dtype=float)
+        cols = self._discrete_cols
+        if cols.size:
+            levels = np.floor(self._span[cols]) + 1.0
+            k = np.minimum(np.floor(X[..., cols] * levels), levels - 1.0)
+            X[..., cols] = k * self._inv_span[cols]
+        return X
+
+    # ------------------------------------------------------------------
+    # Decoding
+    # ------------------------------------------------------------------
+    def to_original(self, X: np.ndarray, clip: bool = True) -> np.ndarray:
+        """
+        Map a normalized (n, dim) array back to original numeric space.
+
+        Integer columns are rounded and clipped to [lo, hi]; choice columns
+        hold the (rounded, clipped) choice index.
+        """
+        X = np.asarray(X, dtype=float)
+        if clip:
+            X = np.clip(X, 0.0, 1.0)
+        vals = X * self._span + self.mins
+
+        cols = self._discrete_cols
+        if cols.size:
+            vals[..., cols] = np.clip(
+                np.rint(vals[..., cols]), self.mins[cols], self.maxs[cols]
+            )
+        return vals
+
+    def snap(self, X: np.ndarray) -> np.ndarray:
+        """
+        Clip a normalized array to [0, 1] and move integer / choice columns
+        onto their levels, i.e. encode(decode(X)) without the dicts.
+        """
+        return (self.to_original(X) - self.mins) * self._inv_span
+
+    def decode(self, X: np.ndarray, clip: bool = True) -> List[Dict[str, Any]]:
+        """
+        Decode an (n, dim) normalized array into a list of parameter dicts,
+        respecting types (float/integer/choice) and min/max.
+        """
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        n = X.shape[0]
+        if self.dim == 0:
+            return [{} for _ in range(n)]
+
+        vals = self.to_original(X, clip=clip)
+
+        cols: List[list] = [None] * self.dim
+        for j, col in zip(self._float_cols, vals[:, self._float_cols].T.tolist()):
+            cols[j] = col
+        int_vals = vals[:, self._discrete_cols].astype(np.int64).T.tolist()
+        for j, col in zip(self._discrete_cols, int_vals):
+            choices = self.choices[j]
+            cols[j] = col if choices is None else [choices[i] for i in col]
+
+        names = self.names
+        return [dict(zip(names, row)) for row in zip(*cols)]
+
+    def decode_one(self, x: np.ndarray, clip: bool = True) -> Dict[str, Any]:
+        """
+        Decode a single normalized (dim,) vector into a parameter dict.
+        """
+        return self.decode(np.asarray(x, dtype=float)[None, :], clip=clip)[0]
@@ -0,0 +1,138 @@
+# history.py
+import logging
+from typing import Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class History:
+    """
+    Bounded history of evaluated points, stored in preallocated arrays:
+      - X (n, dim)  : normalized parameter vectors (NaN marks an absent value)
+      - scores (n,) : scores
+      - pop_idx (n,): population of each point
+
+    The history is a ring buffer: once `capacity` points are stored, each
+    append drops the oldest one. Entries live in a window of a buffer twice
+    as large as the capacity; when the window reaches the end of the buffer
+    it is moved back to the front (one copy every `capacity` appends), so
+    the window is always contiguous and `X`, `scores` and `pop_idx` are
+    zero-copy (and writable) views, oldest entry first.
+
+    A point costs 2 * (8 * dim + 16) bytes, a few hundred bytes for
+    typical sketches.
+    """
+
+    __slots__ = ("dim", "capacity", "_X", "_scores", "_pop_idx", "_start", "_size")
+
+    def __init__(self, dim: int, capacity: int) -> None:
+        """
+        dim     : dimension of the normalized vectors
+        capacity: maximum number of stored points
+        """
+        self.dim = int(dim)
+        self.capacity = max(1, int(capacity))
+
+        self._X = np.empty((2 * self.capacity, self.dim), dtype=float)
+        self._scores = np.empty(2 * self.capacity, dtype=float)
+        self._pop_idx = np.empty(2 * self.capacity, dtype=np.int64)
+        self._start = 0
+        self._size = 0
+
+    # ------------------------------------------------------------------
+    # Views
+    # ------------------------------------------------------------------
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def X(self) -> np.ndarray:
+        """View of the stored vectors, shape (len(self), dim)."""
+        return self._X[self._start : self._start + self._size]
+
+    @property
+    def scores(self) -> np.ndarray:
+        """View of the stored scores, shape (len(self),)."""
+        return self._scores[self._start : self._start + self._size]
+
+    @property
+    def pop_idx(self) -> np.ndarray:
+        """View of the stored population indices, shape (len(self),)."""
+        return self._pop_idx[self._start : self._start + self._size]
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the buffers."""
+        return self._X.nbytes + self._scores.nbytes + self._pop_idx.nbytes
+
+    # ------------------------------------------------------------------
+    # Modification
+    # ------------------------------------------------------------------
+    def append(self, x: np.ndarray, score: float, pop_idx: int = 0) -> None:
+        """
+        Store one point, dropping the oldest one if the history is full.
+        """
+        if self._size == self.capacity:
+            self._start += 1
+            self._size -= 1
+
+        end = self._start + self._size
+        if end == self._X.shape[0]:
+            self._compact()
+            end = self._size
+
+        self._X[end] = x
+        self._scores[end] = score
+        self._pop_idx[end] = pop_idx
+        self._size += 1
+
+    def keep(self, indices: Sequence[int]) -> None:
+        """
+        Keep only the entries at `indices` (positions in the current window),
+        in that order.
+        """
+        idx = np.asarray(indices, dtype=np.intp)
+        if idx.size > self.capacity:
+            raise ValueError(
+                f"History.keep: {idx.size} entries for a capacity of {self.capacity}"
+            )
+        X, scores, pop_idx = self.X[idx], self.scores[idx], self.pop_idx[idx]
+
+        n = idx.size
+        self._X[:n] = X
+        self._scores[:n] = scores
+        self._pop_idx[:n] = pop_idx
+        self._start = 0
+        self._size = n
+
+    def clear(self) -> None:
+        """Remove every entry (buffers are kept)."""
+        self._start = 0
+        self._size = 0
+
+    def _compact(self) -> None:
+        """Move the window to the front of the buffers."""
+        n, s = self._size, self._start
+        self._X[:n] = self._X[s : s + n]
+        self._scores[:n] = self._scores[s : s + n]
+        self._pop_idx[:n] = self._pop_idx[s : s + n]
+        self._start = 0
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def last(self, n: int) -> slice:
+        """Slice of the `n` most recent entries (for X / scores / pop_idx)."""
+        return slice(max(0, self._size - int(n)), self._size)
+
+    def nearest(self, x: np.ndarray) -> int:
+        """
+        Position of the stored vector closest to x (absent values count as
+        0.0 on both sides), or -1 for an empty history.
+        """
+        if self._size == 0:
+            return -1
+        diff = np.nan_to_num(self.X) - np.nan_to_num(np.asarray(x, dtype=float))
+        return int(np.argmin(np.einsum("ij,ij->i", diff, diff)))
@@ -0,0 +1,147 @@
+# kmeans.py
+import logging
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class IncrementalKMeans:
+    """
+    Mini-batch k-means whose centroids persist between calls.
+
+    Each `partial_fit` call assigns a batch to the current centroids, moves
+    every centroid towards the mean of its points with a per-centroid
+    learning rate n_batch / count (Sculley, 2010), and returns the labels.
+    Counts are multiplied by `count_decay` before each batch so that the
+    centroids keep following data that drifts over time.
+
+    Unlike a plain mini-batch step, every cluster is kept non-empty when the
+    batch has at least `n_clusters` points: empty clusters take over the
+    point that is worst represented by its own centroid (and restart from
+    it with a zero count).
+
+    The first call (or a call after `reset`) initializes the centroids with
+    k-means++ seeding on the batch.
+    """
+
+    def __init__(
+        self,
+        n_clusters: int,
+        n_iter: int = 2,
+        count_decay: float = 0.5,
+        seed: Optional[int] = 0,
+    ) -> None:
+        """
+        n_clusters : number of clusters k
+        n_iter     : assignment / update passes over each batch
+        count_decay: factor applied to centroid counts before each batch
+                     (1.0: plain mini-batch k-means, 0.0: Lloyd warm start)
+        seed       : seed of the k-means++ initialization
+        """
+        self.n_clusters = int(n_clusters)
+        self.n_iter = max(1, int(n_iter))
+        self.count_decay = float(count_decay)
+        self._rng = np.random.default_rng(seed)
+
+        self.centroids: Optional[np.ndarray] = None  # (k, d)
+        self.counts: Optional[np.ndarray] = None  # (k,)
+        self.n_batches = 0
+
+    def reset(self) -> None:
+        """Forget the centroids; the next batch re-initializes them."""
+        self.centroids = None
+        self.counts = None
+
+    # ------------------------------------------------------------------
+    # Fitting
+    # ------------------------------------------------------------------
+    def partial_fit(self, X: np.ndarray) -> np.ndarray:
+        """
+        Update the centroids from the batch X (n, d) and return its labels.
+        """
+        X = np.asarray(X, dtype=float)
+        n = X.shape[0]
+        if n == 0:
+            return np.empty(0, dtype=np.intp)
+
+        if self.centroids is None or self.centroids.shape[1] != X.shape[1]:
+            self._init_centroids(X)
+        else:
+            self.counts *= self.count_decay
+
+        # Each pass blends the previous centroids (weight: decayed count)
+        # with the mean of the points currently assigned to them (re-seeded
+        # clusters get a zero count in self.counts, hence in prior_counts)
+        prior = self.centroids.copy()
+        prior_counts = self.counts
+        k = self.n_clusters
+        for _ in range(self.n_iter):
+            labels = self._assign(X)
+            batch_counts = np.bincount(labels, minlength=k).astype(float)
+            sums = np.zeros_like(prior)
+            np.add.at(sums, labels, X)
+
+            total = prior_counts + batch_counts
+            hit = total > 0
+            self.centroids[hit] = (
+                prior_counts[hit, None] * prior[hit] + sums[hit]
+            ) / total[hit, None]
+        self.counts = prior_counts + batch_counts
+
+        self.n_batches += 1
+        return self._assign(X)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Labels of X with the current centroids (no update)."""
+        return self._assign(np.asarray(X, dtype=float), reseed=False)
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+    def _init_centroids(self, X: np.ndarray) -> None:
+        """k-means++ seeding on the batch (points reused if n < k)."""
+        n, d = X.shape
+        k = self.n_clusters
+        centroids = np.empty((k, d), dtype=float)
+        centroids[0] = X[self._rng.integers(n)]
+        d2 = np.sum((X - centroids[0]) ** 2, axis=1)
+        for c in range(1, k):
+            total = d2.sum()
+            if total > 0:
+                i = self._rng.choice(n, p=d2 / total)
+            else:
+                i = self._rng.integers(n)
+            centroids[c] = X[i]
+            np.minimum(d2, np.sum((X - centroids[c]) ** 2, axis=1), out=d2)
+
+        self.centroids = centroids
+        self.counts = np.zeros(k, dtype=float)
+
+    def _assign(self, X: np.ndarray, reseed: bool = True) -> np.ndarray:
+        """
+        Nearest-centroid labels. With `reseed`, empty clusters (if n >= k)
+        are then re-seeded on the points farthest from their centroid, taken
+        from clusters that have more than one point.
+        """
+        k = self.n_clusters
+        d2 = np.sum((X[:, None, :] - self.centroids[None, :, :]) ** 2, axis=2)
+        labels = np.argmin(d2, axis=1)
+        if not reseed or X.shape[0] < k:
+            return labels
+
+        sizes = np.bincount(labels, minlength=k)
+        empty = np.flatnonzero(sizes == 0)
+        if empty.size:
+            own = d2[np.arange(X.shape[0]), labels]
+            for c in empty:
+                movable = sizes[labels] > 1
+                i = int(np.argmax(np.where(movable, own, -np.inf)))
+                sizes[labels[i]] -= 1
+                labels[i] = c
+                sizes[c] = 1
+                own[i] = -np.inf
+                self.centroids[c] = X[i]
+                self.counts[c] = 0.0
+        return labels
@@ -1,13 +1,19 @@
 # sampler.py
 import logging
-import math
 import random
-from typing import Any, Dict, Iterable, Mapping, Optional
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Mapping, Optional
 
 import numpy as np
 
+from .codec import ParamCodec
+
+if TYPE_CHECKING:
+    from .archive import RepulsiveArchive
+
 logger = logging.getLogger(__name__)
 
+SAMPLING_METHODS = ("uniform", "sobol", "halton", "lhs")
+
 
 # ---------------------------------------------------------------------------
 # Basic per-parameter sampling
@@ -90,6 +96,48 @@ def squared_distance(
     return s
 
 
+def min_squared_distances(
+    X: np.ndarray,
+    Y: np.ndarray,
+    chunk_size: int = 1024,
+) -> np.ndarray:
+    """
+    Squared Euclidean distance from each row of X to its nearest row of Y.
+
+    Y is processed in chunks of `chunk_size` rows so that the temporary
+    (len(X), chunk_size) distance block stays small.
+
+    Parameters
+    ----------
+    X : np.ndarray
+        Array of shape (n, d).
+    Y : np.ndarray
+        Array of shape (m, d), m >= 1.
+    chunk_size : int, default 1024
+        Number of rows of Y handled per block.
+
+    Returns
+    -------
+    np.ndarray
+        Array of shape (n,).
+    """
+    X = np.asarray(X, dtype=float)
+    Y = np.asarray(Y, dtype=float)
+
+    x2 = np.einsum("ij,ij->i", X, X)
+    best = np.full(X.shape[0], np.inf)
+
+    for start in range(0, Y.shape[0], chunk_size):
+        block = Y[start : start + chunk_size]
+        y2 = np.einsum("ij,ij->i", block, block)
+        # ||x - y||^2 = ||x||^2 + ||y||^2 - 2 x.y
+        d2 = x2[:, None] + y2[None, :] - 2.0 * (X @ block.T)
+        np.minimum(best, d2.min(axis=1), out=best)
+
+    # Guard against tiny negative values from cancellation
+    return np.maximum(best, 0.0)
+
+
 # ---------------------------------------------------------------------------
 # Normalization / denormalization
 # ---------------------------------------------------------------------------
@@ -98,6 +146,7 @@ def squared_distance(
 def normalize_params(
     params: Mapping[str, Any],
     parameters_def: Mapping[str, Mapping[str, Any]],
+    codec: Optional[ParamCodec] = None,
 ) -> Dict[str, float]:
     """
     Map float/integer/choice parameters to [0,1] according to their definition.
@@ -105,59 +154,36 @@ def normalize_params(
     - float/integer: linear scaling from [lo, hi] -> [0,1]
     - choice: index / (n-1), or 0.0 if there is a single choice
 
+    Parameters missing from `params` (or with an unknown choice value)
+    are left out of the result.
+
     Parameters
     ----------
     params : Mapping[str, Any]
         Original parameter dict.
     parameters_def : Mapping[str, Mapping[str, Any]]
         Definitions for each parameter.
+    codec : ParamCodec, optional
+        Prebuilt codec for `parameters_def` (built on the fly if None).
 
     Returns
     -------
     Dict[str, float]
         Normalized parameters.
     """
-    norm_params = {}
-
-    for name, param_def in parameters_def.items():
-        if name not in params:
-            continue
-
-        ptype = param_def.get("type")
-
-        if ptype in ("float", "integer"):
-            lo, hi = param_def["range"]
-            norm_params[name] = (params[name] - lo) / (hi - lo)
-
-        elif ptype == "choice":
-            choices = param_def.get("choices")
-
-            n = len(choices)
-            try:
-                idx = choices.index(params[name])
-            except ValueError:
-                logger.warning(
-                    f"Value '{params[name]}' for parameter '{name}' not found in choices. Skipping."
-                )
-                continue
-
-            if n == 1:
-                norm_params[name] = 0.0
-            else:
-                norm_params[name] = idx / (n - 1)
-
-        else:
-            logger.warning(
-                f"Unsupported parameter type '{ptype}' for parameter '{name}'. "
-                f"Skipping normalization."
-            )
+    if codec is None:
+        codec = ParamCodec(parameters_def)
 
-    return norm_params
+    x = codec.encode_one(params, missing=np.nan, clip=False)
+    return {
+        name: float(v) for name, v in zip(codec.names, x.tolist()) if v == v
+    }
 
 
 def denormalize_params(
     norm_params: Mapping[str, float],
     parameters_def: Mapping[str, Mapping[str, Any]],
+    codec: Optional[ParamCodec] = None,
 ) -> Dict[str, Any]:
     """
     Inverse of `normalize_params`: map normalized [0,1] back to the original space.
@@ -172,49 +198,37 @@ def denormalize_params(
         Normalized parameters.
     parameters_def : Mapping[str, Mapping[str, Any]]
         Definitions for each parameter.
+    codec : ParamCodec, optional
+        Prebuilt codec for `parameters_def` (built on the fly if None).
 
     Returns
     -------
     Dict[str, Any]
         Parameters in original space.
     """
-    params: Dict[str, Any] = {}
-
-    for name, param_def in parameters_def.items():
-        if name not in norm_params:
-            continue
-
-        ptype = param_def.get("type")
-        norm_val = norm_params[name]
-
-        if ptype == "float":
-            lo, hi = param_def["range"]
-            params[name] = norm_val * (hi - lo) + lo
-
-        elif ptype == "integer":
-            lo, hi = param_def["range"]
-            val = norm_val * (hi - lo) + lo
-            x = round(val)
-            params[name] = int(np.clip(x, lo, hi))
-
-        elif ptype == "choice":
-            choices = param_def.get("choices")
-            n = len(choices)
-
-            if n == 1:
-                params[name] = choices[0]
-            else:
-                idx = int(round(norm_val * (n - 1)))
-                idx = int(np.clip(idx, 0, n - 1))
-                params[name] = choices[idx]
-
-        else:
-            logger.warning(
-                f"Unsupported parameter type '{ptype}' for parameter '{name}'. "
-                f"Skipping denormalization."
-            )
+    if codec is None:
+        codec = ParamCodec(parameters_def)
+
+    x = np.array([norm_params.get(name, np.nan) for name in codec.names], dtype=float)
+    return _decode_present(x, codec, clip=False)
 
-    return params
+
+def _decode_present(
+    x: np.ndarray,
+    codec: ParamCodec,
+    clip: bool = True,
+) -> Dict[str, Any]:
+    """
+    Decode a normalized vector, dropping the parameters marked as NaN.
+    """
+    present = ~np.isnan(x)
+    if present.all():
+        return codec.decode_one(x, clip=clip)
+
+    params = codec.decode_one(np.where(present, x, 0.0), clip=clip)
+    return {
+        name: params[name] for name, ok in zip(codec.names, present) if ok
+    }
 
 
 # ---------------------------------------------------------------------------
@@ -222,24 +236,44 @@ def denormalize_params(
 # ---------------------------------------------------------------------------
 
 
+def sample_uniform_normalized(n: int, codec: ParamCodec) -> np.ndarray:
+    """
+    Draw `n` uniform parameter sets directly in normalized space.
+
+    Values follow the same distribution as `sample_parameter` (integer and
+    choice parameters land exactly on their discrete levels).
+
+    Returns
+    -------
+    np.ndarray
+        Array of shape (n, codec.dim).
+    """
+    return codec.from_unit(np.random.rand(n, codec.dim))
+
+
 def sample_random_params(
     parameters_def: Mapping[str, Mapping[str, Any]],
     repulsive_points: Optional[Iterable[Mapping[str, Any]]] = None,
     max_tries: int = 1000,
+    codec: Optional[ParamCodec] = None,
+    repulsive_archive: Optional["RepulsiveArchive"] = None,
 ) -> Dict[str, Any]:
     """
     Sample a full parameter dictionary.
 
-    If `repulsive_points` is None or empty:
+    If `repulsive_points` and `repulsive_archive` are None or empty:
         - Sample uniformly at random from each parameter definition.
 
     If `repulsive_points` is provided:
-        - Normalize all repulsive points.
-        - Draw `max_tries` random candidates uniformly.
+        - Normalize all repulsive points (one matrix).
+        - Draw `max_tries` random candidates uniformly (one matrix).
         - Return the candidate whose minimum squared distance to all
           repulsive points (in normalized space) is largest
           => farthest-point heuristic.
 
+    If `repulsive_archive` is provided, its (already normalized) points are
+    used instead of `repulsive_points`.
+
     Parameters
     ----------
     parameters_def : Mapping[str, Mapping[str, Any]]
@@ -248,14 +282,20 @@ def sample_random_params(
         Points in original parameter space to repel from.
     max_tries : int, default 1000
         Number of random candidates to sample; the farthest is returned.
+    codec : ParamCodec, optional
+        Prebuilt codec for `parameters_def` (built on the fly if None).
+    repulsive_archive : RepulsiveArchive, optional
+        Indexed archive of normalized points to repel from.
 
     Returns
     -------
     Dict[str, Any]
         Sampled parameter dictionary.
     """
+    use_archive = repulsive_archive is not None and len(repulsive_archive) > 0
+
     # Simple uniform sampling if no repulsive points
-    if not repulsive_points:
+    if not use_archive and not repulsive_points:
         logger.debug("Sampling parameters without repulsive points.")
         params = {}
         for name, param_def in parameters_def.items():
@@ -264,47 +304,108 @@ def sample_random_params(
                 params[name] = value
         return params
 
-    # Precompute normalized versions of the repulsive points
-    repulsive_norm = [normalize_params(rp, parameters_def) for rp in repulsive_points]
+    if codec is None:
+        codec = ParamCodec(parameters_def)
 
-    # Keys to use for distance: all numeric/choice parameters
-    all_keys = {
-        name
-        for name, param_def in parameters_def.items()
-        if param_def.get("type") in ("float", "integer", "choice")
-    }
+    # All candidates at once, then distance to nearest repulsive point
+    candidates = sample_uniform_normalized(max_tries, codec)
 
-    best_candidate = None
-    best_min_sqdist = -1.0
+    if use_archive:
+        min_sqdist = repulsive_archive.min_squared_distances(candidates)
+    else:
+        # Normalized versions of the repulsive points, as one matrix
+        repulsive_norm = codec.encode(list(repulsive_points), clip=False)
+        min_sqdist = min_squared_distances(candidates, repulsive_norm)
 
-    for _ in range(max_tries):
-        # Step 1: sample uniformly
-        candidate = {}
-        for name, param_def in parameters_def.items():
-            value = sample_parameter(name, param_def)
-            if value is not None:
-                candidate[name] = value
+    # Keep the farthest candidate (first one on ties)
+    best = int(np.argmax(min_sqdist))
 
-        # Step 2: normalize candidate
-        candidate_norm = normalize_params(candidate, parameters_def)
+    logger.debug(
+        f"sample_random_params: best min squared distance to repulsive points: {min_sqdist[best]}"
+    )
 
-        # Step 3: compute distance to nearest repulsive point
-        min_sqdist = math.inf
-        for rp_norm in repulsive_norm:
-            d2 = squared_distance(candidate_norm, rp_norm, keys=all_keys)
-            if d2 < min_sqdist:
-                min_sqdist = d2
+    return codec.decode_one(candidates[best])
 
-        # Step 4: keep track of farthest candidate
-        if min_sqdist > best_min_sqdist:
-            best_min_sqdist = min_sqdist
-            best_candidate = candidate
 
-    logger.debug(
-        f"sample_random_params: best min squared distance to repulsive points: {best_min_sqdist}"
-    )
+class QuasiRandomSampler:
+    """
+    Stateful space-filling sampler over a parameter space.
+
+    Points come from a scrambled low-discrepancy sequence (Sobol, Halton)
+    or from successive Latin hypercube blocks, and the sequence continues
+    across calls, so one sampler should live as long as its agent.
+
+    Points are generated in blocks of `block_size` (a power of two keeps
+    Sobol balanced) and handed out one slice at a time. Integer and choice
+    parameters are mapped to their discrete levels with
+    `ParamCodec.from_unit`.
+    """
 
-    return best_candidate
+    def __init__(
+        self,
+        codec: ParamCodec,
+        method: str = "sobol",
+        block_size: int = 64,
+        seed: Optional[int] = None,
+    ) -> None:
+        """
+        codec     : ParamCodec of the parameter space
+        method    : "sobol" | "halton" | "lhs" | "uniform"
+        block_size: number of points generated at once
+        seed      : scrambling seed (drawn from np.random if None)
+        """
+        if method not in SAMPLING_METHODS:
+            raise ValueError(
+                f"Unknown sampling method '{method}', expected one of {SAMPLING_METHODS}"
+            )
+
+        self.codec = codec
+        self.method = method
+        self.block_size = max(1, int(block_size))
+
+        self._engine = None
+        if codec.dim > 0 and method != "uniform":
+            if seed is None:
+                seed = int(np.random.randint(2**31 - 1))
+            # scipy.stats takes about a second to import: only loaded when a
+            # space-filling sequence is used
+            from scipy.stats import qmc
+
+            if method == "sobol":
+                self._engine = qmc.Sobol(codec.dim, scramble=True, seed=seed)
+            elif method == "halton":
+                self._engine = qmc.Halton(codec.dim, scramble=True, seed=seed)
+            elif method == "lhs":
+                self._engine = qmc.LatinHypercube(codec.dim, seed=seed)
+
+        self._buffer = np.empty((0, codec.dim), dtype=float)
+
+    def sample_unit(self, n: int) -> np.ndarray:
+        """
+        Next `n` points of the sequence in the unit hypercube, shape (n, dim).
+        """
+        if self._engine is None:
+            return np.random.rand(n, self.codec.dim)
+
+        while self._buffer.shape[0] < n:
+            block = self._engine.random(self.block_size)
+            self._buffer = np.vstack([self._buffer, block])
+
+        out = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return out
+
+    def sample(self, n: int) -> np.ndarray:
+        """
+        Next `n` points in normalized space, shape (n, dim).
+        """
+        return self.codec.from_unit(self.sample_unit(n))
+
+    def sample_params(self, n: int) -> List[Dict[str, Any]]:
+        """
+        Next `n` points as parameter dicts in original space.
+        """
+        return self.codec.decode(self.sample(n))
 
 
 def sample_gaussian_around(
@@ -312,6 +413,7 @@ def sample_gaussian_around(
     sigma: Any,
     parameters_def: Mapping[str, Mapping[str, Any]],
     clip: bool = True,
+    codec: Optional[ParamCodec] = None,
 ) -> Dict[str, Any]:
     """
     Sample a new parameter dict from a Gaussian centered at `base_params`
@@ -338,32 +440,41 @@ def sample_gaussian_around(
         Parameter definitions.
     clip : bool, default True
         Whether to clip normalized values to [0,1].
+    codec : ParamCodec, optional
+        Prebuilt codec for `parameters_def` (built on the fly if None).
 
     Returns
     -------
     Dict[str, Any]
         Sampled parameter dict in original space.
     """
-    norm_base = normalize_params(base_params, parameters_def)
-    norm_sampled = {}
+    if codec is None:
+        codec = ParamCodec(parameters_def)
 
-    for name, base_val in norm_base.items():
-        ptype = parameters_def[name].get("type")
+    # Missing base values stay NaN and are dropped when decoding
+    norm_base = codec.encode_one(base_params, missing=np.nan, clip=False)
+    return sample_gaussian_around_normalized(norm_base, sigma, codec, clip=clip)
 
-        if ptype in ("float", "integer", "choice"):
-            # Support scalar sigma or per-parameter sigma dict
-            if isinstance(sigma, dict):
-                s = sigma.get(name, 1.0)
-            else:
-                s = sigma
 
-            val = float(np.random.normal(base_val, s))
-            if clip:
-                val = float(np.clip(val, 0.0, 1.0))
-            norm_sampled[name] = val
+def sample_gaussian_around_normalized(
+    norm_base: np.ndarray,
+    sigma: Any,
+    codec: ParamCodec,
+    clip: bool = True,
+) -> Dict[str, Any]:
+    """
+    Same as `sample_gaussian_around`, with the base point already encoded
+    (e.g. a row of a `History`). NaN entries of `norm_base` are absent
+    parameters and are left out of the result.
+    """
+    # Support scalar sigma or per-parameter sigma dict
+    if isinstance(sigma, dict):
+        s = np.array([sigma.get(name, 1.0) for name in codec.names], dtype=float)
+    else:
+        s = sigma
 
-        else:
-            # Unsupported or unnormalized types: keep the normalized value as is
-            norm_sampled[name] = base_val
+    norm_sampled = np.random.normal(norm_base, s)
+    if clip:
+        norm_sampled = np.clip(norm_sampled, 0.0, 1.0)
 
-    return denormalize_params(norm_sampled, parameters_def)
+    return _decode_present(norm_sampled, codec, clip=False)
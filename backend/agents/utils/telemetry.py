@@ -0,0 +1,152 @@
+import functools
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Tuple
+
+import numpy as np
+
+EVENTS = ("play", "update", "time_warp")
+
+
+class AgentTelemetry:
+    """
+    Per-call timing and a bounded time series of the state of one agent.
+
+    After each instrumented call (see `instrumented`) one row is appended to
+    a ring buffer of `capacity` rows:
+      t            : wall-clock time of the call (s)
+      event        : "play", "update" or "time_warp"
+      duration_ms  : duration of the call
+      n_pops       : number of populations
+      history_size : number of points the agent keeps
+      sigma        : per-population step size (float32)
+      mean_norm    : per-population norm of the mean, normalized space (float32)
+
+    Timing totals cover every call since creation, not only the buffered ones.
+    """
+
+    def __init__(self, capacity: int = 512) -> None:
+        self.capacity = int(capacity)
+        self._rows: Deque[Tuple] = deque(maxlen=self.capacity)
+        # event -> [count, total seconds, max seconds]
+        self._timings: Dict[str, list] = {event: [0, 0.0, 0.0] for event in EVENTS}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def record(
+        self,
+        event: str,
+        duration: float,
+        sigma: np.ndarray,
+        mean_norm: np.ndarray,
+        history_size: int,
+    ) -> None:
+        """
+        Add one call of `event` that took `duration` seconds, with the state
+        of the agent after it.
+        """
+        timing = self._timings.setdefault(event, [0, 0.0, 0.0])
+        timing[0] += 1
+        timing[1] += duration
+        timing[2] = max(timing[2], duration)
+
+        sigma = np.asarray(sigma, dtype=np.float32)
+        self._rows.append(
+            (
+                time.time(),
+                event,
+                1e3 * duration,
+                int(sigma.shape[0]),
+                int(history_size),
+                sigma,
+                np.asarray(mean_norm, dtype=np.float32),
+            )
+        )
+
+    def timings(self) -> Dict[str, Dict[str, float]]:
+        """
+        count, total_ms, mean_ms and max_ms per event.
+        """
+        return {
+            event: {
+                "count": count,
+                "total_ms": 1e3 * total,
+                "mean_ms": 1e3 * total / count if count else 0.0,
+                "max_ms": 1e3 * peak,
+            }
+            for event, (count, total, peak) in self._timings.items()
+        }
+
+    def series(self) -> Dict[str, list]:
+        """
+        Buffered rows as columns (JSON-friendly, NaN -> None).
+        """
+        rows = list(self._rows)
+        return {
+            "t": [r[0] for r in rows],
+            "event": [r[1] for r in rows],
+            "duration_ms": [r[2] for r in rows],
+            "n_pops": [r[3] for r in rows],
+            "history_size": [r[4] for r in rows],
+            "sigma": [_to_list(r[5]) for r in rows],
+            "mean_norm": [_to_list(r[6]) for r in rows],
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "capacity": self.capacity,
+            "timings": self.timings(),
+            "series": self.series(),
+        }
+
+
+def _to_list(values: np.ndarray) -> list:
+    return [None if np.isnan(v) else round(float(v), 6) for v in values]
+
+
+def instrumented(event: str) -> Callable:
+    """
+    Method decorator: times the call and records it, with the state returned
+    by `self.telemetry_state()` -> (sigma, mean_norm, history_size), into
+    `self.telemetry` (an AgentTelemetry). The recorded duration includes
+    `telemetry_state()`, which must stay cheap: O(number of populations),
+    not a pass over the stored points.
+    """
+
+    def decorator(method: Callable) -> Callable:
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            t0 = time.perf_counter()
+            result = method(self, *args, **kwargs)
+            state = self.telemetry_state()
+            duration = time.perf_counter() - t0
+            self.telemetry.record(event, duration, *state)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def population_mean_norms(X: np.ndarray, pop_idx: np.ndarray, pops: np.ndarray) -> np.ndarray:
+    """
+    Norm of the mean of the rows of X of each population in `pops` (sorted;
+    NaN for populations without rows; NaN entries of X count as 0), in one
+    pass over X whatever the number of populations.
+    """
+    pops = np.asarray(pops)
+    norms = np.full(len(pops), np.nan)
+    if len(pops) == 0 or X.shape[0] == 0:
+        return norms
+    pos = np.searchsorted(pops, pop_idx)
+    known = pos < len(pops)
+    known[known] = pops[pos[known]] == pop_idx[known]
+    pos = pos[known]
+
+    sums = np.zeros((len(pops), X.shape[1]))
+    np.add.at(sums, pos, np.nan_to_num(X[known]))
+    counts = np.bincount(pos, minlength=len(pops))
+    filled = counts > 0
+    norms[filled] = np.linalg.norm(sums[filled] / counts[filled, None], axis=1)
+    return norms
@@ -0,0 +1,117 @@
+import asyncio
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+# ------------------------------------------------------------
+# Filesystem operations of the server, off the event loop.
+#
+# Blocking calls (writes, removes, image resizing...) run in a dedicated
+# thread pool. At most `max_pending` operations are queued or running; the
+# next caller waits for a slot, so a slow disk slows the requests that write
+# instead of piling up work and memory.
+#
+# fsync policy of write_atomic:
+#   "never"  : rely on the OS page cache (default, fastest)
+#   "file"   : fsync the file before it is renamed in place
+#   "always" : also fsync the directory, so the rename itself is durable
+# ------------------------------------------------------------
+FSYNC_POLICIES = ("never", "file", "always")
+
+
+def write_atomic(path: str, data: bytes, fsync: str = "never") -> None:
+    # writes to a unique temporary name then renames: readers see the whole
+    # file or nothing, and concurrent writers of the same path do not mix
+    tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            if fsync != "never":
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    if fsync == "always":
+        fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def remove_file(path: str) -> bool:
+    # True if the file existed
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def remove_files(paths) -> int:
+    # removes the files that exist, returns the number of bytes freed
+    freed = 0
+    for path in paths:
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            freed += size
+        except FileNotFoundError:
+            pass
+    return freed
+
+
+class AsyncFileIO:
+    def __init__(self, max_workers: int = 4, max_pending: int = 64, fsync: str = "never"):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"unknown fsync policy {fsync!r}, expected one of {FSYNC_POLICIES}")
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.fsync = fsync
+        self.pending = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def _ensure_started(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="file-io"
+            )
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+
+    async def run(self, fn: Callable, *args: Any) -> Any:
+        # fn(*args) in the pool, once a slot is free
+        self._ensure_started()
+        async with self._slots:
+            self.pending += 1
+            try:
+                return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+            finally:
+                self.pending -= 1
+
+    # --------------------------------------------------------
+    async def write(self, path: str, data: bytes) -> None:
+        await self.run(write_atomic, path, data, self.fsync)
+
+    async def remove(self, path: str) -> bool:
+        return await self.run(remove_file, path)
+
+    async def makedirs(self, path: str) -> None:
+        await self.run(lambda: os.makedirs(path, exist_ok=True))
+
+    async def isfile(self, path: str) -> bool:
+        return await self.run(os.path.isfile, path)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self._slots = None
@@ -0,0 +1,104 @@
+import hashlib
+import os
+from collections import Counter
+from typing import Dict, Iterable, Optional, Tuple
+
+from backend.async_io import write_atomic
+from backend.utils_image import IMAGE_RESIZE_TARGET_WIDTHS
+
+# ------------------------------------------------------------
+# Content-addressed image storage of a session.
+#
+# An image is stored once under the hash of its bytes, with two levels of
+# fan-out so no directory grows past a few hundred entries:
+#     {root}/ab/cd/abcd0123...ef.jpg          original
+#     {root}/ab/cd/abcd0123...ef_w256.jpg     renditions (IMAGE_RESIZE_TARGET_WIDTHS)
+# The DB documents holding the digest (field "blob") are the references: the
+# counts are built from the documents once, then kept up to date in memory,
+# so saving an image that is already stored only writes its document.
+# Reference counts are changed on the event loop; put() and remove() do the
+# file work and may run in the I/O thread pool (backend/async_io.py).
+# ------------------------------------------------------------
+DIGEST_SIZE = 16  # bytes, 32 hex characters
+
+
+def blob_digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=DIGEST_SIZE).hexdigest()
+
+
+class BlobStore:
+    def __init__(self, root: str, docs: Iterable[dict] = ()):
+        # docs: DB documents of the session, to count the references
+        self.root = root
+        self.refs = Counter(doc["blob"] for doc in docs if doc.get("blob"))
+
+    # --------------------------------------------------------
+    def relpath(self, digest: str, ext: str, width: Optional[int] = None) -> str:
+        # path below root, with "/" separators (also used in URLs)
+        suffix = f"_w{width}" if width is not None else ""
+        return f"{digest[:2]}/{digest[2:4]}/{digest}{suffix}.{ext}"
+
+    def path(self, digest: str, ext: str, width: Optional[int] = None) -> str:
+        return os.path.join(self.root, *self.relpath(digest, ext, width).split("/"))
+
+    def exists(self, digest: str, ext: str) -> bool:
+        return os.path.isfile(self.path(digest, ext))
+
+    # --------------------------------------------------------
+    def put(self, data: bytes, ext: str, fsync: str = "never", digest: Optional[str] = None) -> Tuple[str, bool]:
+        # stores data unless already there; returns (digest, written).
+        # digest: blob_digest(data), when the caller already has it
+        if digest is None:
+            digest = blob_digest(data)
+        path = self.path(digest, ext)
+        if os.path.isfile(path):
+            # touched, so the orphan collector leaves it alone until the
+            # document referencing it is written
+            os.utime(path)
+            return digest, False
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_atomic(path, data, fsync)
+        return digest, True
+
+    def rendition_paths(self, digest: str, ext: str) -> Dict[int, str]:
+        # width -> path of each resized rendition
+        return {width: self.path(digest, ext, width) for width in IMAGE_RESIZE_TARGET_WIDTHS}
+
+    # --------------------------------------------------------
+    def incref(self, digest: str) -> int:
+        self.refs[digest] += 1
+        return self.refs[digest]
+
+    def decref(self, digest: str) -> int:
+        # drops one reference, returns the references left (at 0, the files
+        # can be removed)
+        self.refs[digest] -= 1
+        if self.refs[digest] > 0:
+            return self.refs[digest]
+        del self.refs[digest]
+        return 0
+
+    def remove(self, digest: str, ext: str) -> int:
+        # removes the original and its renditions, unless the content was
+        # saved again in the meantime. Returns the number of bytes freed
+        if self.refs.get(digest):
+            return 0
+        freed = 0
+        for path in [self.path(digest, ext)] + list(self.rendition_paths(digest, ext).values()):
+            try:
+                freed += os.path.getsize(path)
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+        # fan-out directories left empty
+        directory = os.path.dirname(self.path(digest, ext))
+        for _ in range(2):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                break
+            directory = os.path.dirname(directory)
+        return freed
+
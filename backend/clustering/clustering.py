@@ -14,6 +14,8 @@ from sklearn.preprocessing import StandardScaler
 from sklearn.manifold import TSNE
 from urllib.parse import urlparse
 
+from backend.agents.utils.codec import ParamCodec
+
 # ---------------------------------------------------------------------------
 # Tree structures
 # ---------------------------------------------------------------------------
@@ -110,11 +112,13 @@ def load_tinydb_data(
     - filters out drawings with score < score_min
     - filters out drawings whose metadata.agent_name != agent_name
     - normalizes timestamps to [0,1]
+    - encodes parameters to [0,1] in one pass with the stored definitions
 
     Returns
     -------
     df_params : pandas.DataFrame
-        Index = drawing IDs, Columns = parameter names (M, N1, ...)
+        Index = drawing IDs, Columns = parameter names (M, N1, ...),
+        values normalized (NaN where a parameter is missing)
     timestamps_norm : pandas.Series
         Index = drawing IDs, values = normalized timestamps in [0,1]
     urls : pandas.Series
@@ -126,6 +130,8 @@ def load_tinydb_data(
     table = raw.get("_default", raw)
 
     records: List[Dict[str, Any]] = []
+    record_ids: List[str] = []
+    parameters_def: Dict[str, Dict[str, Any]] = {}
     timestamp_records: List[Dict[str, Any]] = []
     url_records: List[Dict[str, Any]] = []
 
@@ -144,6 +150,10 @@ def load_tinydb_data(
         params = doc.get("parameters", {})
         flat_params = {name: meta.get("value") for name, meta in params.items()}
 
+        # Each stored parameter carries its own definition next to its value
+        for name, meta in params.items():
+            parameters_def.setdefault(name, meta)
+
         # Timestamp (ms since epoch as string)
         ts = doc.get("timestamp")
         if ts is None:
@@ -152,7 +162,8 @@ def load_tinydb_data(
 
         img_url = doc.get("url")
 
-        records.append({"id": doc_id, **flat_params})
+        records.append(flat_params)
+        record_ids.append(doc_id)
         timestamp_records.append({"id": doc_id, "timestamp": ts})
         url_records.append({"id": doc_id, "url": img_url})
 
@@ -162,7 +173,9 @@ def load_tinydb_data(
         empty_series_obj = pd.Series(dtype=object)
         return pd.DataFrame(), empty_series_float, empty_series_obj
 
-    df_params = pd.DataFrame(records).set_index("id")
+    codec = ParamCodec(parameters_def)
+    X = codec.encode(records, missing=np.nan, clip=False)
+    df_params = pd.DataFrame(X, index=pd.Index(record_ids, name="id"), columns=codec.names)
     df_timestamp = pd.DataFrame(timestamp_records).set_index("id")
     df_urls = pd.DataFrame(url_records).set_index("id")
 
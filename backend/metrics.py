@@ -0,0 +1,244 @@
+import bisect
+import math
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# ------------------------------------------------------------
+# Minimal Prometheus-style metrics (text exposition format 0.0.4).
+# Updates are a dict lookup plus an addition, cheap enough to stay on in
+# production. The server runs one event loop thread, so there is no lock.
+# ------------------------------------------------------------
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency buckets in seconds, from 1 ms to 30 s
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    metric_type = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self):
+        lines = self.header()
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Metric):
+    # Value(s) computed when /metrics is scraped: callback() returns either
+    # a number (no labels) or an iterable of (label values, number)
+    metric_type = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), callback: Optional[Callable] = None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        self._values[self._key(labels)] = value
+
+    def _samples(self) -> Iterable[Tuple[LabelValues, float]]:
+        if self.callback is None:
+            return sorted(self._values.items())
+        result = self.callback()
+        if isinstance(result, (int, float)):
+            return [((), result)]
+        return sorted((tuple(map(str, k)), v) for k, v in result)
+
+    def render(self):
+        lines = self.header()
+        for key, value in self._samples():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label values: [count per bucket (+Inf last)], sum
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        counts = self._counts.get(key)
+        if counts is None:
+            counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            self._sums[key] = 0.0
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self._sums[key] += value
+
+    @contextmanager
+    def time(self, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def count(self, **labels) -> int:
+        return sum(self._counts.get(self._key(labels), ()))
+
+    def render(self):
+        lines = self.header()
+        for key in sorted(self._counts):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (math.inf,), self._counts[key]):
+                cumulative += n
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+                )
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(self._sums[key])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), callback=None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, callback))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# ------------------------------------------------------------
+# Metrics of the server
+# ------------------------------------------------------------
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "paramexplorer_http_requests_total",
+    "HTTP requests by route, method and status.",
+    ("route", "method", "status"),
+)
+HTTP_LATENCY = REGISTRY.histogram(
+    "paramexplorer_http_request_duration_seconds",
+    "HTTP request latency by route.",
+    ("route", "method"),
+)
+IMAGES_SAVED = REGISTRY.counter(
+    "paramexplorer_images_saved_total",
+    "Images saved through /save.",
+)
+IMAGE_BYTES_SAVED = REGISTRY.counter(
+    "paramexplorer_image_bytes_saved_total",
+    "Bytes of original images saved through /save (renditions excluded).",
+)
+THUMBNAIL_LATENCY = REGISTRY.histogram(
+    "paramexplorer_thumbnail_duration_seconds",
+    "Time to generate the resized renditions of one image.",
+)
+AGENT_PLAY_LATENCY = REGISTRY.histogram(
+    "paramexplorer_agent_play_duration_seconds",
+    "Agent play() duration by agent class.",
+    ("agent_class",),
+)
+AGENT_UPDATE_LATENCY = REGISTRY.histogram(
+    "paramexplorer_agent_update_duration_seconds",
+    "Agent update() duration by agent class.",
+    ("agent_class",),
+)
+GC_RECLAIMED_FILES = REGISTRY.counter(
+    "paramexplorer_gc_reclaimed_files_total",
+    "Orphaned image files removed by the garbage collector.",
+)
+GC_RECLAIMED_BYTES = REGISTRY.counter(
+    "paramexplorer_gc_reclaimed_bytes_total",
+    "Bytes reclaimed by the garbage collector.",
+)
+SESSIONS_COMPACTED = REGISTRY.counter(
+    "paramexplorer_sessions_compacted_total",
+    "Idle sessions packed into a compressed archive.",
+)
+COMPACTION_RECLAIMED_BYTES = REGISTRY.counter(
+    "paramexplorer_compaction_reclaimed_bytes_total",
+    "Bytes reclaimed by the compaction of idle sessions.",
+)
+SESSION_RESTORE_LATENCY = REGISTRY.histogram(
+    "paramexplorer_session_restore_duration_seconds",
+    "Time to restore a compacted session on its first request.",
+)
+CLUSTERING_LATENCY = REGISTRY.histogram(
+    "paramexplorer_clustering_duration_seconds",
+    "Clustering job duration by job.",
+    ("job",),
+)
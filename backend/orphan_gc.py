@@ -0,0 +1,193 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set
+from urllib.parse import urlparse
+
+from backend.blob_store import DIGEST_SIZE, BlobStore
+from backend.metrics import GC_RECLAIMED_BYTES, GC_RECLAIMED_FILES
+from backend.utils_image import IMAGE_RESIZE_TARGET_WIDTHS
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------------------------------------
+# Image files of DB documents, and collection of the files of a session
+# folder that no document references any more (left by interrupted saves,
+# by deletes from before renditions were removed, by crashes...).
+# ------------------------------------------------------------
+DB_FILENAME = "tinydb.json"
+# compressed archive of a compacted session (backend/session_compactor.py)
+ARCHIVE_BASENAME = "session.tar"
+
+
+def image_files(doc: dict, store: Optional[BlobStore]) -> List[str]:
+    # original and renditions of the image of a document
+    url = doc.get("url") or ""
+    path = urlparse(url).path.lstrip("/")
+    ext = os.path.splitext(path)[1].lstrip(".") or "jpg"
+
+    digest = doc.get("blob")
+    if digest and store is not None:
+        return [store.path(digest, ext)] + list(store.rendition_paths(digest, ext).values())
+    if not path:
+        return []
+    # ex: backend/data/images/<session_id>/<pe_id>_image_<timestamp>.jpg
+    base, dot_ext = os.path.splitext(path)
+    return [path] + [f"{base}_w{width}{dot_ext}" for width in IMAGE_RESIZE_TARGET_WIDTHS]
+
+
+def blob_key(filename: str) -> Optional[str]:
+    # digest of a blob store file (original or rendition), None otherwise
+    stem = os.path.splitext(filename)[0].split("_w")[0]
+    return stem if len(stem) == 2 * DIGEST_SIZE else None
+
+
+def collect_orphans(
+    session_dir: str,
+    referenced: Set[str],
+    grace: float,
+    live_refs: Optional[dict] = None,
+    dry_run: bool = False,
+) -> Dict[str, int]:
+    # removes the files of session_dir that are not in `referenced` (absolute
+    # paths) and older than `grace` seconds. Blob files are kept while their
+    # digest is in live_refs, the current counts of the store (a save may
+    # have referenced them since `referenced` was built); a save of stored
+    # content touches the original, which the grace period then protects.
+    now = time.time()
+    report = {"files": 0, "bytes": 0}
+    for dirpath, _, filenames in os.walk(session_dir):
+        for filename in filenames:
+            if filename == DB_FILENAME or filename.startswith(ARCHIVE_BASENAME):
+                continue
+            path = os.path.abspath(os.path.join(dirpath, filename))
+            if path in referenced:
+                continue
+            try:
+                stat = os.stat(path)
+                mtime = stat.st_mtime
+                key = blob_key(filename)
+                if key is not None:
+                    if live_refs is not None and live_refs.get(key):
+                        continue
+                    original = os.path.join(dirpath, key + os.path.splitext(filename)[1])
+                    if original != path and os.path.exists(original):
+                        mtime = max(mtime, os.stat(original).st_mtime)
+                if now - mtime < grace:
+                    continue
+                if not dry_run:
+                    os.remove(path)
+            except FileNotFoundError:
+                continue
+            report["files"] += 1
+            report["bytes"] += stat.st_size
+
+    if not dry_run:
+        # fan-out folders left empty
+        for dirpath, dirnames, filenames in os.walk(session_dir, topdown=False):
+            if dirpath != session_dir and not dirnames and not filenames:
+                try:
+                    os.rmdir(dirpath)
+                except OSError:
+                    pass
+    return report
+
+
+class OrphanCollector:
+    # Runs collect_orphans over every session folder every `interval`
+    # seconds, in the I/O thread pool; the DB documents are read on the loop
+    # by `referenced_files(session_id)`.
+
+    def __init__(
+        self,
+        path_images: str,
+        referenced_files: Callable[[str], Iterable[str]],
+        live_refs: Callable[[str], Optional[dict]],
+        io,
+        interval: float = 3600.0,
+        grace: float = 600.0,
+    ):
+        self.path_images = path_images
+        self.referenced_files = referenced_files
+        self.live_refs = live_refs
+        self.io = io
+        self.interval = interval
+        self.grace = grace
+        self.last_report: Optional[dict] = None
+        self.total_files = 0
+        self.total_bytes = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def sessions(self) -> List[str]:
+        try:
+            entries = list(os.scandir(self.path_images))
+        except FileNotFoundError:
+            return []
+        # only folders of a session with a DB: without it, nothing is referenced
+        return sorted(
+            e.name for e in entries
+            if e.is_dir() and os.path.isfile(os.path.join(e.path, DB_FILENAME))
+        )
+
+    async def run_once(self, session_ids: Optional[List[str]] = None, dry_run: bool = False) -> dict:
+        # session_ids are restricted to the existing sessions (folder names
+        # below path_images, with a DB)
+        t0 = time.perf_counter()
+        sessions = await self.io.run(self.sessions)
+        if session_ids is None:
+            session_ids = sessions
+        else:
+            known = set(sessions)
+            session_ids = [s for s in session_ids if isinstance(s, str) and s in known]
+        report = {"sessions": {}, "files": 0, "bytes": 0, "dry_run": dry_run}
+        for session_id in session_ids:
+            session_dir = os.path.join(self.path_images, session_id)
+            referenced = {os.path.abspath(p) for p in self.referenced_files(session_id)}
+            result = await self.io.run(
+                collect_orphans,
+                session_dir,
+                referenced,
+                self.grace,
+                self.live_refs(session_id),
+                dry_run,
+            )
+            report["sessions"][session_id] = result
+            report["files"] += result["files"]
+            report["bytes"] += result["bytes"]
+
+        report["duration_s"] = time.perf_counter() - t0
+        report["time"] = time.time()
+        if not dry_run:
+            self.total_files += report["files"]
+            self.total_bytes += report["bytes"]
+            self.last_report = report
+            GC_RECLAIMED_FILES.inc(report["files"])
+            GC_RECLAIMED_BYTES.inc(report["bytes"])
+        logger.info(
+            f"Orphan GC: {report['files']} files, {report['bytes'] / 1024**2:.1f} MB "
+            f"{'reclaimable' if dry_run else 'reclaimed'} in {len(session_ids)} sessions "
+            f"({report['duration_s']:.2f} s)"
+        )
+        return report
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.warning(f"Orphan GC failed: {e}")
+
+    async def on_startup(self, app):
+        if self.interval > 0:
+            self._task = asyncio.create_task(self._loop())
+
+    async def on_cleanup(self, app):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,293 @@
+import asyncio
+import cProfile
+import itertools
+import logging
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------------------------------------
+# Opt-in profiling of the aiohttp app (server.py --profiling).
+#
+# - On demand: POST /profiling/start {"requests": N} or {"seconds": T}
+#   runs cProfile on the event loop thread for the next N requests or T
+#   seconds, together with the stack sampler.
+# - Slow requests: a background thread samples the event loop stack every
+#   `sample_interval` seconds; a request slower than `slow_threshold` is
+#   captured with its route, session and the stacks sampled while it ran
+#   (they include whatever else the loop ran meanwhile).
+#
+# Captures are kept in a bounded list and downloaded as collapsed stacks
+# (flamegraph.pl / speedscope input) or pstats files:
+#   GET /profiling                    list of captures
+#   GET /profiling/{id}.collapsed     collapsed stacks
+#   GET /profiling/{id}.pstats        cProfile stats (on-demand captures),
+#                                     readable by `python -m pstats`
+# ------------------------------------------------------------
+
+
+class StackSampler:
+    # Samples the stack of one thread at a fixed interval from a daemon
+    # thread and keeps (time, collapsed stack) pairs in a ring buffer.
+
+    def __init__(self, interval: float = 0.005, max_samples: int = 20000):
+        self.interval = float(interval)
+        self.samples: Deque[Tuple[float, str]] = deque(maxlen=max_samples)
+        self._labels: Dict[object, str] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._target: Optional[int] = None
+
+    def start(self, target_thread_id: int) -> None:
+        if self._thread is not None:
+            return
+        self._target = target_thread_id
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        self._thread = None
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            self._labels[code] = label
+        return label
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            # an idle loop waits in select(): not interesting
+            if stack and stack[0].startswith("select ("):
+                continue
+            self.samples.append((time.perf_counter(), ";".join(reversed(stack))))
+
+    def collapsed(self, t_start: float, t_end: float) -> str:
+        # Samples taken in [t_start, t_end], as "frame;frame;... count" lines
+        counts = Counter(s for t, s in list(self.samples) if t_start <= t <= t_end)
+        return "".join(f"{stack} {n}\n" for stack, n in counts.most_common())
+
+
+class Profiler:
+    def __init__(
+        self,
+        slow_threshold: Optional[float] = 1.0,
+        sample_interval: float = 0.005,
+        max_captures: int = 50,
+        session_info: Optional[Callable[[str], Dict]] = None,
+    ):
+        # slow_threshold : seconds above which a request is captured (None: off)
+        # session_info   : session_id -> dict of facts about the session
+        self.slow_threshold = slow_threshold
+        self.sampler = StackSampler(interval=sample_interval)
+        self.captures: Deque[Dict] = deque(maxlen=max_captures)
+        self.session_info = session_info
+        self._ids = itertools.count(1)
+
+        # on-demand cProfile window
+        self._profile: Optional[cProfile.Profile] = None
+        self._window: Optional[Dict] = None
+        self._deadline_handle = None
+
+    # --------------------------------------------------------
+    # Lifecycle
+    # --------------------------------------------------------
+    async def on_startup(self, app):
+        self.sampler.start(threading.get_ident())
+
+    async def on_cleanup(self, app):
+        self._finish_window()
+        self.sampler.stop()
+
+    def add_routes(self, router):
+        router.add_post("/profiling/start", self.handle_start)
+        router.add_post("/profiling/stop", self.handle_stop)
+        router.add_get("/profiling", self.handle_list)
+        router.add_get("/profiling/{capture_id:\\d+}.{fmt:collapsed|pstats}", self.handle_download)
+
+    # --------------------------------------------------------
+    # On-demand window
+    # --------------------------------------------------------
+    def start_window(self, n_requests: Optional[int], seconds: Optional[float]) -> None:
+        self._finish_window()
+        self._window = {
+            "requests_left": n_requests,
+            "t_start": time.perf_counter(),
+            "created": time.time(),
+            "n_requests": 0,
+        }
+        if seconds is not None:
+            self._deadline_handle = asyncio.get_running_loop().call_later(seconds, self._finish_window)
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+        logger.info(f"Profiler: window started (requests={n_requests}, seconds={seconds})")
+
+    def _finish_window(self) -> None:
+        if self._window is None:
+            return
+        self._profile.disable()
+        if self._deadline_handle is not None:
+            self._deadline_handle.cancel()
+            self._deadline_handle = None
+
+        t_end = time.perf_counter()
+        stats = pstats.Stats(self._profile)
+        self._add_capture(
+            {
+                "kind": "window",
+                "route": None,
+                "session": None,
+                "n_requests": self._window["n_requests"],
+                "duration_ms": 1e3 * (t_end - self._window["t_start"]),
+                "created": self._window["created"],
+            },
+            collapsed=self.sampler.collapsed(self._window["t_start"], t_end),
+            pstats_bytes=marshal.dumps(stats.stats),
+        )
+        self._window = None
+        self._profile = None
+        logger.info("Profiler: window finished")
+
+    def _add_capture(self, info: Dict, collapsed: str, pstats_bytes: Optional[bytes] = None):
+        info["id"] = next(self._ids)
+        info["n_samples"] = sum(int(line.rsplit(" ", 1)[1]) for line in collapsed.splitlines())
+        self.captures.append(dict(info, _collapsed=collapsed, _pstats=pstats_bytes))
+
+    # --------------------------------------------------------
+    # Middleware
+    # --------------------------------------------------------
+    @web.middleware
+    async def middleware(self, request, handler):
+        if request.path.startswith("/profiling"):
+            return await handler(request)
+
+        t_start = time.perf_counter()
+        try:
+            return await handler(request)
+        finally:
+            t_end = time.perf_counter()
+            if self._window is not None:
+                self._window["n_requests"] += 1
+                left = self._window["requests_left"]
+                if left is not None:
+                    self._window["requests_left"] = left - 1
+                    if left - 1 <= 0:
+                        self._finish_window()
+
+            if self.slow_threshold is not None and t_end - t_start >= self.slow_threshold:
+                await self._capture_slow(request, t_start, t_end)
+
+    async def _capture_slow(self, request, t_start: float, t_end: float) -> None:
+        route = request.match_info.route
+        resource = route.resource if route is not None else None
+        session = None
+        try:
+            # the body was already read by the handler, this is cached
+            if request.can_read_body or request.body_exists:
+                session_id = (await request.json()).get("session_id")
+                if session_id is not None:
+                    session = {"session_id": session_id}
+                    if self.session_info is not None:
+                        session.update(self.session_info(session_id))
+        except Exception:
+            pass
+
+        self._add_capture(
+            {
+                "kind": "slow_request",
+                "route": resource.canonical if resource is not None else request.path,
+                "method": request.method,
+                "session": session,
+                "duration_ms": 1e3 * (t_end - t_start),
+                "created": time.time(),
+            },
+            collapsed=self.sampler.collapsed(t_start, t_end),
+        )
+        logger.warning(
+            f"Profiler: slow request {request.method} {request.path} "
+            f"({1e3 * (t_end - t_start):.0f} ms) captured"
+        )
+
+    # --------------------------------------------------------
+    # Handlers
+    # --------------------------------------------------------
+    async def handle_start(self, request: web.Request):
+        try:
+            data = await request.json()
+        except Exception:
+            data = {}
+        n_requests = data.get("requests")
+        seconds = data.get("seconds")
+        if n_requests is None and seconds is None:
+            n_requests = 100
+        try:
+            n_requests = None if n_requests is None else max(1, int(n_requests))
+            seconds = None if seconds is None else float(seconds)
+        except (TypeError, ValueError):
+            return web.json_response(
+                {"status": "error", "message": "requests must be an integer, seconds a number"},
+                status=400,
+            )
+        self.start_window(n_requests, seconds)
+        return web.json_response({"status": "ok", "requests": n_requests, "seconds": seconds})
+
+    async def handle_stop(self, request: web.Request):
+        running = self._window is not None
+        self._finish_window()
+        return web.json_response({"status": "ok", "stopped": running})
+
+    async def handle_list(self, request: web.Request):
+        captures = [
+            {k: v for k, v in c.items() if not k.startswith("_")} for c in self.captures
+        ]
+        return web.json_response(
+            {
+                "status": "ok",
+                "window_running": self._window is not None,
+                "slow_threshold_ms": None if self.slow_threshold is None else 1e3 * self.slow_threshold,
+                "captures": captures,
+            }
+        )
+
+    async def handle_download(self, request: web.Request):
+        capture_id = int(request.match_info["capture_id"])
+        fmt = request.match_info["fmt"]
+        capture = next((c for c in self.captures if c["id"] == capture_id), None)
+        if capture is None:
+            raise web.HTTPNotFound()
+
+        filename = f"profile_{capture_id}.{fmt}"
+        headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+        if fmt == "collapsed":
+            return web.Response(text=capture["_collapsed"], headers=headers)
+        if capture["_pstats"] is None:
+            return web.json_response(
+                {"status": "error", "message": "no pstats for this capture, use .collapsed"},
+                status=404,
+            )
+        return web.Response(
+            body=capture["_pstats"],
+            content_type="application/octet-stream",
+            headers=headers,
+        )
+
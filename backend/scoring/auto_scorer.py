@@ -0,0 +1,97 @@
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional, Set
+
+from backend.scoring.scorers import resolve_scorer, score_image_file
+
+logger = logging.getLogger(__name__)
+
+
+class AutoScorer:
+    """
+    Scores saved images in a pool of worker processes, off the event loop.
+
+    `submit` schedules one image and returns immediately; once the worker is
+    done, `on_score(score)` is called on the event loop (where the database
+    and the agents live). Failures are logged and counted, never raised.
+    The pool is created on first use.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None) -> None:
+        """
+        max_workers: size of the process pool (None: number of CPUs)
+        """
+        self.max_workers = max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+        self.n_submitted = 0
+        self.n_scored = 0
+        self.n_failed = 0
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    @property
+    def pending(self) -> int:
+        """Number of images submitted and not scored yet."""
+        return len(self._tasks)
+
+    def submit(
+        self,
+        path: str,
+        scorer_name: str,
+        on_score: Callable[[float], None],
+        allow_import: bool = False,
+    ) -> None:
+        """
+        Score the image at `path` with `scorer_name` in the background, then
+        call `on_score(score)`. Must be called from the event loop.
+        allow_import: accept "package.module:function" names (see
+        `resolve_scorer`).
+        """
+        # Fail early (in the server process) on unknown scorers
+        resolve_scorer(scorer_name, allow_import)
+
+        task = asyncio.get_running_loop().create_task(
+            self._run(path, scorer_name, on_score, allow_import)
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        self.n_submitted += 1
+
+    async def _run(
+        self,
+        path: str,
+        scorer_name: str,
+        on_score: Callable[[float], None],
+        allow_import: bool,
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            score = await loop.run_in_executor(
+                self.executor, score_image_file, path, scorer_name, allow_import
+            )
+            on_score(score)
+        except Exception as e:
+            self.n_failed += 1
+            logger.warning(f"AutoScorer: scoring {path} with {scorer_name} failed: {e}")
+            return
+        self.n_scored += 1
+
+    async def drain(self) -> None:
+        """Wait until every submitted image is scored."""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def shutdown(self) -> None:
+        """Cancel pending work and stop the worker processes."""
+        for task in list(self._tasks):
+            task.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
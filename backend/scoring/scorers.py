@@ -0,0 +1,125 @@
+import importlib
+import logging
+from typing import Callable, Dict
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# A scorer maps an RGB image, float array (h, w, 3) in [0, 255], to a score
+# in [0, 100] (the scale of the scores given in the browser).
+Scorer = Callable[[np.ndarray], float]
+
+SCORERS: Dict[str, Scorer] = {}
+
+# Images are scored on a copy at most this wide (the _w256 rendition is used
+# when it exists, so this rarely resizes anything)
+SCORING_MAX_WIDTH = 256
+
+
+def register_scorer(name: str) -> Callable[[Scorer], Scorer]:
+    """
+    Decorator registering a scorer under `name`.
+
+    Scorers run in worker processes: register them in a module imported at
+    server start-up, or refer to them as "package.module:function".
+    """
+
+    def decorator(func: Scorer) -> Scorer:
+        SCORERS[name] = func
+        return func
+
+    return decorator
+
+
+def resolve_scorer(name: str, allow_import: bool = False) -> Scorer:
+    """
+    Scorer registered as `name`, or, with allow_import, the function
+    designated by a "package.module:function" path. Only the server's own
+    configuration (--auto-scorer) may allow imports, never a request.
+    """
+    if name in SCORERS:
+        return SCORERS[name]
+    if allow_import and ":" in name:
+        module_name, func_name = name.split(":", 1)
+        return getattr(importlib.import_module(module_name), func_name)
+    raise ValueError(f"Unknown scorer: {name}")
+
+
+# ---------------------------------------------------------------------------
+# Image statistics
+# ---------------------------------------------------------------------------
+
+
+def _gray(rgb: np.ndarray) -> np.ndarray:
+    """Luma (ITU-R BT.601) of an RGB array, same range as the input."""
+    return rgb @ np.array([0.299, 0.587, 0.114])
+
+
+@register_scorer("colorfulness")
+def colorfulness(rgb: np.ndarray) -> float:
+    """
+    Hasler & Süsstrunk (2003) colorfulness metric, on opponent channels
+    rg = R - G and yb = (R + G) / 2 - B. Values above ~100 are "extremely
+    colorful" on their scale, so the metric is clipped to [0, 100].
+    """
+    R, G, B = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    rg = R - G
+    yb = 0.5 * (R + G) - B
+    std = np.sqrt(rg.var() + yb.var())
+    mean = np.sqrt(rg.mean() ** 2 + yb.mean() ** 2)
+    return float(np.clip(std + 0.3 * mean, 0.0, 100.0))
+
+
+@register_scorer("edge_density")
+def edge_density(rgb: np.ndarray, threshold: float = 0.1, saturation: float = 0.25) -> float:
+    """
+    Share of pixels whose luma gradient magnitude exceeds `threshold` (in
+    [0, 1] units), scaled so that a share of `saturation` scores 100.
+    """
+    gray = _gray(rgb) / 255.0
+    gx = np.zeros_like(gray)
+    gy = np.zeros_like(gray)
+    gx[:, 1:-1] = 0.5 * (gray[:, 2:] - gray[:, :-2])
+    gy[1:-1, :] = 0.5 * (gray[2:, :] - gray[:-2, :])
+    density = np.mean(np.hypot(gx, gy) > threshold)
+    return float(100.0 * min(1.0, density / saturation))
+
+
+@register_scorer("entropy")
+def entropy(rgb: np.ndarray) -> float:
+    """
+    Shannon entropy of the 256-bin luma histogram, 8 bits mapping to 100.
+    """
+    gray = np.clip(_gray(rgb), 0, 255).astype(np.uint8)
+    counts = np.bincount(gray.ravel(), minlength=256)
+    p = counts[counts > 0] / gray.size
+    return float(100.0 * max(0.0, -(p * np.log2(p)).sum()) / 8.0)
+
+
+# ---------------------------------------------------------------------------
+# Worker entry point
+# ---------------------------------------------------------------------------
+
+
+def load_rgb(path: str, max_width: int = SCORING_MAX_WIDTH) -> np.ndarray:
+    """Image file as a float RGB array, downscaled to at most max_width."""
+    with Image.open(path) as img:
+        img = img.convert("RGB")
+        if img.width > max_width:
+            height = max(1, int(img.height * max_width / img.width))
+            img = img.resize((max_width, height), Image.BILINEAR)
+        return np.asarray(img, dtype=float)
+
+
+def score_image_file(path: str, scorer_name: str, allow_import: bool = False) -> float:
+    """
+    Score one image file with the scorer `scorer_name`. Runs in the worker
+    processes of the auto scorer, so it only takes picklable arguments.
+    """
+    scorer = resolve_scorer(scorer_name, allow_import)
+    score = float(scorer(load_rgb(path)))
+    if not np.isfinite(score):
+        raise ValueError(f"scorer {scorer_name} returned {score}")
+    return float(np.clip(score, 0.0, 100.0))
@@ -0,0 +1,434 @@
+import argparse
+import asyncio
+import io
+import json
+import logging
+import os
+import pickle
+import sys
+import tarfile
+import time
+from datetime import datetime, timezone
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from backend.orphan_gc import image_files
+from backend.utils_image import save_renditions
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------------------------------------
+# A session as one tar stream, to move it between machines.
+#
+#   manifest.json            format, session, counts, parameter names
+#   table.npz                one row per image document (columns below)
+#   agents/<agent_name>.pkl  state of the live agents (optional, pickle)
+#   images/<digest>.<ext>    originals, once per distinct content
+#
+# Columns of table.npz (np.savez_compressed, no pickled objects):
+#   id, score (float64, NaN for None), param.<name> (float64 value of each
+#   numeric parameter, NaN where absent), and the variable-length strings
+#   timestamp, image (member holding the image), parameters and metadata
+#   (JSON of the document fields), each as <name>.data (utf-8 bytes) and
+#   <name>.offsets (n + 1 int64, like an Arrow string column).
+#
+# The archive is written and read member by member: the export reads the
+# images from disk in chunks while they are sent, the import stores each
+# image as it arrives (renditions are regenerated, not archived). The
+# manifest and the table come first, so the import is a single pass.
+# Agent state is pickled: agents are only restored when read_archive() is
+# called with restore_agents by code that trusts the archive, never by the
+# /session/import endpoint.
+# ------------------------------------------------------------
+ARCHIVE_FORMAT = 1
+MANIFEST_NAME = "manifest.json"
+TABLE_NAME = "table.npz"
+AGENTS_DIR = "agents/"
+IMAGES_DIR = "images/"
+
+CHUNK_SIZE = 256 * 1024
+MAX_MEMBER_SIZE = 256 * 1024**2
+BLOCK_SIZE = tarfile.BLOCKSIZE
+STRING_COLUMNS = ("timestamp", "image", "parameters", "metadata")
+
+
+class ArchiveError(ValueError):
+    pass
+
+
+# ------------------------------------------------------------
+# Table
+# ------------------------------------------------------------
+def pack_strings(values: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def unpack_strings(data: np.ndarray, offsets: np.ndarray) -> List[str]:
+    buffer = data.tobytes()
+    return [buffer[a:b].decode("utf-8") for a, b in zip(offsets[:-1], offsets[1:])]
+
+
+def image_ext(doc: dict) -> str:
+    return os.path.splitext(doc.get("url") or "")[1].lstrip(".") or "jpg"
+
+
+def build_table(docs, store) -> Tuple[Dict[str, np.ndarray], List[Tuple[str, str]]]:
+    # columns of the documents, and (member name, path) of the images to
+    # archive, once per distinct content
+    images: Dict[str, str] = {}
+    member_names = []
+    for doc in docs:
+        digest = doc.get("blob")
+        ext = image_ext(doc)
+        if digest:
+            name = f"{IMAGES_DIR}{digest}.{ext}"
+            path = store.path(digest, ext)
+        else:
+            files = image_files(doc, None)
+            name = f"{IMAGES_DIR}doc{doc.doc_id}.{ext}"
+            path = files[0] if files else None
+        if path is None:
+            name = ""
+        elif name not in images:
+            images[name] = path
+        member_names.append(name)
+
+    param_names = sorted({
+        name
+        for doc in docs
+        for name, p in (doc.get("parameters") or {}).items()
+        if isinstance(p, dict) and "value" in p
+    })
+    param_columns = {name: np.full(len(docs), np.nan) for name in param_names}
+    for i, doc in enumerate(docs):
+        for name, p in (doc.get("parameters") or {}).items():
+            value = p.get("value") if isinstance(p, dict) else None
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                param_columns[name][i] = value
+
+    columns = {
+        "id": np.array([doc.doc_id for doc in docs], dtype=np.int64),
+        "score": np.array(
+            [np.nan if doc.get("score") is None else doc.get("score") for doc in docs],
+            dtype=np.float64,
+        ),
+    }
+    columns.update({f"param.{name}": values for name, values in param_columns.items()})
+    strings = {
+        "timestamp": [str(doc.get("timestamp", "")) for doc in docs],
+        "image": member_names,
+        "parameters": [json.dumps(doc.get("parameters") or {}) for doc in docs],
+        "metadata": [json.dumps(doc.get("metadata") or {}) for doc in docs],
+    }
+    for name, values in strings.items():
+        columns[f"{name}.data"], columns[f"{name}.offsets"] = pack_strings(values)
+    return columns, list(images.items())
+
+
+def table_bytes(columns: Dict[str, np.ndarray]) -> bytes:
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **columns)
+    return buffer.getvalue()
+
+
+def table_rows(data: bytes) -> List[dict]:
+    # rows of a table.npz, with the document fields
+    try:
+        with np.load(io.BytesIO(data), allow_pickle=False) as table:
+            ids = table["id"]
+            scores = table["score"]
+            strings = {
+                name: unpack_strings(table[f"{name}.data"], table[f"{name}.offsets"])
+                for name in STRING_COLUMNS
+            }
+    except (KeyError, ValueError, OSError) as e:
+        raise ArchiveError(f"invalid {TABLE_NAME}: {e}")
+
+    rows = []
+    for i in range(len(ids)):
+        score = float(scores[i])
+        rows.append(
+            {
+                "id": int(ids[i]),
+                "score": None if np.isnan(score) else score,
+                "timestamp": strings["timestamp"][i],
+                "image": strings["image"][i],
+                "parameters": json.loads(strings["parameters"][i]),
+                "metadata": json.loads(strings["metadata"][i]),
+            }
+        )
+    return rows
+
+
+# ------------------------------------------------------------
+# Tar stream
+# ------------------------------------------------------------
+def tar_header(name: str, size: int, mtime: Optional[float] = None) -> bytes:
+    info = tarfile.TarInfo(name)
+    info.size = size
+    info.mode = 0o644
+    info.mtime = int(time.time() if mtime is None else mtime)
+    return info.tobuf(format=tarfile.USTAR_FORMAT)
+
+
+def tar_padding(size: int) -> bytes:
+    return b"\0" * (-size % BLOCK_SIZE)
+
+
+def tar_member(name: str, data: bytes) -> bytes:
+    return tar_header(name, len(data)) + data + tar_padding(len(data))
+
+
+async def iter_export(
+    session_id: str,
+    docs,
+    store,
+    file_io,
+    agents: Optional[dict] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> AsyncIterator[bytes]:
+    # the archive of a session, in chunks. docs: its DB documents, store: its
+    # BlobStore, agents: agent_name -> agent to include
+    columns, images = build_table(docs, store)
+    agents = agents or {}
+    manifest = {
+        "format": ARCHIVE_FORMAT,
+        "session_id": session_id,
+        "exported_at": datetime.now(timezone.utc).isoformat(),
+        "documents": len(docs),
+        "images": len(images),
+        "parameters": sorted(k[len("param."):] for k in columns if k.startswith("param.")),
+        "agents": sorted(agents),
+    }
+    yield tar_member(MANIFEST_NAME, json.dumps(manifest, indent=1).encode("utf-8"))
+    yield tar_member(TABLE_NAME, await file_io.run(table_bytes, columns))
+    for agent_name, agent in sorted(agents.items()):
+        yield tar_member(f"{AGENTS_DIR}{agent_name}.pkl", pickle.dumps(agent))
+
+    for name, path in images:
+        try:
+            f = await file_io.run(open, path, "rb")
+        except FileNotFoundError:
+            # deleted since the documents were read: the import skips the rows
+            logger.warning(f"export {session_id}: {path} not found, skipped")
+            continue
+        try:
+            stat = os.fstat(f.fileno())
+            yield tar_header(name, stat.st_size, stat.st_mtime)
+            remaining = stat.st_size
+            while remaining > 0:
+                chunk = await file_io.run(f.read, min(chunk_size, remaining))
+                if not chunk:
+                    raise ArchiveError(f"{path} truncated while exported")
+                remaining -= len(chunk)
+                yield chunk
+            yield tar_padding(stat.st_size)
+        finally:
+            await file_io.run(f.close)
+
+    # end of archive: two empty blocks
+    yield b"\0" * (2 * BLOCK_SIZE)
+
+
+async def iter_members(read_exactly: Callable[[int], Awaitable[bytes]]) -> AsyncIterator[Tuple[str, bytes]]:
+    # (name, content) of the regular files of a tar stream
+    while True:
+        block = await read_exactly(BLOCK_SIZE)
+        if block == b"\0" * BLOCK_SIZE:
+            return
+        try:
+            info = tarfile.TarInfo.frombuf(block, "utf-8", "surrogateescape")
+        except tarfile.TarError as e:
+            raise ArchiveError(f"invalid tar header: {e}")
+        if info.size > MAX_MEMBER_SIZE:
+            raise ArchiveError(f"{info.name}: {info.size} bytes, more than {MAX_MEMBER_SIZE}")
+
+        data = await read_exactly(info.size) if info.size else b""
+        if info.size % BLOCK_SIZE:
+            await read_exactly(-info.size % BLOCK_SIZE)
+        # directories and the extended headers of other tar writers are skipped
+        if info.isreg():
+            name = info.name[2:] if info.name.startswith("./") else info.name
+            yield name, data
+
+
+def stream_reader(stream) -> Callable[[int], Awaitable[bytes]]:
+    # read_exactly over an asyncio / aiohttp StreamReader
+    async def read_exactly(n: int) -> bytes:
+        try:
+            return await stream.readexactly(n)
+        except asyncio.IncompleteReadError:
+            raise ArchiveError("archive truncated")
+
+    return read_exactly
+
+
+def file_reader(f, file_io=None) -> Callable[[int], Awaitable[bytes]]:
+    # read_exactly over a binary file, read in the pool of file_io if given
+    async def read_exactly(n: int) -> bytes:
+        # decompressing readers may return less than n bytes
+        chunks = []
+        while n > 0:
+            data = f.read(n) if file_io is None else await file_io.run(f.read, n)
+            if not data:
+                raise ArchiveError("archive truncated")
+            chunks.append(data)
+            n -= len(data)
+        return b"".join(chunks)
+
+    return read_exactly
+
+
+async def check_archive(read_exactly: Callable[[int], Awaitable[bytes]]) -> dict:
+    # reads a whole archive: counts of its documents, of its images and of
+    # the documents whose image is not in it
+    rows = None
+    names = set()
+    async for name, data in iter_members(read_exactly):
+        if name == TABLE_NAME:
+            rows = table_rows(data)
+        elif name.startswith(IMAGES_DIR):
+            names.add(name)
+    if rows is None:
+        raise ArchiveError(f"{TABLE_NAME} missing")
+    return {
+        "documents": len(rows),
+        "images": len(names),
+        "missing_images": sum(1 for row in rows if row["image"] not in names),
+    }
+
+
+# ------------------------------------------------------------
+# Import
+# ------------------------------------------------------------
+async def read_archive(
+    read_exactly: Callable[[int], Awaitable[bytes]],
+    open_store: Callable[[dict], object],
+    file_io,
+    restore_agents: bool = False,
+) -> dict:
+    # open_store(manifest) returns the BlobStore of the target session (or
+    # raises to refuse the import); the images are stored in it as they
+    # arrive, with their renditions. Returns {"manifest", "docs": [(doc,
+    # archived id, ext)], "agents", "missing_images", "images", "bytes"}: the
+    # documents have no url yet, and are neither inserted nor counted as
+    # references of the store, which is left to the caller
+    manifest = None
+    store = None
+    rows = None
+    images: Dict[str, Tuple[str, str]] = {}
+    agents = {}
+    report = {"images": 0, "bytes": 0}
+    pending: List[asyncio.Task] = []
+
+    async def store_image(name, data):
+        ext = os.path.splitext(name)[1].lstrip(".") or "jpg"
+        digest, written = await file_io.run(store.put, data, ext, file_io.fsync)
+        renditions = store.rendition_paths(digest, ext)
+        if written or not await file_io.run(lambda: all(os.path.isfile(p) for p in renditions.values())):
+            await file_io.run(save_renditions, data, renditions, file_io.fsync)
+        images[name] = (digest, ext)
+
+    try:
+        async for name, data in iter_members(read_exactly):
+            if name == MANIFEST_NAME:
+                manifest = json.loads(data)
+                if manifest.get("format") != ARCHIVE_FORMAT:
+                    raise ArchiveError(f"unsupported archive format {manifest.get('format')}")
+                store = open_store(manifest)
+            elif manifest is None:
+                raise ArchiveError(f"{MANIFEST_NAME} must be the first member, not {name}")
+            elif name == TABLE_NAME:
+                rows = table_rows(data)
+            elif name.startswith(IMAGES_DIR):
+                # resized while the next images are read, a few at a time
+                pending.append(asyncio.create_task(store_image(name, data)))
+                report["images"] += 1
+                report["bytes"] += len(data)
+                if len(pending) >= file_io.max_workers:
+                    await pending.pop(0)
+            elif name.startswith(AGENTS_DIR) and restore_agents:
+                agent_name = os.path.splitext(name[len(AGENTS_DIR):])[0]
+                agents[agent_name] = pickle.loads(data)
+        await asyncio.gather(*pending)
+    finally:
+        for task in pending:
+            task.cancel()
+
+    if manifest is None or rows is None:
+        raise ArchiveError(f"{MANIFEST_NAME} or {TABLE_NAME} missing")
+
+    docs = []
+    missing = 0
+    for row in rows:
+        image = images.get(row["image"])
+        if image is None:
+            missing += 1
+            continue
+        digest, ext = image
+        doc = {
+            "parameters": row["parameters"],
+            "metadata": row["metadata"],
+            "blob": digest,
+            "score": row["score"],
+            "timestamp": row["timestamp"],
+        }
+        docs.append((doc, row["id"], ext))
+
+    return dict(report, manifest=manifest, docs=docs, agents=agents, missing_images=missing)
+
+
+# ------------------------------------------------------------
+# CLI (server stopped, from the root of the repository; live agents are
+# only in the archives of the /session/export endpoint)
+# ------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Export or import a session as one tar archive")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="write the archive of a session")
+    export_parser.add_argument("session_id")
+    export_parser.add_argument("-o", "--output", default=None, help="archive path (default: <session_id>.tar, -: stdout)")
+    import_parser = commands.add_parser("import", help="load an archive into a session")
+    import_parser.add_argument("archive", help="archive path (-: stdin)")
+    import_parser.add_argument("--session-id", default=None, help="target session (default: the archived one)")
+    import_parser.add_argument("--append", action="store_true", help="add to a session that has images")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    import server
+
+    async def run():
+        try:
+            if args.command == "export":
+                output = args.output or f"{args.session_id}.tar"
+                f = sys.stdout.buffer if output == "-" else open(output, "wb")
+                try:
+                    async for chunk in server.export_session(args.session_id):
+                        f.write(chunk)
+                finally:
+                    if f is not sys.stdout.buffer:
+                        f.close()
+                logger.info(f"session {args.session_id} exported to {output}")
+            else:
+                f = sys.stdin.buffer if args.archive == "-" else open(args.archive, "rb")
+                try:
+                    report = await server.import_session(file_reader(f), args.session_id, append=args.append)
+                finally:
+                    if f is not sys.stdin.buffer:
+                        f.close()
+                print(json.dumps({k: v for k, v in report.items() if k != "id_map"}, indent=1))
+        finally:
+            server.FILE_IO.shutdown()
+
+    try:
+        asyncio.run(run())
+    except (ArchiveError, FileExistsError, FileNotFoundError) as e:
+        sys.exit(f"error: {e}")
+
+
+if __name__ == "__main__":
+    main()
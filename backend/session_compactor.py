@@ -0,0 +1,352 @@
+import asyncio
+import gzip
+import logging
+import os
+import shutil
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+try:
+    import zstandard
+except ImportError:  # optional, gzip archives without it
+    zstandard = None
+
+from backend.async_io import remove_file
+from backend.metrics import COMPACTION_RECLAIMED_BYTES, SESSION_RESTORE_LATENCY, SESSIONS_COMPACTED
+from backend.orphan_gc import ARCHIVE_BASENAME, DB_FILENAME
+from backend.session_archive import ArchiveError, check_archive, file_reader
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------------------------------------
+# Compaction of the sessions nobody opened for a while, off unless `idle`
+# is set (it removes the files of the sessions it packs).
+#
+# A session idle for more than `idle` seconds (last write of its DB, or last
+# request in this process) is exported with backend/session_archive.py into
+# one compressed file of its folder, session.tar.zst (session.tar.gz without
+# the `zstandard` package): the documents become the columnar table, the
+# originals are kept once per content, the renditions are dropped (they are
+# regenerated). The archive is read back before the DB and the image files
+# are removed.
+#
+# The first request of a compacted session restores it before it is handled
+# (see session()): the archive is renamed *.restoring, imported with the
+# same document ids, then removed; an interrupted restore resumes from the
+# renamed archive. A session with requests in flight is never compacted.
+# ------------------------------------------------------------
+ARCHIVE_EXTENSIONS = (".zst", ".gz")
+RESTORING_SUFFIX = ".restoring"
+TMP_SUFFIX = ".tmp"
+ZSTD_LEVEL = 10
+GZIP_LEVEL = 6
+
+
+class SessionCompacted(RuntimeError):
+    # the DB of a compacted session was opened without restoring it first
+    def __init__(self, session_id: str):
+        super().__init__(f"session {session_id} is compacted")
+        self.session_id = session_id
+
+
+class CompactionAborted(Exception):
+    pass
+
+
+def open_compressed(path: str, mode: str):
+    # binary file object of a .zst or .gz archive, mode "rb" or "wb"
+    # (also the *.restoring and *.tmp names)
+    if ".zst" in os.path.basename(path):
+        if zstandard is None:
+            raise ArchiveError(f"{path}: the zstandard package is needed to read it")
+        if mode == "wb":
+            return zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(open(path, "wb"))
+        return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"))
+    if mode == "wb":
+        return gzip.open(path, "wb", compresslevel=GZIP_LEVEL)
+    return gzip.open(path, "rb")
+
+
+def tree_size(path: str) -> int:
+    size = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                size += os.path.getsize(os.path.join(dirpath, filename))
+            except FileNotFoundError:
+                pass
+    return size
+
+
+def remove_session_files(session_dir: str, keep: str) -> None:
+    # everything in the folder of a session but `keep`
+    for entry in os.scandir(session_dir):
+        if entry.path == keep:
+            continue
+        if entry.is_dir(follow_symlinks=False):
+            shutil.rmtree(entry.path, ignore_errors=True)
+        else:
+            remove_file(entry.path)
+
+
+def db_signature(path: str):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class SessionCompactor:
+    # export_session(session_id) -> async iterator of archive chunks,
+    # import_session(read_exactly, session_id) loads an archive into an empty
+    # session, release_session(session_id) drops what the server caches
+    # about a session; the file work runs in the `io` thread pool.
+
+    def __init__(
+        self,
+        path_images: str,
+        export_session: Callable[[str], AsyncIterator[bytes]],
+        import_session: Callable[..., Awaitable[dict]],
+        release_session: Callable[[str], None],
+        io,
+        idle: float = 0.0,
+        interval: float = 6 * 3600.0,
+    ):
+        self.path_images = path_images
+        self.export_session = export_session
+        self.import_session = import_session
+        self.release_session = release_session
+        self.io = io
+        self.idle = idle
+        self.interval = interval
+        self.last_access: Dict[str, float] = {}
+        self.active: Counter = Counter()  # session_id -> requests in flight
+        self.last_report: Optional[dict] = None
+        self.total_sessions = 0
+        self.total_bytes = 0
+        self.total_restored = 0
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    # --------------------------------------------------------
+    def session_dir(self, session_id: str) -> str:
+        return os.path.join(self.path_images, session_id)
+
+    def checked_session_dir(self, session_id: str) -> str:
+        # folder of a session before files are removed or written in it:
+        # must resolve to a folder directly below path_images
+        session_dir = self.session_dir(session_id)
+        if os.path.dirname(os.path.realpath(session_dir)) != os.path.realpath(self.path_images):
+            raise ValueError(f"session {session_id!r} is not a folder of {self.path_images}")
+        return session_dir
+
+    def archive_path(self, session_id: str, restoring: bool = True) -> Optional[str]:
+        # archive of a compacted session (or of an interrupted restore), None
+        # if the session is not compacted
+        base = os.path.join(self.session_dir(session_id), ARCHIVE_BASENAME)
+        for ext in ARCHIVE_EXTENSIONS:
+            if restoring and os.path.isfile(base + ext + RESTORING_SUFFIX):
+                return base + ext + RESTORING_SUFFIX
+            if os.path.isfile(base + ext):
+                return base + ext
+        return None
+
+    def is_compacted(self, session_id: str) -> bool:
+        return self.archive_path(session_id) is not None
+
+    def idle_seconds(self, session_id: str, now: Optional[float] = None) -> float:
+        now = time.time() if now is None else now
+        try:
+            last = os.stat(os.path.join(self.session_dir(session_id), DB_FILENAME)).st_mtime
+        except FileNotFoundError:
+            return 0.0
+        return now - max(last, self.last_access.get(session_id, 0.0))
+
+    def sessions(self) -> List[str]:
+        # folders of a session with a DB (compacted sessions have none)
+        try:
+            entries = list(os.scandir(self.path_images))
+        except FileNotFoundError:
+            return []
+        return sorted(
+            e.name for e in entries
+            if e.is_dir() and os.path.isfile(os.path.join(e.path, DB_FILENAME))
+        )
+
+    def candidates(self) -> List[str]:
+        # sessions idle for more than self.idle seconds, none if idle is 0
+        if self.idle <= 0:
+            return []
+        now = time.time()
+        return [
+            session_id for session_id in self.sessions()
+            if not self.active.get(session_id)
+            and not self.is_compacted(session_id)
+            and self.idle_seconds(session_id, now) >= self.idle
+        ]
+
+    def _lock(self, session_id: str) -> asyncio.Lock:
+        lock = self._locks.get(session_id)
+        if lock is None:
+            lock = self._locks[session_id] = asyncio.Lock()
+        return lock
+
+    # --------------------------------------------------------
+    @asynccontextmanager
+    async def session(self, session_id: str):
+        # around the handling of a request of the session: restored first if
+        # compacted, and not compacted while the request runs
+        self.active[session_id] += 1
+        try:
+            lock = self._locks.get(session_id)
+            if lock is not None and lock.locked():
+                # compaction or restore in progress: wait for its end
+                async with lock:
+                    pass
+            if self.is_compacted(session_id):
+                await self.restore(session_id)
+            yield
+        finally:
+            self.active[session_id] -= 1
+            if self.active[session_id] <= 0:
+                del self.active[session_id]
+            self.last_access[session_id] = time.time()
+
+    async def restore(self, session_id: str) -> Optional[dict]:
+        self.checked_session_dir(session_id)
+        async with self._lock(session_id):
+            path = self.archive_path(session_id)
+            if path is None:
+                return None
+            if not path.endswith(RESTORING_SUFFIX):
+                restoring = path + RESTORING_SUFFIX
+                await self.io.run(os.replace, path, restoring)
+                path = restoring
+
+            t0 = time.perf_counter()
+            f = await self.io.run(open_compressed, path, "rb")
+            try:
+                report = await self.import_session(file_reader(f, self.io), session_id)
+            except FileExistsError:
+                # restored, but the archive was not removed before a restart
+                report = None
+            finally:
+                await self.io.run(f.close)
+            await self.io.run(remove_file, path)
+
+            duration = time.perf_counter() - t0
+            SESSION_RESTORE_LATENCY.observe(duration)
+            self.total_restored += 1
+            logger.info(f"Session {session_id} restored from its archive in {duration:.2f} s")
+            return report
+
+    # --------------------------------------------------------
+    async def compact(self, session_id: str, dry_run: bool = False) -> Optional[dict]:
+        # packs a session into its archive; None if it is in use, already
+        # compacted or has no DB
+        session_dir = self.checked_session_dir(session_id)
+        db_path = os.path.join(session_dir, DB_FILENAME)
+        async with self._lock(session_id):
+            if self.active.get(session_id) or self.is_compacted(session_id) or not os.path.isfile(db_path):
+                return None
+            signature = await self.io.run(db_signature, db_path)
+            bytes_before = await self.io.run(tree_size, session_dir)
+            if dry_run:
+                return {"bytes_before": bytes_before}
+
+            ext = ".zst" if zstandard is not None else ".gz"
+            path = os.path.join(session_dir, ARCHIVE_BASENAME + ext)
+            tmp_path = path + TMP_SUFFIX
+            try:
+                f = await self.io.run(open_compressed, tmp_path, "wb")
+                try:
+                    async for chunk in self.export_session(session_id):
+                        if self.active.get(session_id):
+                            raise CompactionAborted("session opened")
+                        await self.io.run(f.write, chunk)
+                finally:
+                    await self.io.run(f.close)
+
+                # read back before anything is removed
+                f = await self.io.run(open_compressed, tmp_path, "rb")
+                try:
+                    check = await check_archive(file_reader(f, self.io))
+                finally:
+                    await self.io.run(f.close)
+                if check["missing_images"]:
+                    raise CompactionAborted(f"{check['missing_images']} images missing")
+                if self.active.get(session_id) or await self.io.run(db_signature, db_path) != signature:
+                    raise CompactionAborted("session modified")
+                await self.io.run(os.replace, tmp_path, path)
+            except CompactionAborted as e:
+                logger.info(f"Compaction of session {session_id} aborted: {e}")
+                await self.io.run(remove_file, tmp_path)
+                return None
+            except BaseException:
+                await self.io.run(remove_file, tmp_path)
+                raise
+
+            self.release_session(session_id)
+            await self.io.run(remove_session_files, session_dir, path)
+            bytes_after = await self.io.run(os.path.getsize, path)
+
+        SESSIONS_COMPACTED.inc()
+        COMPACTION_RECLAIMED_BYTES.inc(max(bytes_before - bytes_after, 0))
+        return dict(check, bytes_before=bytes_before, bytes_after=bytes_after)
+
+    async def run_once(self, session_ids: Optional[List[str]] = None, dry_run: bool = False) -> dict:
+        # compacts the idle sessions (or session_ids, idle or not);
+        # session_ids are restricted to the existing sessions
+        t0 = time.perf_counter()
+        if session_ids is None:
+            session_ids = await self.io.run(self.candidates)
+        else:
+            known = set(await self.io.run(self.sessions))
+            session_ids = [s for s in session_ids if isinstance(s, str) and s in known]
+        report = {"sessions": {}, "bytes_before": 0, "bytes_after": 0, "dry_run": dry_run}
+        for session_id in session_ids:
+            try:
+                result = await self.compact(session_id, dry_run)
+            except Exception as e:
+                logger.warning(f"Compaction of session {session_id} failed: {e}")
+                continue
+            if result is None:
+                continue
+            report["sessions"][session_id] = result
+            report["bytes_before"] += result["bytes_before"]
+            report["bytes_after"] += result.get("bytes_after", 0)
+
+        report["duration_s"] = time.perf_counter() - t0
+        report["time"] = time.time()
+        if not dry_run:
+            self.total_sessions += len(report["sessions"])
+            self.total_bytes += report["bytes_before"] - report["bytes_after"]
+            self.last_report = report
+        logger.info(
+            f"Compaction: {len(report['sessions'])} sessions "
+            f"{'compactable' if dry_run else 'compacted'}, "
+            f"{report['bytes_before'] / 1024**2:.1f} MB -> {report['bytes_after'] / 1024**2:.1f} MB "
+            f"({report['duration_s']:.2f} s)"
+        )
+        return report
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.warning(f"Compaction failed: {e}")
+
+    async def on_startup(self, app):
+        if self.interval > 0 and self.idle > 0:
+            self._task = asyncio.create_task(self._loop())
+
+    async def on_cleanup(self, app):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,315 @@
+import asyncio
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import pathlib
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from aiohttp import web
+
+try:
+    import brotli
+except ImportError:  # optional, gzip only without it
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------------------------------------
+# Static files of the client (frontend/, examples/) served from memory.
+#
+# Only the root index.html, the files of `folders` and the images of
+# `image_folders` (saved session images) are served; anything else under
+# the root (session DBs, sources...) is a 404.
+#
+# Text assets (js, css, html...) of `folders` are read once, precompressed
+# with gzip (and brotli when the `brotli` package is installed) and served
+# with a strong ETag, so a reload costs a 304 instead of the megabytes of p5
+# and d3. They are loaded at startup and later (new or edited files) on a
+# miss; the cache holds at most `max_bytes`, least recently used assets
+# first out. A cached file is stat'ed again at most every `check_interval`
+# seconds to pick up edits of the sketches.
+#
+# A request looks the cache up by its path first, so a hit does no file
+# system call. All file system work (resolving the path, checks, reads,
+# compression, stats) runs in the thread pool; the cache itself (dict,
+# `nbytes`, eviction) is only touched from the event loop. Concurrent
+# misses on a path share one load.
+# Other files (images...) are streamed from disk by aiohttp's FileResponse.
+# ------------------------------------------------------------
+TEXT_EXTENSIONS = {".js", ".mjs", ".css", ".html", ".htm", ".json", ".svg", ".txt", ".map", ".glsl"}
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".gif"}
+MAX_CACHED_SIZE = 16 * 1024**2
+MAX_CACHE_BYTES = 128 * 1024**2
+MIN_COMPRESSED_SIZE = 512  # below, compression is not worth a header
+
+# Minified vendored libraries do not change between releases of the app:
+# cached by the browser for a week. Everything else is revalidated.
+CACHE_CONTROL_IMMUTABLE = "public, max-age=604800"
+CACHE_CONTROL_REVALIDATE = "no-cache"
+
+
+class StaticAsset:
+    __slots__ = ("path", "body", "gzip", "br", "etag", "content_type", "cache_control", "mtime_ns", "size", "checked")
+
+    def __init__(self, path: pathlib.Path, check_time: float):
+        stat = path.stat()
+        self.path = path
+        self.body = path.read_bytes()
+        self.mtime_ns = stat.st_mtime_ns
+        self.size = stat.st_size
+        self.checked = check_time
+
+        content_type, _ = mimetypes.guess_type(path.name)
+        self.content_type = content_type or "application/octet-stream"
+        self.cache_control = (
+            CACHE_CONTROL_IMMUTABLE if ".min." in path.name else CACHE_CONTROL_REVALIDATE
+        )
+        self.etag = hashlib.sha1(self.body).hexdigest()[:20]
+
+        self.gzip = None
+        self.br = None
+        if len(self.body) >= MIN_COMPRESSED_SIZE:
+            compressed = gzip.compress(self.body, compresslevel=9, mtime=0)
+            if len(compressed) < len(self.body):
+                self.gzip = compressed
+            if brotli is not None:
+                compressed = brotli.compress(self.body, mode=brotli.MODE_TEXT, quality=11)
+                if len(compressed) < len(self.body):
+                    self.br = compressed
+
+    def is_stale(self) -> bool:
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return True
+        return stat.st_mtime_ns != self.mtime_ns or stat.st_size != self.size
+
+
+def asset_size(asset: StaticAsset) -> int:
+    return len(asset.body) + len(asset.gzip or b"") + len(asset.br or b"")
+
+
+class StaticAssetCache:
+    def __init__(
+        self,
+        root,
+        folders: Iterable[str] = ("frontend", "examples"),
+        image_folders: Iterable[str] = (),
+        io=None,
+        check_interval: float = 1.0,
+        max_bytes: int = MAX_CACHE_BYTES,
+    ):
+        # io: backend.async_io.AsyncFileIO running the file system calls
+        # (None: run in place, for tools and tests without a pool)
+        self.root = pathlib.Path(root).resolve()
+        self.folders = [self.root / f for f in folders]
+        self.image_folders = [(self.root / f).resolve() for f in image_folders]
+        self.io = io
+        self.check_interval = check_interval
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        # keyed by the path relative to the root, as requested ("frontend/d3.js")
+        self._assets: "OrderedDict[str, StaticAsset]" = OrderedDict()
+        # request path -> load in flight, shared by concurrent requests
+        self._loading: Dict[str, asyncio.Future] = {}
+
+    def __len__(self):
+        return len(self._assets)
+
+    async def _run(self, fn, *args):
+        if self.io is None:
+            return fn(*args)
+        return await self.io.run(fn, *args)
+
+    async def preload(self) -> None:
+        # reads and compresses the text assets of the folders ahead of the
+        # first request (until the cache is full)
+        t0 = time.perf_counter()
+        for path in await self._run(self._cacheable_files):
+            asset = await self._run(self._read, path)
+            if asset is not None:
+                self._insert(asset)
+        logger.info(
+            f"Static assets: {len(self)} files precompressed in {time.perf_counter() - t0:.2f} s "
+            f"({self.nbytes / 1024**2:.1f} MB in memory, brotli {'on' if brotli else 'off'})"
+        )
+
+    # --------------------------------------------------------
+    # File system side: runs in the thread pool, does not touch the cache
+    # --------------------------------------------------------
+    def _cacheable_files(self) -> List[pathlib.Path]:
+        paths = []
+        for folder in self.folders:
+            for dirpath, _, filenames in os.walk(folder):
+                for filename in filenames:
+                    path = pathlib.Path(dirpath, filename)
+                    if self._cacheable(path):
+                        paths.append(path)
+        return paths
+
+    def _in_folders(self, path: pathlib.Path, folders) -> bool:
+        return any(folder in path.parents for folder in folders)
+
+    def is_served(self, path: pathlib.Path) -> bool:
+        if path == self.root / "index.html" or self._in_folders(path, self.folders):
+            return True
+        return path.suffix.lower() in IMAGE_EXTENSIONS and self._in_folders(path, self.image_folders)
+
+    def _cacheable(self, path: pathlib.Path) -> bool:
+        if path.suffix.lower() not in TEXT_EXTENSIONS:
+            return False
+        if path != self.root / "index.html" and not self._in_folders(path, self.folders):
+            return False
+        try:
+            return path.stat().st_size <= MAX_CACHED_SIZE
+        except OSError:
+            return False
+
+    def _read(self, path: pathlib.Path) -> Optional[StaticAsset]:
+        if not self._cacheable(path):
+            return None
+        try:
+            return StaticAsset(path, time.monotonic())
+        except OSError:
+            return None
+
+    def resolve(self, rel_path: str) -> pathlib.Path:
+        requested = (self.root / rel_path).resolve()
+
+        # Security: do not leave the root folder
+        if self.root not in requested.parents and requested != self.root:
+            raise web.HTTPForbidden()
+
+        # If it's a folder → serve index.html inside
+        if requested.is_dir():
+            requested = requested / "index.html"
+        if not self.is_served(requested):
+            raise web.HTTPNotFound()
+        return requested
+
+    def _open(self, rel_path: str) -> Tuple[int, Optional[pathlib.Path], Optional[StaticAsset]]:
+        # (status, file, asset or None to stream the file) of a request path;
+        # a status rather than an HTTPException, the result being shared by
+        # the concurrent requests of the path
+        try:
+            path = self.resolve(rel_path)
+        except web.HTTPException as e:
+            return e.status, None, None
+        asset = self._read(path)
+        if asset is None and not path.is_file():
+            return 404, None, None
+        return 200, path, asset
+
+    # --------------------------------------------------------
+    # Cache side: on the event loop only
+    # --------------------------------------------------------
+    def _key(self, path: pathlib.Path) -> str:
+        return path.relative_to(self.root).as_posix()
+
+    def _insert(self, asset: StaticAsset) -> None:
+        key = self._key(asset.path)
+        self._discard(key)
+        self._assets[key] = asset
+        self.nbytes += asset_size(asset)
+        while self.nbytes > self.max_bytes and self._assets:
+            _, evicted = self._assets.popitem(last=False)
+            self.nbytes -= asset_size(evicted)
+        # served even if larger than the whole cache
+
+    def _discard(self, key: str, asset: Optional[StaticAsset] = None) -> None:
+        # asset: only if it is still the cached one
+        if asset is not None and self._assets.get(key) is not asset:
+            return
+        asset = self._assets.pop(key, None)
+        if asset is not None:
+            self.nbytes -= asset_size(asset)
+
+    async def _get_cached(self, rel_path: str) -> Optional[StaticAsset]:
+        # a hit is a file checked when it was loaded: only the request path
+        # of a cached file (or of its folder, for index.html) hits, anything
+        # else (../, symlinks, // ...) goes through resolve()
+        key = rel_path + "index.html" if rel_path == "" or rel_path.endswith("/") else rel_path
+        asset = self._assets.get(key)
+        if asset is None:
+            return None
+
+        now = time.monotonic()
+        if now - asset.checked >= self.check_interval:
+            asset.checked = now  # one stat at a time
+            if await self._run(asset.is_stale):
+                self._discard(key, asset)
+                return None
+        if key in self._assets:
+            self._assets.move_to_end(key)
+        return asset
+
+    async def _load(self, rel_path: str) -> Tuple[int, Optional[pathlib.Path], Optional[StaticAsset]]:
+        status, path, asset = await self._run(self._open, rel_path)
+        if asset is not None:
+            self._insert(asset)
+        return status, path, asset
+
+    async def _get_loaded(self, rel_path: str) -> Tuple[int, Optional[pathlib.Path], Optional[StaticAsset]]:
+        future = self._loading.get(rel_path)
+        if future is None:
+            future = self._loading[rel_path] = asyncio.ensure_future(self._load(rel_path))
+            future.add_done_callback(lambda _: self._loading.pop(rel_path, None))
+        # a request going away does not cancel the load of the others
+        return await asyncio.shield(future)
+
+    def response(self, request: web.Request, asset: StaticAsset) -> web.StreamResponse:
+        accepted = request.headers.get("Accept-Encoding", "")
+        if asset.br is not None and "br" in accepted:
+            body, encoding = asset.br, "br"
+        elif asset.gzip is not None and "gzip" in accepted:
+            body, encoding = asset.gzip, "gzip"
+        else:
+            body, encoding = asset.body, None
+
+        # one strong ETag per representation
+        etag = asset.etag if encoding is None else f"{asset.etag}-{encoding}"
+        headers = {
+            "ETag": f'"{etag}"',
+            "Cache-Control": asset.cache_control,
+            "Vary": "Accept-Encoding",
+        }
+        if etag_matches(request.headers.get("If-None-Match"), etag):
+            return web.Response(status=304, headers=headers)
+
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        headers["Content-Type"] = asset.content_type
+        return web.Response(body=body, headers=headers)
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        rel_path = request.match_info["path"]
+        asset = await self._get_cached(rel_path)
+        if asset is not None:
+            return self.response(request, asset)
+
+        status, path, asset = await self._get_loaded(rel_path)
+        if status == 403:
+            raise web.HTTPForbidden()
+        if status != 200:
+            raise web.HTTPNotFound()
+        if asset is not None:
+            return self.response(request, asset)
+        return web.FileResponse(path)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate.strip('"') == etag:
+            return True
+    return False
@@ -2,6 +2,8 @@ import os
 from PIL import Image
 from io import BytesIO
 
+from backend.async_io import write_atomic
+
 # ------------------------------------------------------------
 IMAGE_RESIZE_TARGET_WIDTHS = [256, 512, 1024]
 
@@ -25,12 +27,25 @@ def get_image_filename(pe_id,timestamp_str,ext,width=None):
 
 # ------------------------------------------------------------
 def save_resized_images(image_bytes, pe_id, timestamp_str, ext, path_images):
+    return save_renditions(
+        image_bytes,
+        {
+            width: os.path.join(path_images, get_image_filename(pe_id, timestamp_str, ext, width))
+            for width in IMAGE_RESIZE_TARGET_WIDTHS
+        },
+    )
+
+# ------------------------------------------------------------
+def save_renditions(image_bytes, paths_by_width, fsync="never"):
+    # Each rendition is encoded in memory then written with write_atomic: a
+    # crash never leaves a truncated file that would pass for a rendition
     # Decode the image
     original_img = Image.open(BytesIO(image_bytes))
+    extensions = Image.registered_extensions()
 
     saved_files = []
 
-    for width in IMAGE_RESIZE_TARGET_WIDTHS:
+    for width, filepath in paths_by_width.items():
         # Calculate ratio to preserve proportions
         ratio = width / original_img.width
         height = int(original_img.height * ratio)
@@ -38,12 +53,10 @@ def save_resized_images(image_bytes, pe_id, timestamp_str, ext, path_images):
         # Resize
         resized_img = original_img.resize((width, height), Image.LANCZOS)
 
-        # New filename
-        filepath = os.path.join(path_images, get_image_filename(pe_id,timestamp_str,ext,width))
-
         # Save
-        resized_img.save(filepath)
+        encoded = BytesIO()
+        resized_img.save(encoded, format=extensions[os.path.splitext(filepath)[1].lower()])
+        write_atomic(filepath, encoded.getvalue(), fsync)
         saved_files.append(filepath)
 
     return saved_files
-
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Agents on synthetic objectives: speed and search quality.
+
+Each agent of the server registry is driven through play()/update() against
+synthetic objectives defined over mixed float / integer / choice parameters.
+Scores are in [0, 100], like the ratings given in the browser. Per agent and
+objective, the median over seeds is reported for:
+  - play / update : mean wall time per call
+  - evals@thr     : evaluations until a score >= threshold (">N": never)
+  - best          : best score found
+  - diversity     : mean pairwise distance of the last played points, in
+                    normalized space, divided by sqrt(d)
+
+Seeds run in parallel worker processes.
+
+Usage:
+    python -m benchmarks.bench_agents --dim 12 --evals 300 --seeds 8
+    python -m benchmarks.bench_agents --agents cma-es gaussian --objectives rastrigin
+"""
+
+import argparse
+import json
+import logging
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+from backend.agents.utils.codec import ParamCodec
+
+from .bench_codec import make_parameters_def
+
+# ---------------------------------------------------------------------------
+# Objectives over normalized space, optimum x* (on the grid of the discrete
+# parameters) scoring 100
+# ---------------------------------------------------------------------------
+
+
+def sphere(X: np.ndarray, x_star: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """Gaussian bump around x*: 100 * exp(-||x - x*||^2 / (0.1 d))."""
+    d = X.shape[1]
+    return 100.0 * np.exp(-np.sum((X - x_star) ** 2, axis=1) / (0.1 * d))
+
+
+def rastrigin(X: np.ndarray, x_star: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """
+    Rastrigin function on z = 5.12 (x - x*) (many regular local optima),
+    mapped linearly from [0, 20 d] to [100, 0].
+    """
+    d = X.shape[1]
+    z = 5.12 * (X - x_star)
+    value = 10.0 * d + np.sum(z**2 - 10.0 * np.cos(2.0 * np.pi * z), axis=1)
+    return np.clip(100.0 * (1.0 - value / (20.0 * d)), 0.0, 100.0)
+
+
+def mixture(X: np.ndarray, x_star: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """
+    Max of 8 Gaussian bumps: the global one at x* (height 100) and 7
+    decoys of height 55-80 at random places.
+    """
+    d = X.shape[1]
+    local_rng = np.random.default_rng(int(1e6 * x_star[0]) if d else 0)
+    centers = np.vstack([x_star, local_rng.random((7, d))])
+    heights = np.concatenate([[100.0], local_rng.uniform(55.0, 80.0, 7)])
+    d2 = np.sum((X[:, None, :] - centers[None, :, :]) ** 2, axis=2)
+    return np.max(heights * np.exp(-d2 / (0.1 * d)), axis=1)
+
+
+OBJECTIVES: Dict[str, Callable[..., np.ndarray]] = {
+    "sphere": sphere,
+    "rastrigin": rastrigin,
+    "mixture": mixture,
+}
+
+
+# ---------------------------------------------------------------------------
+# One run
+# ---------------------------------------------------------------------------
+
+
+def diversity(X: np.ndarray) -> float:
+    """Mean pairwise distance of the rows of X, divided by sqrt(d)."""
+    n, d = X.shape
+    if n < 2 or d == 0:
+        return 0.0
+    sq = np.einsum("ij,ij->i", X, X)
+    d2 = np.maximum(sq[:, None] + sq[None, :] - 2.0 * X @ X.T, 0.0)
+    return float(np.sqrt(d2).sum() / (n * (n - 1)) / np.sqrt(d))
+
+
+def run_one(task: Tuple[str, str, int, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Drive one agent for `evals` evaluations; runs in a worker process.
+    """
+    agent_name, objective_name, seed, cfg = task
+    logging.disable(logging.INFO)
+    from server import mapping_agent_name_to_class
+
+    parameters_def = make_parameters_def(cfg["dim"], seed=cfg["def_seed"])
+    codec = ParamCodec(parameters_def)
+    rng = np.random.default_rng(seed)
+    x_star = codec.snap(rng.random(codec.dim))
+    objective = OBJECTIVES[objective_name]
+
+    np.random.seed(seed)
+    random.seed(seed)
+    agent = mapping_agent_name_to_class[agent_name](parameters_def)
+
+    t_play = 0.0
+    t_update = 0.0
+    played = np.empty((cfg["evals"], codec.dim))
+    scores = np.empty(cfg["evals"])
+    for i in range(cfg["evals"]):
+        t0 = time.perf_counter()
+        params, metadata = agent.play()
+        t_play += time.perf_counter() - t0
+
+        x = codec.encode_one(params)
+        score = float(objective(x[None, :], x_star, rng)[0])
+        if cfg["noise"] > 0:
+            score = float(np.clip(score + rng.normal(0.0, cfg["noise"]), 0.0, 100.0))
+        played[i] = x
+        scores[i] = score
+
+        t0 = time.perf_counter()
+        agent.update(params, score, metadata)
+        t_update += time.perf_counter() - t0
+
+    hits = np.flatnonzero(scores >= cfg["threshold"])
+    return {
+        "agent": agent_name,
+        "objective": objective_name,
+        "seed": seed,
+        "play_ms": 1e3 * t_play / cfg["evals"],
+        "update_ms": 1e3 * t_update / cfg["evals"],
+        "evals_to_threshold": int(hits[0]) + 1 if hits.size else None,
+        "best": float(scores.max()),
+        "diversity": diversity(played[-cfg["window"] :]),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Report
+# ---------------------------------------------------------------------------
+
+
+def summarize(results: List[Dict[str, Any]], evals: int) -> List[Dict[str, Any]]:
+    """Median over seeds per (agent, objective); missed thresholds count as inf."""
+    groups: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+    for r in results:
+        groups.setdefault((r["agent"], r["objective"]), []).append(r)
+
+    rows = []
+    for (agent, objective), runs in groups.items():
+        hits = [r["evals_to_threshold"] for r in runs]
+        median_hit = np.median([np.inf if h is None else h for h in hits])
+        rows.append(
+            {
+                "agent": agent,
+                "objective": objective,
+                "seeds": len(runs),
+                "play_ms": float(np.median([r["play_ms"] for r in runs])),
+                "update_ms": float(np.median([r["update_ms"] for r in runs])),
+                "evals_to_threshold": None if np.isinf(median_hit) else float(median_hit),
+                "hit_rate": sum(h is not None for h in hits) / len(runs),
+                "best": float(np.median([r["best"] for r in runs])),
+                "diversity": float(np.median([r["diversity"] for r in runs])),
+            }
+        )
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--agents", nargs="+", default=None, help="default: all registered")
+    parser.add_argument("--objectives", nargs="+", default=list(OBJECTIVES), choices=list(OBJECTIVES))
+    parser.add_argument("--dim", type=int, default=12)
+    parser.add_argument("--evals", type=int, default=300)
+    parser.add_argument("--seeds", type=int, default=8)
+    parser.add_argument("--threshold", type=float, default=90.0)
+    parser.add_argument("--noise", type=float, default=0.0, help="std of the score noise")
+    parser.add_argument("--window", type=int, default=50, help="last points used for diversity")
+    parser.add_argument("--def-seed", type=int, default=0, help="seed of the parameters_def")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes (default: CPUs)")
+    parser.add_argument("--json", default=None, help="also write per-run results to this file")
+    args = parser.parse_args()
+
+    if args.agents is None:
+        logging.disable(logging.INFO)
+        from server import mapping_agent_name_to_class
+
+        args.agents = list(mapping_agent_name_to_class)
+
+    cfg = {
+        "dim": args.dim,
+        "evals": args.evals,
+        "threshold": args.threshold,
+        "noise": args.noise,
+        "window": args.window,
+        "def_seed": args.def_seed,
+    }
+    tasks = [
+        (agent, objective, seed, cfg)
+        for agent in args.agents
+        for objective in args.objectives
+        for seed in range(args.seeds)
+    ]
+
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        results = list(pool.map(run_one, tasks))
+    elapsed = time.perf_counter() - t0
+
+    print(
+        f"Agents d={args.dim} evals={args.evals} seeds={args.seeds} "
+        f"threshold={args.threshold} noise={args.noise} ({elapsed:.1f} s)"
+    )
+    print(
+        f"  {'agent':<12s} {'objective':<10s} {'play ms':>8s} {'update ms':>9s} "
+        f"{'evals@thr':>9s} {'hit':>5s} {'best':>6s} {'diversity':>9s}"
+    )
+    for row in summarize(results, args.evals):
+        hit = row["evals_to_threshold"]
+        hit_str = f">{args.evals}" if hit is None else f"{hit:.0f}"
+        print(
+            f"  {row['agent']:<12s} {row['objective']:<10s} {row['play_ms']:8.3f} "
+            f"{row['update_ms']:9.3f} {hit_str:>9s} {row['hit_rate']:5.2f} "
+            f"{row['best']:6.1f} {row['diversity']:9.3f}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": vars(args), "runs": results}, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Throughput of ParamCodec batch encode/decode.
+
+Usage:
+    python -m benchmarks.bench_codec --dim 100 --n 10000
+"""
+
+import argparse
+import time
+from typing import Any, Callable, Dict
+
+import numpy as np
+
+from backend.agents.utils.codec import ParamCodec
+
+
+def make_parameters_def(dim: int, seed: int = 0) -> Dict[str, Dict[str, Any]]:
+    """
+    Mixed float / integer / choice definitions (roughly 2:1:1).
+    """
+    rng = np.random.default_rng(seed)
+    parameters_def = {}
+    for i in range(dim):
+        kind = i % 4
+        if kind == 2:
+            lo = int(rng.integers(-10, 10))
+            parameters_def[f"p{i}"] = {"type": "integer", "range": [lo, lo + int(rng.integers(1, 50))]}
+        elif kind == 3:
+            parameters_def[f"p{i}"] = {"type": "choice", "choices": list(range(int(rng.integers(2, 8))))}
+        else:
+            lo = float(rng.uniform(-5, 5))
+            parameters_def[f"p{i}"] = {"type": "float", "range": [lo, lo + float(rng.uniform(0.1, 10))]}
+    return parameters_def
+
+
+def best_of(fn: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dim", type=int, default=100)
+    parser.add_argument("--n", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    codec = ParamCodec(make_parameters_def(args.dim))
+    X = np.random.default_rng(1).random((args.n, codec.dim))
+    params_list = codec.decode(X)
+
+    rows = [
+        ("encode (batch)", lambda: codec.encode(params_list)),
+        ("decode (batch)", lambda: codec.decode(X)),
+        ("encode (per dict)", lambda: [codec.encode_one(p) for p in params_list]),
+        ("decode (per dict)", lambda: [codec.decode_one(x) for x in X]),
+    ]
+
+    print(f"ParamCodec d={codec.dim} n={args.n} (best of {args.repeat})")
+    for label, fn in rows:
+        t = best_of(fn, args.repeat)
+        print(f"  {label:<20s} {t * 1e3:9.1f} ms  {args.n / t:12,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
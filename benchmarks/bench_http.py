@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+HTTP endpoint latency as a session grows.
+
+The real application (server.make_app) is served by aiohttp's test server
+in a temporary working directory. A session is grown to each size in turn by
+inserting generated image documents (and, with --with-files, their image
+files); at each size every endpoint is called --requests times in a row:
+
+  /save (one image)           /load_gallery filter_id 0, 1, 2, 3
+  /load_data                  /update_score (random image)
+  /agent/play (cma-es)
+
+and p50 / p95 / p99 latency (ms) and throughput (requests/s) are reported.
+Rows are printed in a fixed order with fixed precision, and --json writes
+the same numbers with sorted keys, so runs can be diffed between commits.
+
+Usage:
+    python -m benchmarks.bench_http --sizes 100 1000 10000 --requests 20
+    python -m benchmarks.bench_http --sizes 100 1000 10000 100000 --json http.json
+"""
+
+import argparse
+import asyncio
+import base64
+import io
+import json
+import logging
+import os
+import subprocess
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+from .bench_codec import make_parameters_def
+
+SESSION_ID = "bench-session"
+PE_ID = "bench"
+AGENT_NAME = "cma-es"
+
+
+def make_jpeg(width: int, height: int, seed: int) -> bytes:
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    pixels = (rng.random((height, width, 3)) * 255).astype(np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(pixels).save(buf, "JPEG")
+    return buf.getvalue()
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            stderr=subprocess.DEVNULL,
+            text=True,
+        ).strip()
+    except Exception:
+        return "unknown"
+
+
+# ---------------------------------------------------------------------------
+# Session population
+# ---------------------------------------------------------------------------
+
+
+def make_docs(
+    start: int,
+    n: int,
+    parameters_def: Dict[str, Dict[str, Any]],
+    rng: np.random.Generator,
+) -> List[Dict[str, Any]]:
+    """Image documents as /save stores them (params with their definition)."""
+    from backend.agents.utils.codec import ParamCodec
+    from server import PATH_IMAGES, URL_SERVER
+    from backend.utils_image import get_image_filename
+
+    codec = ParamCodec(parameters_def)
+    params_list = codec.decode(rng.random((n, codec.dim)))
+    scores = rng.choice([-1, 0, 25, 50, 75, 90, 100], size=n)
+    docs = []
+    for i, params in enumerate(params_list):
+        timestamp = str(1_000_000 + start + i)
+        filename = get_image_filename(PE_ID, timestamp, "jpg")
+        docs.append(
+            {
+                "parameters": {
+                    name: dict(parameters_def[name], value=value, freeze=False)
+                    for name, value in params.items()
+                },
+                "metadata": {"agent_name": AGENT_NAME, "pop_idx": int(rng.integers(2))},
+                "url": f"{URL_SERVER}/{PATH_IMAGES}/{SESSION_ID}/{filename}",
+                "score": int(scores[i]),
+                "timestamp": timestamp,
+            }
+        )
+    return docs
+
+
+def write_files(docs: List[Dict[str, Any]], image: bytes) -> None:
+    """Original and resized renditions of each document, on disk."""
+    from server import PATH_IMAGES
+    from backend.utils_image import IMAGE_RESIZE_TARGET_WIDTHS, get_image_filename
+
+    path_images = os.path.join(PATH_IMAGES, SESSION_ID)
+    for doc in docs:
+        for width in [None] + IMAGE_RESIZE_TARGET_WIDTHS:
+            filename = get_image_filename(PE_ID, doc["timestamp"], "jpg", width)
+            with open(os.path.join(path_images, filename), "wb") as f:
+                f.write(image)
+
+
+# ---------------------------------------------------------------------------
+# Measurements
+# ---------------------------------------------------------------------------
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    ms = 1e3 * np.asarray(samples)
+    return {
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "rps": float(len(ms) / (ms.sum() / 1e3)) if ms.sum() > 0 else float("inf"),
+    }
+
+
+def endpoints(
+    parameters_def: Dict[str, Dict[str, Any]],
+    image_b64: str,
+    rng: np.random.Generator,
+    counter: List[int],
+) -> List[Tuple[str, str, Callable[[], Dict[str, Any]]]]:
+    """(label, route, payload factory) of every measured call."""
+
+    def save():
+        counter[0] += 1
+        return {
+            "id": PE_ID,
+            "session_id": SESSION_ID,
+            "batch_parameters": [
+                {
+                    "image_data": image_b64,
+                    "image_timestamp": 9_000_000_000 + counter[0],
+                    "score": -1,
+                }
+            ],
+            "batch_metadata": [{"agent_name": AGENT_NAME, "pop_idx": 0}],
+        }
+
+    def gallery(filter_id):
+        return lambda: {
+            "session_id": SESSION_ID,
+            "filter_id": filter_id,
+            "score_min": 50,
+            "agent_name": AGENT_NAME,
+            "agent_max_pop_idx": 10,
+        }
+
+    def update_score():
+        return {
+            "session_id": SESSION_ID,
+            "image_id": int(rng.integers(1, counter[1] + 1)),
+            "score": int(rng.integers(0, 101)),
+        }
+
+    def play():
+        return {
+            "session_id": SESSION_ID,
+            "agent_name": AGENT_NAME,
+            "parameters_def": parameters_def,
+        }
+
+    return [
+        ("/save", "/save", save),
+        ("/load_gallery f0", "/load_gallery", gallery(0)),
+        ("/load_gallery f1", "/load_gallery", gallery(1)),
+        ("/load_gallery f2", "/load_gallery", gallery(2)),
+        ("/load_gallery f3", "/load_gallery", gallery(3)),
+        ("/load_data", "/load_data", lambda: {"session_id": SESSION_ID}),
+        ("/update_score", "/update_score", update_score),
+        ("/agent/play", "/agent/play", play),
+    ]
+
+
+async def run(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    from aiohttp.test_utils import TestClient, TestServer
+
+    import server
+
+    parameters_def = make_parameters_def(args.dim)
+    rng = np.random.default_rng(args.seed)
+    image = make_jpeg(args.image_width, args.image_width, args.seed)
+    image_b64 = base64.b64encode(image).decode()
+
+    db = server.open_db(SESSION_ID)
+    os.makedirs(os.path.join(server.PATH_IMAGES, SESSION_ID), exist_ok=True)
+    counter = [0, 0]  # saved through /save, documents in the session
+
+    rows = []
+    async with TestClient(TestServer(server.make_app())) as client:
+        for size in sorted(args.sizes):
+            missing = size - len(db)
+            if missing > 0:
+                docs = make_docs(len(db), missing, parameters_def, rng)
+                db.insert_multiple(docs)
+                if args.with_files:
+                    write_files(docs, image)
+            counter[1] = len(db)
+
+            for label, route, payload in endpoints(parameters_def, image_b64, rng, counter):
+                samples = []
+                for _ in range(args.requests):
+                    body = payload()
+                    t0 = time.perf_counter()
+                    resp = await client.post(route, json=body)
+                    await resp.read()
+                    samples.append(time.perf_counter() - t0)
+                    if resp.status != 200:
+                        raise RuntimeError(f"{route} returned {resp.status}: {await resp.text()}")
+                row = {"endpoint": label, "size": size}
+                row.update(percentiles(samples))
+                rows.append(row)
+                print(
+                    f"  {label:<18s} {size:>7d} {row['p50_ms']:9.2f} {row['p95_ms']:9.2f} "
+                    f"{row['p99_ms']:9.2f} {row['rps']:9.1f}",
+                    flush=True,
+                )
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--requests", type=int, default=20, help="calls per endpoint and size")
+    parser.add_argument("--dim", type=int, default=12, help="parameters per image")
+    parser.add_argument("--image-width", type=int, default=512, help="side of the saved images")
+    parser.add_argument("--with-files", action="store_true", help="also write the image files of the generated documents")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default=None, help="also write the results to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.disable(logging.INFO)
+
+    revision = git_revision()
+    print(
+        f"HTTP endpoints rev={revision} requests={args.requests} dim={args.dim} "
+        f"image={args.image_width}px files={'yes' if args.with_files else 'no'}"
+    )
+    print(f"  {'endpoint':<18s} {'size':>7s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'req/s':>9s}")
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="bench_http_") as workdir:
+        # The server stores sessions relative to its working directory
+        os.chdir(workdir)
+        try:
+            rows = asyncio.run(run(args))
+        finally:
+            os.chdir(cwd)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {"revision": revision, "config": vars(args), "results": rows},
+                f,
+                indent=1,
+                sort_keys=True,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Cold start of the server: time to `import server`, with a budget.
+
+`import server` is timed in fresh interpreters (best of --runs, so the
+numbers are those of a warm file cache), the slowest modules reported by
+`python -X importtime` are listed, and the run fails (exit code 1) if:
+  - the import takes longer than --budget-ms, or
+  - a heavy dependency that must only be imported on first use (clustering,
+    quasi-random sequences, k-d trees) is loaded by the import.
+
+Usage:
+    python -m benchmarks.bench_import
+    python -m benchmarks.bench_import --budget-ms 800 --runs 10 --top 20
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded by the clustering endpoints and by the agents, never at startup
+LAZY_MODULES = (
+    "pandas",
+    "sklearn",
+    "scipy.cluster",
+    "scipy.spatial",
+    "scipy.stats",
+    "backend.clustering.clustering",
+    "backend.agents.cmaes.agent_cmaes",
+    "backend.agents.gaussian.agent_gaussian",
+    "backend.agents.open_ended.agent_open_ended",
+    "backend.agents.surrogate.agent_surrogate",
+)
+
+PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import server
+elapsed = time.perf_counter() - t0
+print(json.dumps({"seconds": elapsed, "modules": sorted(sys.modules)}))
+"""
+
+
+# ---------------------------------------------------------------------------
+def run_probe() -> Tuple[float, List[str]]:
+    out = subprocess.check_output([sys.executable, "-c", PROBE], cwd=ROOT, text=True)
+    result = json.loads(out.strip().splitlines()[-1])
+    return result["seconds"], result["modules"]
+
+
+def import_times(top: int) -> List[Tuple[int, str]]:
+    # (cumulative us, module) of the slowest imports, from -X importtime
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.rstrip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def loaded_lazy_modules(modules: List[str]) -> List[str]:
+    loaded = set(modules)
+    return [name for name in LAZY_MODULES if name in loaded]
+
+
+# ---------------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=1000.0, help="maximum time of `import server`")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters, best time is kept")
+    parser.add_argument("--top", type=int, default=15, help="slowest imports listed")
+    parser.add_argument("--json", default=None, help="also write the results to this file")
+    args = parser.parse_args()
+
+    times = []
+    modules: List[str] = []
+    for _ in range(args.runs):
+        seconds, modules = run_probe()
+        times.append(seconds)
+    best_ms = 1000.0 * min(times)
+    lazy_loaded = loaded_lazy_modules(modules)
+
+    print(f"import server: best {best_ms:.0f} ms of {args.runs} runs (budget {args.budget_ms:.0f} ms), {len(modules)} modules")
+    slowest = import_times(args.top)
+    print(f"  {'cumulative ms':>13s}  module")
+    for cumulative, name in slowest:
+        print(f"  {cumulative / 1000.0:13.1f}  {name}")
+
+    failures: Dict[str, object] = {}
+    if best_ms > args.budget_ms:
+        failures["budget"] = f"{best_ms:.0f} ms > {args.budget_ms:.0f} ms"
+    if lazy_loaded:
+        failures["lazy_modules_loaded"] = lazy_loaded
+    for key, value in failures.items():
+        print(f"FAIL {key}: {value}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {
+                    "config": vars(args),
+                    "best_ms": best_ms,
+                    "times_ms": [1000.0 * t for t in times],
+                    "slowest": [{"module": n, "cumulative_ms": c / 1000.0} for c, n in slowest],
+                    "failures": failures,
+                },
+                f,
+                indent=1,
+                sort_keys=True,
+            )
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Repulsive sampling: bounded RepulsiveArchive vs. the full list of points.
+
+For each session size R, the same candidate batch is scored against the
+full set of repulsive points (reference) and against the archive. Quality
+is the reference min-distance of the archive's pick divided by that of the
+reference pick (1.0 = identical choice, lower = worse exploration).
+
+Usage:
+    python -m benchmarks.bench_repulsive --dim 12 --sizes 100 1000 10000
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from backend.agents.utils.archive import RepulsiveArchive
+from backend.agents.utils.codec import ParamCodec
+from backend.agents.utils.sampler import min_squared_distances, sample_uniform_normalized
+
+from .bench_codec import make_parameters_def
+
+
+def clustered_points(codec: ParamCodec, n: int, n_clusters: int = 20) -> np.ndarray:
+    """
+    Rated points concentrate around a few regions (agents exploit them).
+    """
+    centers = sample_uniform_normalized(n_clusters, codec)
+    labels = np.random.randint(n_clusters, size=n)
+    X = centers[labels] + np.random.normal(0.0, 0.03, size=(n, codec.dim))
+    return codec.encode(codec.decode(X))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dim", type=int, default=12)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--capacity", type=int, default=1000)
+    parser.add_argument("--merge-radius", type=float, default=0.02)
+    parser.add_argument("--max-tries", type=int, default=1000)
+    parser.add_argument("--trials", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    np.random.seed(args.seed)
+    codec = ParamCodec(make_parameters_def(args.dim))
+
+    print(
+        f"RepulsiveArchive d={codec.dim} capacity={args.capacity} "
+        f"merge_radius={args.merge_radius} max_tries={args.max_tries}"
+    )
+    print(f"  {'R':>7s} {'stored':>7s} {'quality':>8s} {'min':>6s} {'full ms':>8s} {'archive ms':>10s}")
+
+    for size in args.sizes:
+        R = clustered_points(codec, size)
+        archive = RepulsiveArchive(codec.dim, capacity=args.capacity, merge_radius=args.merge_radius)
+        for x in R:
+            archive.add(x)
+
+        ratios = []
+        t_full = 0.0
+        t_archive = 0.0
+        for _ in range(args.trials):
+            C = sample_uniform_normalized(args.max_tries, codec)
+
+            t0 = time.perf_counter()
+            d_full = min_squared_distances(C, R)
+            t_full += time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            d_archive = archive.min_squared_distances(C)
+            t_archive += time.perf_counter() - t0
+
+            best = d_full.max()
+            ratios.append(d_full[np.argmax(d_archive)] / best if best > 0 else 1.0)
+
+        ratios = np.sqrt(np.array(ratios))
+        print(
+            f"  {size:7d} {len(archive):7d} {ratios.mean():8.3f} {ratios.min():6.3f} "
+            f"{t_full / args.trials * 1e3:8.2f} {t_archive / args.trials * 1e3:10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
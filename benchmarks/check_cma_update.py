@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Matrix-form CMA-ES generation (CMAAgent.tell -> CMAPopulations.tell) against
+the per-sample update it replaced (copied below as it was: weighted mean as
+a sum, rank-one and rank-µ terms as np.outer calls, C^{-1/2} from an
+eigendecomposition of C refreshed every generation).
+
+Both are fed the same samples and scores from a fixed seed, generation after
+generation (including generations with fewer than µ elites), and mean,
+sigma, C, p_sigma and p_c must agree to --tol after each one. Exits with
+code 1 otherwise.
+
+Usage:
+    python -m benchmarks.check_cma_update
+    python -m benchmarks.check_cma_update --dims 3 20 --generations 200 --seed 4
+"""
+
+import argparse
+import sys
+from typing import Dict, List
+
+import numpy as np
+
+from backend.agents.cmaes.cma_agent import CMAAgent
+
+
+# ---------------------------------------------------------------------------
+# Reference implementation (before the matrix form)
+# ---------------------------------------------------------------------------
+def reference_tell(state: Dict[str, object], pops, xs: np.ndarray, scores: np.ndarray) -> None:
+    """
+    One generation on `state` (mean, sigma, C, pc, ps, generation), with the
+    strategy parameters of `pops` (a CMAPopulations).
+    """
+    idx = np.argsort(-scores)
+    xs = xs[idx]
+
+    lam_eff = xs.shape[0]
+    if lam_eff < 4:
+        return
+    mu_eff = min(pops.mu, lam_eff)
+    weights = pops.weights[:mu_eff]
+    weights = weights / np.sum(weights)
+
+    m_old = state["mean"].copy()
+    sigma_old = state["sigma"]
+    elite = xs[:mu_eff]
+    mean_new = np.sum(elite * weights[:, None], axis=0)
+    y_mean = (mean_new - m_old) / sigma_old
+
+    eigvals, B = np.linalg.eigh(state["C"])
+    D = np.sqrt(np.maximum(eigvals, 1e-12))
+    C_inv_sqrt_y = B @ ((B.T @ y_mean) / D)
+    mu_eff_here = 1.0 / np.sum(weights**2)
+
+    state["ps"] = (1 - pops.cs) * state["ps"] + np.sqrt(pops.cs * (2 - pops.cs) * pops.mu_eff) * C_inv_sqrt_y
+    ps_norm = float(np.linalg.norm(state["ps"]))
+    sigma_new = sigma_old * np.exp((pops.cs / pops.ds) * (ps_norm / pops.chiN - 1.0))
+
+    state["generation"] += 1
+    h_sigma_cond = ps_norm / np.sqrt(1 - (1 - pops.cs) ** (2 * state["generation"]))
+    h_sigma = 1.0 if h_sigma_cond < (1.4 + 2 / (pops.dim + 1)) * pops.chiN else 0.0
+    state["pc"] = (1 - pops.cc) * state["pc"] + h_sigma * np.sqrt(pops.cc * (2 - pops.cc) * mu_eff_here) * y_mean
+
+    artmp = (xs[:mu_eff] - m_old) / sigma_old
+    C = state["C"]
+    C_new = (1 - pops.c1 - pops.cmu) * C
+    C_new += pops.c1 * (np.outer(state["pc"], state["pc"]) + (1 - h_sigma) * pops.cc * (2 - pops.cc) * C)
+    for k in range(mu_eff):
+        C_new += pops.cmu * weights[k] * np.outer(artmp[k], artmp[k])
+
+    state["C"] = 0.5 * (C_new + C_new.T)
+    state["mean"] = mean_new
+    state["sigma"] = float(np.clip(sigma_new, pops.sigma_min, pops.sigma_max))
+
+
+# ---------------------------------------------------------------------------
+def run(dim: int, generations: int, seed: int) -> float:
+    """
+    Largest difference between the two updates over all generations.
+    """
+    parameters_def = {f"p{i}": {"type": "float", "range": [0.0, 1.0]} for i in range(dim)}
+    agent = CMAAgent(parameters_def, eigen_update_interval=1)
+    pops = agent.pops
+    state = {
+        "mean": pops.mean[0].copy(),
+        "sigma": float(pops.sigma[0]),
+        "C": pops.C[0].copy(),
+        "pc": pops.pc[0].copy(),
+        "ps": pops.ps[0].copy(),
+        "generation": 0,
+    }
+
+    rng = np.random.default_rng(seed)
+    target = rng.random(dim)
+    worst = 0.0
+    for g in range(generations):
+        # every 5th generation with 4 samples only (fewer than µ elites)
+        n = 4 if g % 5 == 4 else pops._lambda
+        X, _ = agent.ask(n)
+        scores = -np.sum((X - target) ** 2, axis=1) + 0.01 * rng.standard_normal(n)
+
+        reference_tell(state, pops, X, scores)
+        agent.tell(X, scores)
+
+        for name in ("mean", "C", "pc", "ps"):
+            worst = max(worst, float(np.max(np.abs(getattr(pops, name)[0] - state[name]))))
+        worst = max(worst, abs(float(pops.sigma[0]) - state["sigma"]))
+    return worst
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dims", type=int, nargs="+", default=[2, 10, 40])
+    parser.add_argument("--generations", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tol", type=float, default=1e-10)
+    args = parser.parse_args()
+
+    np.random.seed(args.seed)  # CMAPopulations.ask draws from the global generator
+    failures: List[int] = []
+    print(f"CMA-ES tell vs reference, {args.generations} generations, tol {args.tol:g}")
+    for dim in args.dims:
+        worst = run(dim, args.generations, args.seed + dim)
+        ok = worst <= args.tol
+        print(f"  {'ok  ' if ok else 'FAIL'} dim={dim:4d}  max |difference| {worst:.3g}")
+        if not ok:
+            failures.append(dim)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+ParamCodec against the per-parameter normalize_params / denormalize_params
+it replaced (copied below as they were), on random float / integer / choice
+definitions:
+  - normalize_params and ParamCodec.encode give the same normalized values,
+  - denormalize_params gives the same parameters, also outside [0, 1],
+  - decode(encode(params)) gives the params back (integer and choice exactly),
+  - absent parameters, unknown choice values and definitions without "type"
+    are left out of the dict API results, as before.
+
+Exits with code 1 on the first mismatch.
+
+Usage:
+    python -m benchmarks.check_codec
+    python -m benchmarks.check_codec --dim 40 --n 2000 --seed 3
+"""
+
+import argparse
+import logging
+import sys
+from typing import Any, Dict, Mapping
+
+import numpy as np
+
+from backend.agents.utils.codec import ParamCodec
+from backend.agents.utils.sampler import denormalize_params, normalize_params
+from benchmarks.bench_codec import make_parameters_def
+
+
+# ---------------------------------------------------------------------------
+# Reference implementations (before ParamCodec)
+# ---------------------------------------------------------------------------
+def reference_normalize_params(
+    params: Mapping[str, Any],
+    parameters_def: Mapping[str, Mapping[str, Any]],
+) -> Dict[str, float]:
+    norm_params = {}
+    for name, param_def in parameters_def.items():
+        if name not in params:
+            continue
+        ptype = param_def.get("type")
+        if ptype in ("float", "integer"):
+            lo, hi = param_def["range"]
+            norm_params[name] = (params[name] - lo) / (hi - lo)
+        elif ptype == "choice":
+            choices = param_def.get("choices")
+            n = len(choices)
+            try:
+                idx = choices.index(params[name])
+            except ValueError:
+                continue
+            norm_params[name] = 0.0 if n == 1 else idx / (n - 1)
+    return norm_params
+
+
+def reference_denormalize_params(
+    norm_params: Mapping[str, float],
+    parameters_def: Mapping[str, Mapping[str, Any]],
+) -> Dict[str, Any]:
+    params: Dict[str, Any] = {}
+    for name, param_def in parameters_def.items():
+        if name not in norm_params:
+            continue
+        ptype = param_def.get("type")
+        norm_val = norm_params[name]
+        if ptype == "float":
+            lo, hi = param_def["range"]
+            params[name] = norm_val * (hi - lo) + lo
+        elif ptype == "integer":
+            lo, hi = param_def["range"]
+            x = round(norm_val * (hi - lo) + lo)
+            params[name] = int(np.clip(x, lo, hi))
+        elif ptype == "choice":
+            choices = param_def.get("choices")
+            n = len(choices)
+            if n == 1:
+                params[name] = choices[0]
+            else:
+                idx = int(np.clip(int(round(norm_val * (n - 1))), 0, n - 1))
+                params[name] = choices[idx]
+    return params
+
+
+# ---------------------------------------------------------------------------
+def same(a: Dict[str, Any], b: Dict[str, Any], parameters_def, tol: float = 1e-9) -> bool:
+    if a.keys() != b.keys():
+        return False
+    for name, value in a.items():
+        if parameters_def[name].get("type") == "float" or isinstance(value, float):
+            if abs(float(value) - float(b[name])) > tol:
+                return False
+        elif value != b[name] or type(value) is not type(b[name]):
+            return False
+    return True
+
+
+def check(label: str, ok: bool, failures: list) -> None:
+    print(f"  {'ok  ' if ok else 'FAIL'} {label}")
+    if not ok:
+        failures.append(label)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dim", type=int, default=24)
+    parser.add_argument("--n", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    parameters_def = make_parameters_def(args.dim, seed=args.seed)
+    # choices that are not indices, and a single choice
+    parameters_def["shape"] = {"type": "choice", "choices": ["circle", "square", "star"]}
+    parameters_def["single"] = {"type": "choice", "choices": ["only"]}
+    codec = ParamCodec(parameters_def)
+    rng = np.random.default_rng(args.seed + 1)
+    failures: list = []
+
+    # parameters in original space, drawn from the definitions
+    params_list = codec.decode(rng.random((args.n, codec.dim)))
+    print(f"ParamCodec vs reference, dim={codec.dim}, n={args.n}")
+
+    check(
+        "normalize_params == reference",
+        all(
+            same(normalize_params(p, parameters_def, codec), reference_normalize_params(p, parameters_def), parameters_def)
+            for p in params_list
+        ),
+        failures,
+    )
+    X = codec.encode(params_list, clip=False)
+    R = np.array(
+        [[reference_normalize_params(p, parameters_def)[name] for name in codec.names] for p in params_list]
+    )
+    check("encode (batch) == reference", np.allclose(X, R, rtol=0.0, atol=1e-12), failures)
+
+    # normalized values, some outside [0, 1]
+    Z = rng.uniform(-0.2, 1.2, size=(args.n, codec.dim))
+    norm_list = [dict(zip(codec.names, z)) for z in Z.tolist()]
+    check(
+        "denormalize_params == reference",
+        all(
+            same(denormalize_params(z, parameters_def, codec), reference_denormalize_params(z, parameters_def), parameters_def)
+            for z in norm_list
+        ),
+        failures,
+    )
+    check(
+        "decode (batch, clip=False) == reference",
+        all(
+            same(p, reference_denormalize_params(z, parameters_def), parameters_def)
+            for p, z in zip(codec.decode(Z, clip=False), norm_list)
+        ),
+        failures,
+    )
+
+    check(
+        "decode(encode(params)) == params",
+        all(same(q, p, parameters_def) for q, p in zip(codec.decode(codec.encode(params_list)), params_list)),
+        failures,
+    )
+
+    # left out of the dict API, as before
+    partial = dict(params_list[0])
+    del partial["p0"]
+    partial["shape"] = "hexagon"
+    check(
+        "absent parameter and unknown choice dropped",
+        same(normalize_params(partial, parameters_def, codec), reference_normalize_params(partial, parameters_def), parameters_def),
+        failures,
+    )
+    untyped = dict(parameters_def, untyped={"range": [0, 1]})
+    untyped_params = dict(params_list[0], untyped=0.5)
+    check(
+        'definition without "type" skipped',
+        same(normalize_params(untyped_params, untyped), reference_normalize_params(untyped_params, untyped), untyped)
+        and "untyped" not in ParamCodec(untyped).names,
+        failures,
+    )
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
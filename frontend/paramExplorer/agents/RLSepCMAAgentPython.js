@@ -0,0 +1,14 @@
+class RLSepCMAAgentPython extends RLAgentPython
+{
+  // -------------------------------------------------
+  constructor(param_explorer) 
+  {
+    super(param_explorer, "sep-cma-es");
+  }
+
+  // -------------------------------------------------
+  getDescription() 
+  {
+    return "RLSepCMAAgentPython (remote AgentSepCMAES Python): separable CMA-ES for sketches with many parameters, via /agent/play and /agent/update.";
+  }
+}
@@ -0,0 +1,14 @@
+class RLSurrogateAgentPython extends RLAgentPython
+{
+  // -------------------------------------------------
+  constructor(param_explorer) 
+  {
+    super(param_explorer, "surrogate");
+  }
+
+  // -------------------------------------------------
+  getDescription() 
+  {
+    return "RLSurrogateAgentPython (remote AgentSurrogate Python): the server screens many candidates with a model of the scores and only proposes the most promising ones, via /agent/play and /agent/update.";
+  }
+}
@@ -53,8 +53,10 @@ class ParamExplorer
         this.agents = new Map();
         this.agents.set("Agent Random",      new RLRandomAgentPython(this));
         this.agents.set("Agent CMA-ES",      new RLCMAAgentPython(this));
+        this.agents.set("Agent Sep-CMA-ES",  new RLSepCMAAgentPython(this));
         this.agents.set("Agent Gaussian",    new RLGaussianAgentPython(this));
         this.agents.set("Agent Open-ended",    new RLOpenEndedAgentPython(this));
+        this.agents.set("Agent Surrogate",   new RLSurrogateAgentPython(this));
 
         // Set
         this.setAgent("Agent Random"); // default selected agent here
@@ -222,6 +224,29 @@ class ParamExplorer
     }
 
 
+    // Same score for several images: one request. With opts.forwardToAgent,
+    // the server also feeds the images scored for the first time to the
+    // current agent
+    async updateScores(image_ids, score, opts={})
+    {
+        let data = 
+        {
+            'session_id'        : this.session_id,
+            'scores'            : image_ids.map(image_id => [image_id, score])
+        };
+        if (opts.forwardToAgent === true)
+        {
+            data['forward_to_agent']    = true;
+            data['agent_name']          = this.agent ? this.agent.name : null;
+            data['parameters_def']      = this.getParametersDef();
+        }
+
+        let result = await call('update_scores', data);
+        if (ParamExplorer.__LOG__)
+            console.log(`ParamExplorer.updateScores(${image_ids}, ${score}) result=`, result);
+        return result;
+    }
+
     async updateScore(image_id, score, opts={})
     {
         if (ParamExplorer.__LOG__)
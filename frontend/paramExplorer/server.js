@@ -1,6 +1,11 @@
 async function call(end_point,data={})
 {
-    let response    = await fetch(`${URL_SERVER}/${end_point}`,{method:'POST', body:JSON.stringify(data)});
+    // the session also goes in the URL: the server restores a compacted
+    // session before the request without reading its body
+    let url         = `${URL_SERVER}/${end_point}`;
+    if (typeof data.session_id === 'string')
+        url += `?session_id=${encodeURIComponent(data.session_id)}`;
+    let response    = await fetch(url,{method:'POST', body:JSON.stringify(data)});
     let json        = await response.json();
     if (json.status == 'error') console.warn(json);
     return json;
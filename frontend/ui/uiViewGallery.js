@@ -537,18 +537,16 @@ class UIViewGallery extends UIElement
         if (!ok) return;
 
         try {
-            for (const idStr of ids) {
-                const id = parseInt(idStr, 10);
-                const result = await call('delete_image', {
-                    id: id,
-                    session_id: __UI_PARAM_EXPLORER__.session_id
-                });
-
-                if (result.status !== "ok") {
-                    console.error(`Failed to delete image ${id}`, result);
-                } else if (UIViewGallery.__LOG__) {
-                    console.log(`Image ${id} deleted`);
-                }
+            // one request (and one DB write) for the whole selection
+            const result = await call('delete_images', {
+                image_ids: ids.map(idStr => parseInt(idStr, 10)),
+                session_id: __UI_PARAM_EXPLORER__.session_id
+            });
+
+            if (result.status !== "ok") {
+                console.error(`Failed to delete images`, result);
+            } else if (UIViewGallery.__LOG__) {
+                console.log(`Images ${result.deleted_ids} deleted`);
             }
 
             // reset selection and reload
@@ -569,17 +567,12 @@ class UIViewGallery extends UIElement
         if (ids.length === 0) return;
 
         try {
-            for (const idStr of ids) {
-                const id = parseInt(idStr, 10);
+            const result = await paramExplorer.updateScores(ids.map(idStr => parseInt(idStr, 10)), score);
 
-                // same API as for teScore
-                const result = await paramExplorer.updateScore(id, score);
-
-                if (result?.status && result.status !== "ok") {
-                    console.error(`Failed to update score for image ${id}`, result);
-                } else if (UIViewGallery.__LOG__) {
-                    console.log(`Score ${score} applied to image ${id}`);
-                }
+            if (result?.status && result.status !== "ok") {
+                console.error(`Failed to update scores`, result);
+            } else if (UIViewGallery.__LOG__) {
+                console.log(`Score ${score} applied to ${result.images_infos.length} image(s)`);
             }
 
             // keep the same selection, but reload the data
@@ -1,4 +1,5 @@
 import base64
+import json
 import os
 import argparse
 from datetime import datetime
@@ -6,39 +7,72 @@ from backend.paths import *
 from aiohttp import web
 from aiohttp.web_middlewares import normalize_path_middleware
 from tinydb import TinyDB, Query
-from urllib.parse import urlparse
-import pathlib
-
-# Import clustering
-from backend.clustering.clustering import return_json_tree, return_json_tsne
+from tinydb.table import Document
+import time
+from collections import Counter
 
 # Images utils
-from backend.utils_image import get_image_filename, image_exists, save_resized_images
+from backend.utils_image import save_renditions
+from backend.blob_store import BlobStore, blob_digest
+
+# Filesystem operations off the event loop
+from backend.async_io import AsyncFileIO, remove_files
+
+# Orphaned image files
+from backend.orphan_gc import OrphanCollector, image_files
+
+# Session export / import
+from backend.session_archive import ArchiveError, iter_export, read_archive, stream_reader
+
+# Compaction of idle sessions
+from backend.session_compactor import SessionCompacted, SessionCompactor
+
+# Automated scoring
+from backend.scoring.auto_scorer import AutoScorer
+from backend.scoring.scorers import SCORERS, resolve_scorer
+
+# Static files of the client
+from backend.static_assets import StaticAssetCache
+
+# Profiling (opt-in, --profiling)
+from backend.profiling import Profiler
+
+# Metrics
+from backend.metrics import (
+    AGENT_PLAY_LATENCY,
+    AGENT_UPDATE_LATENCY,
+    CLUSTERING_LATENCY,
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    HTTP_LATENCY,
+    HTTP_REQUESTS,
+    IMAGE_BYTES_SAVED,
+    IMAGES_SAVED,
+    REGISTRY,
+    THUMBNAIL_LATENCY,
+)
 
 # ------------------------------------------------------------
-# Import des agents
-from backend.agents.cmaes.agent_cmaes import AgentCMAES
-from backend.agents.gaussian.agent_gaussian import AgentGaussian
-from backend.agents.simple.agent_simple import AgentRandom
-from backend.agents.open_ended.agent_open_ended import AgentOpenEnded
+# Agents (imported by name on first use, see LazyAgentRegistry)
+from backend.agents.registry import LazyAgentRegistry
 
 # ------------------------------------------------------------
 PORT_SERVER = 3001
 IP_SERVER = f"127.0.0.1"
 URL_SERVER = f"http://{IP_SERVER}:{PORT_SERVER}"
 CLIENT_MAX_SIZE = 50 * 1024**2  # 50 MB input for server
-BASE_DIR_SERVER = pathlib.Path(".").resolve()   # server root
 FOLDER_EXCEPTIONS_SERVER = {
     "",
     "examples"
 }
 # ------------------------------------------------------------
-mapping_agent_name_to_class = {
-    "random": AgentRandom,
-    "cma-es": AgentCMAES,
-    "gaussian": AgentGaussian,
-    "open-ended": AgentOpenEnded,
-}
+mapping_agent_name_to_class = LazyAgentRegistry({
+    "random": "backend.agents.simple.agent_simple:AgentRandom",
+    "cma-es": "backend.agents.cmaes.agent_cmaes:AgentCMAES",
+    "sep-cma-es": "backend.agents.cmaes.agent_cmaes:AgentSepCMAES",
+    "gaussian": "backend.agents.gaussian.agent_gaussian:AgentGaussian",
+    "open-ended": "backend.agents.open_ended.agent_open_ended:AgentOpenEnded",
+    "surrogate": "backend.agents.surrogate.agent_surrogate:AgentSurrogate",
+})
 
 import logging
 logger = logging.getLogger(__name__)
@@ -48,13 +82,41 @@ logging.basicConfig(level=logging.INFO)
 # Global dictionary to store agents per session
 SESSIONS_AGENTS = {}  # dictionnary (session_id, agent_name) -> object agent
 
+# Automated scoring of saved images (disabled unless a scorer is set, with
+# --auto-scorer or "auto_scorer" in the /save payload)
+AUTO_SCORER = AutoScorer()
+AUTO_SCORER_NAME = None
+AUTO_SCORER_WIDTH = 256  # rendition that is scored
+
+# Content-addressed image store of each session, with the reference counts
+# of its images (see backend/blob_store.py)
+BLOB_STORES = {}  # session_id -> BlobStore
+FOLDER_BLOBS = "blobs"
+
+# Image writes / deletes run in this thread pool (--io-workers, --io-queue,
+# --fsync); TinyDB access stays on the event loop
+FILE_IO = AsyncFileIO()
 # ------------------------------------------------------------
 def open_db(session_id):
+    # a compacted session is restored by session_middleware: creating an
+    # empty DB next to its archive would hide its images
+    if COMPACTOR.archive_path(session_id, restoring=False) is not None:
+        raise SessionCompacted(session_id)
     path_db = f"{PATH_IMAGES}/{session_id}/tinydb.json"
     os.makedirs(os.path.dirname(path_db), exist_ok=True)
     return TinyDB(path_db)
 
 
+def get_blob_store(session_id, db=None):
+    store = BLOB_STORES.get(session_id)
+    if store is None:
+        if db is None:
+            db = open_db(session_id)
+        store = BlobStore(os.path.join(PATH_IMAGES, f"{session_id}", FOLDER_BLOBS), db.all())
+        BLOB_STORES[session_id] = store
+    return store
+
+
 def get_or_create_agent(session_id, agent_name, param_defs, force_new=False):
     key = (session_id, agent_name)
     if (key in SESSIONS_AGENTS) and (not force_new):
@@ -68,6 +130,79 @@ def get_or_create_agent(session_id, agent_name, param_defs, force_new=False):
     return agent
 
 
+def update_image_score(session_id, image_id, score):
+    # writes the score of an image, returns its updated doc (None if no entry)
+    updated = update_image_scores(session_id, {int(image_id): score})
+    return updated[0][0] if updated else None
+
+
+def update_image_scores(session_id, scores):
+    # writes { image_id: score }, returns [(updated doc, previous score)]
+    # (images not found are skipped), in one DB write. Table.update calls
+    # `fields` with the documents of doc_ids in that order, without their id:
+    # the scores come in the same order (nothing runs between get and update)
+    db = open_db(session_id)
+    docs = db.get(doc_ids=list(scores)) or []
+    new_scores = iter([scores[doc.doc_id] for doc in docs])
+
+    def set_score(doc):
+        doc["score"] = next(new_scores)
+
+    db.update(set_score, doc_ids=[doc.doc_id for doc in docs])
+    return [
+        (Document(dict(doc, score=scores[doc.doc_id]), doc.doc_id), doc.get("score"))
+        for doc in docs
+    ]
+
+
+def flat_parameters(parameters):
+    # { name: {type, freeze, value, ...} } (as stored) -> { name: value }
+    flat = {}
+    for name, p in (parameters or {}).items():
+        value = p.get("value") if isinstance(p, dict) else p
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def schedule_auto_score(session_id, image_id, filepath, parameters, metadata, scorer_name):
+    # scores the image in the worker pool, then writes the score and feeds it
+    # to the session agent that proposed the image, unless the image was
+    # rated meanwhile (that rating is kept, and its agent update was made).
+    # "package.module:function" scorers are only accepted from --auto-scorer
+    def on_score(score):
+        db = open_db(session_id)
+        doc = db.get(doc_id=int(image_id))
+        if doc is None:
+            logger.info(f"auto score: image {image_id} was deleted, score dropped")
+            return
+        if doc.get("score") not in (None, -1):
+            logger.info(f"auto score: image {image_id} was rated meanwhile, score dropped")
+            return
+        db.update({"score": score}, doc_ids=[int(image_id)])
+
+        agent_name = (metadata or {}).get("agent_name")
+        agent = SESSIONS_AGENTS.get((session_id, agent_name))
+        if agent is not None:
+            with AGENT_UPDATE_LATENCY.time(agent_class=type(agent).__name__):
+                agent.update(flat_parameters(parameters), score, metadata)
+        logger.info(
+            f"auto score ({scorer_name}): session {session_id}, image {image_id} -> {score:.1f}"
+        )
+
+    AUTO_SCORER.submit(
+        filepath, scorer_name, on_score, allow_import=scorer_name == AUTO_SCORER_NAME
+    )
+
+
+async def shutdown_auto_scorer(app):
+    AUTO_SCORER.shutdown()
+
+
+async def shutdown_file_io(app):
+    FILE_IO.shutdown()
+
+
 async def handle_agent_update(request: web.Request):
     # retrieves the json, then the agent name, retrieves (or creates) the agent if needed, and calls its update
     try:
@@ -90,7 +225,8 @@ async def handle_agent_update(request: web.Request):
         return web.json_response({"status": "error", "message": "agent_name not set"}, status=400)
 
     agent = get_or_create_agent(session_id, agent_name, param_defs)
-    agent.update(params, score, metadata)
+    with AGENT_UPDATE_LATENCY.time(agent_class=type(agent).__name__):
+        agent.update(params, score, metadata)
     return web.json_response({"status": "ok"})
 
 async def handle_agent_change(request: web.Request):
@@ -127,7 +263,8 @@ async def handle_agent_play(request: web.Request):
         return web.json_response({"status": "error", "message": "agent_name not set"}, status=400)
     
     agent = get_or_create_agent(session_id, agent_name, param_defs)
-    params_out, metadata = agent.play()
+    with AGENT_PLAY_LATENCY.time(agent_class=type(agent).__name__):
+        params_out, metadata = agent.play()
     return web.json_response(
         {
             "status": "ok",
@@ -136,6 +273,27 @@ async def handle_agent_play(request: web.Request):
         }
     )
 
+async def handle_agent_telemetry(request: web.Request):
+    # per-call timings and state time series of the agents of a session
+    # (all of them, or only agent_name)
+    try:
+        data = await request.json()
+    except Exception as e:
+        return web.json_response(
+            {"status": "error", "message": f"invalid JSON: {e}"}, status=400
+        )
+    session_id = data.get("session_id")
+    agent_name = data.get("agent_name")
+    if session_id is None:
+        return web.json_response({"status": "error", "message": "session_id not set"}, status=400)
+
+    agents = {
+        name: agent.telemetry.to_dict()
+        for (sid, name), agent in SESSIONS_AGENTS.items()
+        if sid == session_id and (agent_name is None or name == agent_name)
+    }
+    return web.json_response({"status": "ok", "agents": agents})
+
 async def handle_agent_time_warp(request: web.Request):
     try:
         data = await request.json()
@@ -212,15 +370,25 @@ async def handle_save(request: web.Request):
           
     batch_parameters = data.get("batch_parameters", [])
     batch_metadata = data.get("batch_metadata", [[] for _ in batch_parameters])
+    auto_scorer_name = data.get("auto_scorer", AUTO_SCORER_NAME)
     if not isinstance(batch_parameters, list):
         return web.json_response(
             {"status": "error", "message": "'batch_parameters' must be a list"},
             status=400,
         )
+    # a request only picks among the built-in scorers
+    if auto_scorer_name not in (None, AUTO_SCORER_NAME) and auto_scorer_name not in SCORERS:
+        return web.json_response(
+            {
+                "status": "error",
+                "message": f"unknown auto_scorer {auto_scorer_name!r}, expected one of {sorted(SCORERS)}",
+            },
+            status=400,
+        )
 
     # dir pour les images
     path_images = os.path.join(PATH_IMAGES, f"{session_id}")
-    os.makedirs(os.path.dirname(path_images), exist_ok=True)
+    await FILE_IO.makedirs(os.path.dirname(path_images))
 
     images_ids = []
     # Parcours de tous les parameters
@@ -239,38 +407,70 @@ async def handle_save(request: web.Request):
 
         try:
             image_bytes = base64.b64decode(b64_data)
-            #filename = f"{pe_id}_image_{timestamp_str}.{ext}"
-            filename = get_image_filename(pe_id,timestamp_str,ext)
-            filepath = os.path.join(path_images, filename)
-            image_url = f"{URL_SERVER}/{PATH_IMAGES}/{session_id}/{filename}"
-
-            # Save image
-            with open(filepath, "wb") as f:
-                f.write(image_bytes)
-
-            # Save resized images
-            save_resized_images(image_bytes,pe_id,timestamp_str,ext,path_images)
-
-            # Update the item: remove "image", add "image_url"
-            parameter_updated = dict(parameter)
-            parameter_updated.pop("score", None)
-            parameter_updated.pop("image_data", None)
-            parameter_updated.pop("image_timestamp", None)
-            # parameter_updated["image_url"] = image_url
-
             db = open_db(session_id)
-            image_id = db.insert(
-                {
-                    "parameters": parameter_updated,
-                    "metadata": metadata,
-                    "url": image_url,
-                    "score": score,
-                    "timestamp": timestamp_str,
-                }
-            )
+            store = get_blob_store(session_id, db)
+
+            # The reference is taken before the first await: a delete of the
+            # same content meanwhile keeps its files. Dropped if the save fails
+            digest = blob_digest(image_bytes)
+            store.incref(digest)
+            try:
+                # Save image, once per distinct content
+                digest, written = await FILE_IO.run(store.put, image_bytes, ext, FILE_IO.fsync, digest)
+                filepath = store.path(digest, ext)
+                image_url = f"{URL_SERVER}/{PATH_IMAGES}/{session_id}/{FOLDER_BLOBS}/{store.relpath(digest, ext)}"
+                IMAGES_SAVED.inc()
+                if written:
+                    IMAGE_BYTES_SAVED.inc(len(image_bytes))
+
+                # Save resized images (again if a previous save was interrupted)
+                renditions = store.rendition_paths(digest, ext)
+                if written or not await FILE_IO.run(
+                    lambda: all(os.path.isfile(p) for p in renditions.values())
+                ):
+                    with THUMBNAIL_LATENCY.time():
+                        await FILE_IO.run(save_renditions, image_bytes, renditions, FILE_IO.fsync)
+
+                # Update the item: remove "image", add "image_url"
+                parameter_updated = dict(parameter)
+                parameter_updated.pop("score", None)
+                parameter_updated.pop("image_data", None)
+                parameter_updated.pop("image_timestamp", None)
+                # parameter_updated["image_url"] = image_url
+
+                image_id = db.insert(
+                    {
+                        "parameters": parameter_updated,
+                        "metadata": metadata,
+                        "url": image_url,
+                        "blob": digest,
+                        "score": score,
+                        "timestamp": timestamp_str,
+                    }
+                )
+            except BaseException:
+                store.decref(digest)
+                raise
             # print(f"image id={image_id}")
             images_ids.append(image_id)
 
+            # Unrated images go to the automated scorer, if any
+            if auto_scorer_name and score in (None, -1):
+                scored_path = renditions.get(AUTO_SCORER_WIDTH, filepath)
+                if not await FILE_IO.isfile(scored_path):
+                    scored_path = filepath
+                schedule_auto_score(
+                    session_id,
+                    image_id,
+                    scored_path,
+                    parameter_updated,
+                    metadata,
+                    auto_scorer_name,
+                )
+
+        except SessionCompacted:
+            # restored by session_middleware, which handles the request again
+            raise
         except Exception as e:
             print(f"❌ error on image {i}: {e}")
 
@@ -466,13 +666,9 @@ async def handle_update_score(request: web.Request):
             status=400,
         )
 
-    # Database connection
-    db = open_db(session_id)
-
-    result = db.update({"score": score}, doc_ids=[int(image_id)])
-    image_infos = db.get(doc_id=int(image_id))
+    image_infos = update_image_score(session_id, image_id, score)
     # print("Updated image infos:", image_infos)
-    if result:
+    if image_infos is not None:
         return web.json_response({"status": "ok", "image_infos": image_infos})
 
     return web.json_response(
@@ -480,6 +676,79 @@ async def handle_update_score(request: web.Request):
     )
 
 
+# ------------------------------------------------------------
+async def handle_update_scores(request: web.Request):
+    # scores of many images (one DB write). With
+    # forward_to_agent and agent_name, the images scored for the first time
+    # (no score or -1) are also fed to that agent of the session (created if
+    # parameters_def is given, otherwise only if alive)
+    try:
+        data = await request.json()
+    except Exception as e:
+        return web.json_response(
+            {"status": "error", "message": f"invalid JSON: {e}"}, status=400
+        )
+
+    session_id = data.get("session_id")
+    pairs = data.get("scores")
+    forward_to_agent = data.get("forward_to_agent") is True
+    agent_name = data.get("agent_name")
+    param_defs = data.get("parameters_def")
+    if session_id is None or not isinstance(pairs, list):
+        return web.json_response(
+            {"status": "error", "message": "session_id or scores (list) missing"}, status=400
+        )
+
+    # [{"image_id": id, "score": s}, ...] or [[id, s], ...]
+    scores = {}
+    try:
+        for pair in pairs:
+            if isinstance(pair, dict):
+                image_id, score = pair["image_id"], pair["score"]
+            else:
+                image_id, score = pair
+            if score is not None and (isinstance(score, bool) or not isinstance(score, (int, float))):
+                raise ValueError(f"score of image {image_id} is not a number")
+            scores[int(image_id)] = score
+    except Exception as e:
+        return web.json_response(
+            {"status": "error", "message": f"invalid scores: {e}"}, status=400
+        )
+
+    updated = update_image_scores(session_id, scores)
+    docs = [doc for doc, _ in updated]
+    updated_ids = {doc.doc_id for doc in docs}
+    first_scored = [doc for doc, previous in updated if previous in (None, -1)]
+
+    forwarded = 0
+    if forward_to_agent and agent_name is not None and first_scored:
+        if param_defs is not None:
+            agent = get_or_create_agent(session_id, agent_name, param_defs)
+        else:
+            agent = SESSIONS_AGENTS.get((session_id, agent_name))
+        if agent is not None:
+            for doc in first_scored:
+                try:
+                    with AGENT_UPDATE_LATENCY.time(agent_class=type(agent).__name__):
+                        agent.update(
+                            flat_parameters(doc.get("parameters")),
+                            doc["score"],
+                            doc.get("metadata") or {},
+                        )
+                    forwarded += 1
+                except Exception as e:
+                    logger.warning(f"update_scores: {agent_name} update failed on image {doc.doc_id}: {e}")
+
+    return web.json_response(
+        {
+            "status": "ok",
+            "images_infos": [dict(doc, id=doc.doc_id) for doc in docs],
+            "not_found_ids": [i for i in scores if i not in updated_ids],
+            "forwarded": forwarded,
+        }
+    )
+
+
 # ------------------------------------------------------------
 async def handle_delete_image(request: web.Request):
     try:
@@ -505,42 +774,298 @@ async def handle_delete_image(request: web.Request):
             {"status": "error", "message": "image_id must be an integer"}, status=400
         )
 
-    # Database connection
-    db = open_db(session_id)
-
-    # Retrieve the doc to find the URL/file
-    doc = db.get(doc_id=image_id)
-    if doc is None:
+    deleted, not_found, bytes_freed = await delete_images(session_id, [image_id])
+    if not deleted:
         return web.json_response(
             {"status": "error", "message": f"no entry with id={image_id}"}, status=404
         )
+    return web.json_response({"status": "ok", "deleted_id": image_id})
 
-    # Delete the corresponding image file, if possible
-    url = doc.get("url")
-    if url:
-        try:
-            parsed = urlparse(url)
-            # ex: /images/<session_id>/<filename>
-            rel_path = parsed.path.lstrip("/")  # "images/..."
-            filepath = os.path.join(rel_path)  # relatif au cwd
-
-            if os.path.exists(filepath):
-                os.remove(filepath)
-                print(f"Deleted image file: {filepath}")
-            else:
-                print(f"Image file not found for deletion: {filepath}")
-        except Exception as e:
-            print(f"Error while deleting file for image {image_id}: {e}")
 
-    # Delete the DB entry
+async def handle_delete_images(request: web.Request):
+    # deletes a list of images in one DB write, with their files
     try:
-        db.remove(doc_ids=[image_id])
+        data = await request.json()
+    except Exception as e:
+        return web.json_response(
+            {"status": "error", "message": f"invalid JSON: {e}"}, status=400
+        )
+
+    session_id = data.get("session_id")
+    image_ids = data.get("image_ids")
+    if session_id is None or not isinstance(image_ids, list):
+        return web.json_response(
+            {"status": "error", "message": "session_id or image_ids (list) missing"}, status=400
+        )
+    try:
+        image_ids = [int(i) for i in image_ids]
+    except Exception:
+        return web.json_response(
+            {"status": "error", "message": "image_ids must be integers"}, status=400
+        )
+
+    try:
+        deleted, not_found, bytes_freed = await delete_images(session_id, image_ids)
     except Exception as e:
         return web.json_response(
             {"status": "error", "message": f"TinyDB remove error: {e}"}, status=500
         )
+    return web.json_response(
+        {
+            "status": "ok",
+            "deleted_ids": deleted,
+            "not_found_ids": not_found,
+            "bytes_freed": bytes_freed,
+        }
+    )
+
+
+async def delete_images(session_id, image_ids):
+    # removes the documents in one write, then the files of their images
+    # (original and renditions; a stored content goes with the last document
+    # referencing it). Returns (deleted ids, ids not found, bytes freed)
+    db = open_db(session_id)
+    store = get_blob_store(session_id, db)
+
+    docs = []
+    not_found = []
+    for image_id in dict.fromkeys(image_ids):
+        doc = db.get(doc_id=image_id)
+        if doc is None:
+            not_found.append(image_id)
+        else:
+            docs.append(doc)
+    if not docs:
+        return [], not_found, 0
+
+    db.remove(doc_ids=[doc.doc_id for doc in docs])
+
+    legacy_files = []
+    released = []
+    for doc in docs:
+        digest = doc.get("blob")
+        if digest:
+            if store.decref(digest) == 0:
+                ext = os.path.splitext(doc.get("url") or "")[1].lstrip(".") or "jpg"
+                released.append((digest, ext))
+        else:
+            legacy_files.extend(image_files(doc, None))
+
+    bytes_freed = await FILE_IO.run(remove_files, legacy_files)
+    for digest, ext in released:
+        bytes_freed += await FILE_IO.run(store.remove, digest, ext)
+    logger.info(
+        f"Deleted {len(docs)} images of session {session_id} ({bytes_freed / 1024:.0f} kB freed)"
+    )
+    return [doc.doc_id for doc in docs], not_found, bytes_freed
+
+# ------------------------------------------------------------
+def is_valid_session_id(session_id):
+    # session ids name folders: no separators
+    return (
+        isinstance(session_id, str)
+        and session_id not in ("", ".", "..")
+        and os.path.basename(session_id) == session_id
+        and "\\" not in session_id
+    )
+
+
+def export_session(session_id, include_agents=False):
+    # archive of a session in chunks (see backend/session_archive.py)
+    db = open_db(session_id)
+    agents = {}
+    if include_agents:
+        agents = {name: agent for (sid, name), agent in SESSIONS_AGENTS.items() if sid == session_id}
+    return iter_export(session_id, db.all(), get_blob_store(session_id, db), FILE_IO, agents)
+
+
+async def import_session(read_exactly, session_id=None, append=False, restore_agents=False):
+    # loads an archive into session_id (default: the archived session), which
+    # must have no images unless append. Archived ids are kept in an empty
+    # session. Returns a report with id_map: archived id -> new id.
+    # restore_agents unpickles the archived agents: never set it from a
+    # request, only from code importing an archive it trusts
+    target = {}
+
+    def open_store(manifest):
+        target["session_id"] = session_id or manifest.get("session_id")
+        if not is_valid_session_id(target["session_id"]):
+            raise ArchiveError(f"invalid session_id {target['session_id']!r}")
+        target["db"] = open_db(target["session_id"])
+        if len(target["db"]) and not append:
+            raise FileExistsError(f"session {target['session_id']} has images")
+        return get_blob_store(target["session_id"], target["db"])
+
+    t0 = time.perf_counter()
+    contents = await read_archive(read_exactly, open_store, FILE_IO, restore_agents)
+    session_id, db = target["session_id"], target["db"]
+    store = get_blob_store(session_id, db)
+
+    keep_ids = len(db) == 0
+    documents = []
+    for doc, archived_id, ext in contents["docs"]:
+        doc["url"] = f"{URL_SERVER}/{PATH_IMAGES}/{session_id}/{FOLDER_BLOBS}/{store.relpath(doc['blob'], ext)}"
+        documents.append(Document(doc, archived_id) if keep_ids else doc)
+    # one DB write for the whole session
+    new_ids = db.insert_multiple(documents)
+    for doc in documents:
+        store.incref(doc["blob"])
+    for agent_name, agent in contents["agents"].items():
+        SESSIONS_AGENTS[(session_id, agent_name)] = agent
+
+    report = {
+        "session_id": session_id,
+        "documents": len(new_ids),
+        "images": contents["images"],
+        "bytes": contents["bytes"],
+        "missing_images": contents["missing_images"],
+        "agents": sorted(contents["agents"]),
+        "duration_s": time.perf_counter() - t0,
+        "id_map": {archived_id: new_id for (_, archived_id, _), new_id in zip(contents["docs"], new_ids)},
+    }
+    logger.info(
+        f"Imported {report['documents']} images into session {session_id} "
+        f"({report['bytes'] / 1024**2:.1f} MB, {report['duration_s']:.2f} s)"
+    )
+    return report
+
+
+async def handle_session_export(request: web.Request):
+    # GET /session/export?session_id=...&agents=1 : tar stream of the
+    # session, with the state of its live agents if agents=1
+    session_id = request.query.get("session_id")
+    if not is_valid_session_id(session_id):
+        return web.json_response({"status": "error", "message": "invalid session_id"}, status=400)
+    if not os.path.isfile(f"{PATH_IMAGES}/{session_id}/tinydb.json"):
+        return web.json_response({"status": "error", "message": f"no session {session_id}"}, status=404)
+    include_agents = request.query.get("agents", "0").lower() in ("1", "true", "yes")
+
+    response = web.StreamResponse(
+        headers={
+            "Content-Type": "application/x-tar",
+            "Content-Disposition": f'attachment; filename="{session_id}.tar"',
+        }
+    )
+    await response.prepare(request)
+    async for chunk in export_session(session_id, include_agents):
+        await response.write(chunk)
+    await response.write_eof()
+    return response
+
+
+async def handle_session_import(request: web.Request):
+    # POST /session/import?session_id=...&append=1, the archive as body (read
+    # as it arrives, not limited by CLIENT_MAX_SIZE). The archived agents are
+    # pickled, so they are never restored from a request
+    def flag(name):
+        return request.query.get(name, "0").lower() in ("1", "true", "yes")
+
+    try:
+        report = await import_session(
+            stream_reader(request.content),
+            request.query.get("session_id"),
+            append=flag("append"),
+        )
+    except FileExistsError as e:
+        return web.json_response({"status": "error", "message": f"{e} (append=1 to add)"}, status=409)
+    except SessionCompacted as e:
+        return web.json_response({"status": "error", "message": f"{e} (session_id=... to restore it first)"}, status=409)
+    except ArchiveError as e:
+        return web.json_response({"status": "error", "message": str(e)}, status=400)
+    report["id_map"] = {str(k): v for k, v in report["id_map"].items()}
+    return web.json_response(dict(report, status="ok"))
+
+# ------------------------------------------------------------
+def session_image_files(session_id):
+    # files of the images referenced by the documents of a session; the DB
+    # is opened read-only, never created
+    path_db = f"{PATH_IMAGES}/{session_id}/tinydb.json"
+    if not os.path.isfile(path_db):
+        return []
+    db = TinyDB(path_db, access_mode="r")
+    store = get_blob_store(session_id, db)
+    files = []
+    for doc in db.all():
+        files.extend(image_files(doc, store))
+    return files
+
+
+def release_session(session_id):
+    # drops the cached state of a session whose files are gone
+    BLOB_STORES.pop(session_id, None)
+
+
+def session_blob_refs(session_id):
+    store = BLOB_STORES.get(session_id)
+    return store.refs if store is not None else None
+
+
+async def handle_gc_status(request: web.Request):
+    return web.json_response(
+        {
+            "status": "ok",
+            "interval_s": ORPHAN_GC.interval,
+            "grace_s": ORPHAN_GC.grace,
+            "total_files": ORPHAN_GC.total_files,
+            "total_bytes": ORPHAN_GC.total_bytes,
+            "last_report": ORPHAN_GC.last_report,
+        }
+    )
+
+
+async def handle_compaction_status(request: web.Request):
+    return web.json_response(
+        {
+            "status": "ok",
+            "idle_s": COMPACTOR.idle,
+            "interval_s": COMPACTOR.interval,
+            "total_sessions": COMPACTOR.total_sessions,
+            "total_bytes": COMPACTOR.total_bytes,
+            "total_restored": COMPACTOR.total_restored,
+            "last_report": COMPACTOR.last_report,
+        }
+    )
+
+
+async def handle_compaction_run(request: web.Request):
+    # compacts the idle sessions now (or session_ids, idle or not); dry_run
+    # only reports their current size
+    try:
+        data = await request.json()
+    except Exception:
+        data = {}
+    session_ids = data.get("session_ids")
+    if session_ids is not None and (
+        not isinstance(session_ids, list) or not all(is_valid_session_id(s) for s in session_ids)
+    ):
+        return web.json_response(
+            {"status": "error", "message": "session_ids must be a list of session ids"}, status=400
+        )
+    report = await COMPACTOR.run_once(
+        session_ids=session_ids, dry_run=bool(data.get("dry_run", False))
+    )
+    return web.json_response({"status": "ok", "report": report})
+
+
+async def handle_gc_run(request: web.Request):
+    # runs the orphan collector now (all sessions or session_ids), dry_run
+    # only reports what would be reclaimed
+    try:
+        data = await request.json()
+    except Exception:
+        data = {}
+    session_ids = data.get("session_ids")
+    if session_ids is not None and (
+        not isinstance(session_ids, list) or not all(is_valid_session_id(s) for s in session_ids)
+    ):
+        return web.json_response(
+            {"status": "error", "message": "session_ids must be a list of session ids"}, status=400
+        )
+    report = await ORPHAN_GC.run_once(
+        session_ids=session_ids, dry_run=bool(data.get("dry_run", False))
+    )
+    return web.json_response({"status": "ok", "report": report})
 
-    return web.json_response({"status": "ok", "deleted_id": image_id})
 
 async def handle_compute_dendrogram(request: web.Request):
     try:
@@ -552,11 +1077,15 @@ async def handle_compute_dendrogram(request: web.Request):
     session_id = data.get("session_id")
     json_path = "data/images/{}/tinydb.json".format(session_id)
 
-    json_tree = return_json_tree(
-        json_path = json_path,
-        agent_name ="cma-es",
-        score_min = 90,
-        timestamp_threshold = 0.0)
+    # pandas, scipy and scikit-learn: imported on the first clustering request
+    from backend.clustering.clustering import return_json_tree
+
+    with CLUSTERING_LATENCY.time(job="dendrogram"):
+        json_tree = return_json_tree(
+            json_path = json_path,
+            agent_name ="cma-es",
+            score_min = 90,
+            timestamp_threshold = 0.0)
     return web.json_response({"status": "ok", "tree": json_tree})
 
 async def handle_compute_tsne(request: web.Request):
@@ -569,76 +1098,314 @@ async def handle_compute_tsne(request: web.Request):
     session_id = data.get("session_id")
     json_path = "data/images/{}/tinydb.json".format(session_id)
 
-    json_tsne = return_json_tsne(
-        json_path = json_path,
-        agent_name ="cma-es",
-        score_min = 90
-        )
+    from backend.clustering.clustering import return_json_tsne
+
+    with CLUSTERING_LATENCY.time(job="tsne"):
+        json_tsne = return_json_tsne(
+            json_path = json_path,
+            agent_name ="cma-es",
+            score_min = 90
+            )
     return web.json_response({"status": "ok", "tsne": json_tsne})
 
 # ------------------------------------------------------------
-async def file_handler(request):
-    # Requested path
-    rel_path = request.match_info["path"]
-    requested = (BASE_DIR_SERVER / rel_path).resolve()
+# ------------------------------------------------------------
+def route_label(request):
+    # route template ("/save", "/{path}"...) rather than the raw path, to
+    # keep the number of label values bounded
+    route = request.match_info.route
+    resource = route.resource if route is not None else None
+    if resource is None:
+        return "unmatched"
+    return resource.canonical
+
+
+@web.middleware
+async def metrics_middleware(request, handler):
+    t0 = time.perf_counter()
+    status = 500
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        route = route_label(request)
+        HTTP_LATENCY.observe(time.perf_counter() - t0, route=route, method=request.method)
+        HTTP_REQUESTS.inc(route=route, method=request.method, status=str(status))
+
+
+def request_session_id(request):
+    # session of a request: ?session_id= (the client adds it to every call)
+    # or the folder of an image URL. The body is never read here
+    session_id = request.query.get("session_id")
+    prefix = f"/{PATH_IMAGES}/"
+    if session_id is None and request.path.startswith(prefix):
+        session_id = request.path[len(prefix):].split("/", 1)[0]
+    return session_id if is_valid_session_id(session_id) else None
+
+
+@web.middleware
+async def session_middleware(request, handler):
+    # restores a compacted session before its first request, and keeps it
+    # from being compacted while a request uses it
+    session_id = request_session_id(request)
+    if session_id is None:
+        try:
+            return await handler(request)
+        except SessionCompacted as e:
+            # session only named in the body: restored, then handled again
+            # (the body read by the handler is cached by aiohttp)
+            if not is_valid_session_id(e.session_id):
+                raise
+            session_id = e.session_id
+    async with COMPACTOR.session(session_id):
+        return await handler(request)
 
-    # Security: do not leave the root folder
-    if BASE_DIR_SERVER not in requested.parents and requested != BASE_DIR_SERVER:
-        raise web.HTTPForbidden()
 
-    # If it's a folder → serve index.html inside
-    if requested.is_dir():
-        index_file = requested / "index.html"
-        if index_file.exists():
-            return web.FileResponse(index_file)
+def live_agents_by_class():
+    return Counter(((type(agent).__name__,) for agent in SESSIONS_AGENTS.values())).items()
 
-    # Si c’est un fichier existant → le servir
-    if requested.exists() and requested.is_file():
-        return web.FileResponse(requested)
 
-    raise web.HTTPNotFound()
+def db_size_by_session():
+    # size of each session's tinydb.json, one stat per session
+    sizes = []
+    try:
+        entries = list(os.scandir(PATH_IMAGES))
+    except FileNotFoundError:
+        return sizes
+    for entry in entries:
+        if entry.is_dir():
+            try:
+                sizes.append(((entry.name,), os.stat(os.path.join(entry.path, "tinydb.json")).st_size))
+            except FileNotFoundError:
+                pass
+    return sizes
+
+
+REGISTRY.gauge(
+    "paramexplorer_live_agents",
+    "Agents alive in SESSIONS_AGENTS by agent class.",
+    ("agent_class",),
+    callback=live_agents_by_class,
+)
+REGISTRY.gauge(
+    "paramexplorer_db_size_bytes",
+    "Size of the TinyDB file of each session.",
+    ("session_id",),
+    callback=db_size_by_session,
+)
+REGISTRY.gauge(
+    "paramexplorer_file_io_pending",
+    "Filesystem operations queued or running in the I/O thread pool.",
+    callback=lambda: FILE_IO.pending,
+)
+REGISTRY.gauge(
+    "paramexplorer_auto_score_pending",
+    "Images waiting for the automated scorer.",
+    callback=lambda: AUTO_SCORER.pending,
+)
+
+
+async def handle_metrics(request: web.Request):
+    return web.Response(
+        body=REGISTRY.render().encode("utf-8"),
+        headers={"Content-Type": METRICS_CONTENT_TYPE},
+    )
+
+def session_info(session_id):
+    # what a slow request capture records about its session
+    info = {"agents": sorted(name for (sid, name) in SESSIONS_AGENTS if sid == session_id)}
+    try:
+        info["db_size_bytes"] = os.stat(f"{PATH_IMAGES}/{session_id}/tinydb.json").st_size
+    except (FileNotFoundError, TypeError):
+        info["db_size_bytes"] = None
+    return info
+
+# Periodic removal of image files no document references (--gc-interval,
+# --gc-grace)
+ORPHAN_GC = OrphanCollector(
+    PATH_IMAGES,
+    referenced_files=session_image_files,
+    live_refs=session_blob_refs,
+    io=FILE_IO,
+)
+
+# Packing of the sessions idle for --compact-idle-days (off by default) into
+# one compressed archive, restored on their next request
+COMPACTOR = SessionCompactor(
+    PATH_IMAGES,
+    export_session=export_session,
+    import_session=import_session,
+    release_session=release_session,
+    io=FILE_IO,
+)
 
 # ------------------------------------------------------------
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser()
-    parser.add_argument(
-        "--host", default=IP_SERVER, help="Host for HTTP server (default: 0.0.0.0)"
-    )
-    parser.add_argument(
-        "--port",
-        type=int,
-        default=PORT_SERVER,
-        help=f"Port for HTTP server (default: {PORT_SERVER})",
+def make_app(dir_home=None, profiler=None):
+    # builds the application with all its routes (static files from dir_home);
+    # a backend.profiling.Profiler adds its middleware and /profiling routes
+    if dir_home is None:
+        dir_home = os.getcwd()
+
+    middlewares = [normalize_path_middleware(merge_slashes=True), metrics_middleware, session_middleware]
+    if profiler is not None:
+        middlewares.append(profiler.middleware)
+    app = web.Application(middlewares=middlewares, client_max_size=CLIENT_MAX_SIZE)
+
+    static_assets = StaticAssetCache(
+        dir_home, folders=["frontend", "examples"], image_folders=[PATH_IMAGES], io=FILE_IO
     )
 
-    os.makedirs(PATH_IMAGES, exist_ok=True)
+    async def preload_static_assets(app):
+        await static_assets.preload()
 
-    dir_home = os.getcwd()
+    app.on_startup.append(preload_static_assets)
 
-    app = web.Application(
-        middlewares=[normalize_path_middleware(merge_slashes=True)],
-        client_max_size=CLIENT_MAX_SIZE,
-    )
+    # before the catch-all file route
+    app.router.add_get("/metrics", handle_metrics)
+    app.router.add_get("/gc", handle_gc_status)
+    app.router.add_get("/compaction", handle_compaction_status)
+    app.router.add_get("/session/export", handle_session_export)
+    if profiler is not None:
+        profiler.add_routes(app.router)
+        app.on_startup.append(profiler.on_startup)
+        app.on_cleanup.append(profiler.on_cleanup)
 
-    app.router.add_get("/{path:.*}", file_handler)    
+    app.router.add_get("/{path:.*}", static_assets.handle)
 
-    app.router.add_static("/", dir_home, show_index=True)
     app.router.add_post("/save", handle_save)
     app.router.add_post("/load_gallery", handle_load_gallery)
     app.router.add_post("/load_image_data", handle_load_image_data)
     app.router.add_post("/load_data", handle_load_data)
     app.router.add_post("/update_score", handle_update_score)
+    app.router.add_post("/update_scores", handle_update_scores)
     app.router.add_post("/delete_image", handle_delete_image)
+    app.router.add_post("/delete_images", handle_delete_images)
+    app.router.add_post("/gc/run", handle_gc_run)
+    app.router.add_post("/compaction/run", handle_compaction_run)
+    app.router.add_post("/session/import", handle_session_import)
 
     app.router.add_post("/agent/play", handle_agent_play)
     app.router.add_post("/agent/update", handle_agent_update)
     app.router.add_post("/agent/change", handle_agent_change)
     app.router.add_post("/agent/time_warp", handle_agent_time_warp)
+    app.router.add_post("/agent/telemetry", handle_agent_telemetry)
 
     app.router.add_post("/clustering/plot_dendrogram", handle_compute_dendrogram)
     app.router.add_post("/clustering/plot_tsne", handle_compute_tsne)
 
+    app.on_cleanup.append(shutdown_auto_scorer)
+    app.on_startup.append(ORPHAN_GC.on_startup)
+    app.on_cleanup.append(ORPHAN_GC.on_cleanup)
+    app.on_startup.append(COMPACTOR.on_startup)
+    app.on_cleanup.append(COMPACTOR.on_cleanup)
+    app.on_cleanup.append(shutdown_file_io)
+    return app
+
+# ------------------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--host", default=IP_SERVER, help="Host for HTTP server (default: 0.0.0.0)"
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=PORT_SERVER,
+        help=f"Port for HTTP server (default: {PORT_SERVER})",
+    )
+    parser.add_argument(
+        "--auto-scorer",
+        default=None,
+        help="Score unrated saved images with this scorer (colorfulness, "
+        "edge_density, entropy or package.module:function; default: off)",
+    )
+    parser.add_argument(
+        "--auto-scorer-workers",
+        type=int,
+        default=None,
+        help="Worker processes of the automated scorer (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--io-workers",
+        type=int,
+        default=FILE_IO.max_workers,
+        help=f"Threads for image writes and deletes (default: {FILE_IO.max_workers})",
+    )
+    parser.add_argument(
+        "--io-queue",
+        type=int,
+        default=FILE_IO.max_pending,
+        help=f"Filesystem operations in flight before requests wait (default: {FILE_IO.max_pending})",
+    )
+    parser.add_argument(
+        "--fsync",
+        choices=["never", "file", "always"],
+        default=FILE_IO.fsync,
+        help="fsync of saved images: never, file (before rename), always (file and directory)",
+    )
+    parser.add_argument(
+        "--gc-interval",
+        type=float,
+        default=ORPHAN_GC.interval,
+        help=f"Seconds between collections of orphaned image files (default: {ORPHAN_GC.interval:.0f}, 0: off)",
+    )
+    parser.add_argument(
+        "--gc-grace",
+        type=float,
+        default=ORPHAN_GC.grace,
+        help=f"Orphaned files younger than this (seconds) are kept (default: {ORPHAN_GC.grace:.0f})",
+    )
+    parser.add_argument(
+        "--compact-idle-days",
+        type=float,
+        default=COMPACTOR.idle / 86400,
+        help="Compact sessions idle for this many days (default: 0, off)",
+    )
+    parser.add_argument(
+        "--compact-interval",
+        type=float,
+        default=COMPACTOR.interval,
+        help=f"Seconds between searches for idle sessions (default: {COMPACTOR.interval:.0f})",
+    )
+    parser.add_argument(
+        "--profiling",
+        action="store_true",
+        help="Enable the /profiling endpoints and the capture of slow requests",
+    )
+    parser.add_argument(
+        "--slow-request-ms",
+        type=float,
+        default=1000.0,
+        help="With --profiling, capture requests slower than this (default: 1000, 0: off)",
+    )
+
+    os.makedirs(PATH_IMAGES, exist_ok=True)
+
     args = parser.parse_args()
+    if args.auto_scorer is not None:
+        resolve_scorer(args.auto_scorer, allow_import=True)  # fails early on a typo
+    AUTO_SCORER_NAME = args.auto_scorer
+    AUTO_SCORER.max_workers = args.auto_scorer_workers
+    FILE_IO.max_workers = args.io_workers
+    FILE_IO.max_pending = args.io_queue
+    FILE_IO.fsync = args.fsync
+    ORPHAN_GC.interval = args.gc_interval
+    ORPHAN_GC.grace = args.gc_grace
+    COMPACTOR.idle = args.compact_idle_days * 86400
+    COMPACTOR.interval = args.compact_interval
+
+    profiler = None
+    if args.profiling:
+        profiler = Profiler(
+            slow_threshold=args.slow_request_ms / 1e3 if args.slow_request_ms > 0 else None,
+            session_info=session_info,
+        )
+    app = make_app(profiler=profiler)
+
     ssl_context = None
     web.run_app(
         app, access_log=None, host=args.host, port=args.port, ssl_context=ssl_context